@@ -17,6 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from manager import views
+
 urlpatterns = [
+    path('metrics', views.metrics, name='metrics'),
+    path('profiles/<str:kind>/<str:operation_id>', views.operation_profile, name='operation_profile'),
+    path('api/', include('manager.api')),
     path('', admin.site.urls),
 ]
@@ -1,21 +1,37 @@
-import subprocess
-from ftplib import FTP, error_perm as FTPError
+import json
+from datetime import timedelta
 
-import boto3
-import yadisk
-import paramiko
-from botocore.exceptions import ClientError
+from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group, User
-from django.http import HttpRequest
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404, HttpRequest, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.translation import gettext as _
-from manager.models import (DumpTask, DumpTaskOperation, FileStorage,
-                            RecoverBackupOperation, UserDatabase)
-from manager.services.databases import DB_INTERFACE
+from manager.choices import DumpOperationStatusChoices
+from manager.models import (ApiToken, BinlogBatch, DumpRunHistory, DumpTask,
+                            DumpTaskOperation, FileStorage, OperationPhase,
+                            RecoverBackupOperation, ToolInvocation,
+                            UserDatabase, VerificationOperation, WalBatch)
+from manager.services.binlog_service import (binlog_archive_warning,
+                                             binlog_summary)
+from manager.services.connection_service import (check_databases,
+                                                 check_storages)
+from manager.services.history_service import daily_trend
+from manager.services.manifest_service import diff_manifests
+from manager.services.queue_service import (dispatch_dump, dispatch_restore,
+                                            is_queue_mode, requeue)
+from manager.services.verification_service import dispatch_verifications
+from manager.services.wal_service import wal_archive_warning
 from unfold.admin import ModelAdmin
-from unfold.decorators import action
+from unfold.decorators import action, display
 
 admin.site.unregister(User)
 admin.site.unregister(Group)
@@ -55,6 +71,9 @@ class FileStorageAdmin(ModelAdmin):
             "fields": ("host", "bucket_name", "access_key"),
             "classes": ("fs-section", "fs-s3"),
         }),
+        (_("Encryption"), {
+            "fields": ("encryption_key",),
+        }),
     )
 
     class Media:
@@ -95,69 +114,14 @@ class FileStorageAdmin(ModelAdmin):
 
     @action(description=_("Check connection"))
     def check_connection(self, request: HttpRequest, queryset):
-        for storage in queryset:
-            try:
-                if storage.type == FileStorage.TYPE_YADISK:
-                    if not storage.secret_key:
-                        messages.error(request, _(f"{storage.name}: Yandex Disk token is empty (secret_key)."))
-                        continue
-                    y = yadisk.YaDisk(token=storage.secret_key)
-                    if not y.check_token():
-                        messages.error(request, _(f"{storage.name}: Yandex Disk token is invalid."))
-                        continue
-                    y.get_disk_info()
-                    messages.success(request, _(f"{storage.name} (Yandex Disk) connection success!"))
-                elif storage.type == FileStorage.TYPE_FTP:
-                    # FTP connection test
-                    host_parts = storage.host.split(":")
-                    host = host_parts[0]
-                    port = int(host_parts[1]) if len(host_parts) > 1 else 21
-
-                    ftp = FTP()
-                    ftp.connect(host, port, timeout=10)
-                    ftp.login(storage.access_key, storage.secret_key)
-                    ftp.pwd()  # Test command
-                    ftp.quit()
-                    messages.success(request, _(f"{storage.name} (FTP) connection success!"))
-                elif storage.type == FileStorage.TYPE_SFTP:
-                    # SFTP connection test
-                    host_parts = storage.host.split(":")
-                    host = host_parts[0]
-                    port = int(host_parts[1]) if len(host_parts) > 1 else 22
-
-                    ssh = paramiko.SSHClient()
-                    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                    ssh.connect(
-                        hostname=host,
-                        port=port,
-                        username=storage.access_key,
-                        password=storage.secret_key,
-                        timeout=10
-                    )
-                    sftp = ssh.open_sftp()
-                    sftp.listdir('.')  # Test command
-                    sftp.close()
-                    ssh.close()
-                    messages.success(request, _(f"{storage.name} (SFTP) connection success!"))
-                else:
-                    # S3
-                    s3_client = boto3.client(
-                        "s3",
-                        endpoint_url=storage.host,
-                        aws_access_key_id=storage.access_key,
-                        aws_secret_access_key=storage.secret_key,
-                        verify=(storage.host or "").startswith("https"),
-                    )
-                    s3_client.list_buckets()
-                    messages.success(request, _(f"{storage.name} (S3) connection success!"))
-            except ClientError as e:
-                messages.error(request, _(f"{storage.name} Connection failed: {e}"))
-            except FTPError as e:
-                messages.error(request, _(f"{storage.name} FTP Connection failed: {e}"))
-            except paramiko.SSHException as e:
-                messages.error(request, _(f"{storage.name} SFTP Connection failed: {e}"))
-            except Exception as e:
-                messages.error(request, _(f"{storage.name} Connection failed: {e}"))
+        storages = list(queryset)
+        results = check_storages(storages)
+        for storage in storages:
+            is_connected, message = results[storage.pk]
+            if is_connected:
+                messages.success(request, _(f"{storage.name} {message}"))
+            else:
+                messages.error(request, _(f"{storage.name}: {message}"))
 
 
 @admin.register(UserDatabase)
@@ -171,17 +135,75 @@ class UserDatabaseAdmin(ModelAdmin):
 
     @action(description=_("Check connection"))
     def check_connection(self, request: HttpRequest, queryset):
-        for db in queryset:
-            db_interface = DB_INTERFACE[db.db_type]()
-            is_connected = db_interface.check_connection(db.connection_string)
+        databases = list(queryset)
+        results = check_databases(databases)
+        for db in databases:
+            is_connected, message = results[db.pk]
             if is_connected:
-                messages.success(request, _(f"{db.name} connection success!"))
+                messages.success(request, _(f"{db.name} {message}"))
             else:
-                messages.error(request, _(f"{db.name} Connection failed!"))
+                messages.error(request, _(f"{db.name} {message}"))
+
+
+def _format_bytes(value):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(value) < 1024 or unit == "TB":
+            return f"{value:.1f} {unit}" if unit != "B" else f"{int(value)} B"
+        value /= 1024
+
+
+class OperationProgressMixin:
+    """Колонка прогресса для операций: сделано / всего, скорость и ETA."""
+
+    @display(description=_("Progress"))
+    def progress(self, obj):
+        if obj.status != DumpOperationStatusChoices.IN_PROCESS or obj.progress_bytes is None:
+            return "-"
+        parts = [obj.get_progress_phase_display() or ""]
+        done = _format_bytes(obj.progress_bytes)
+        parts.append(f"{done} / {_format_bytes(obj.progress_total)}" if obj.progress_total else done)
+        if obj.progress_rate:
+            parts.append(f"{_format_bytes(obj.progress_rate)}/s")
+        if obj.progress_eta is not None:
+            parts.append(f"ETA {timedelta(seconds=int(obj.progress_eta))}")
+        return " · ".join(part for part in parts if part)
+
+
+class OperationProfileMixin:
+    """Ссылка на артефакт профилирования операции (если запуск профилировался)."""
+
+    profile_kind = None
 
+    @display(description=_("Profile"))
+    def profile_artifact(self, obj):
+        if not obj.profile_path:
+            return "-"
+        url = reverse("operation_profile", args=[self.profile_kind, obj.id])
+        return format_html('<a href="{}">{}</a>', url, obj.profile_path.rsplit("/", 1)[-1])
 
-class DumpTaskOperationInline(admin.TabularInline):
-    model = DumpTaskOperation
+
+class OperationPhaseInline(admin.TabularInline):
+    model = OperationPhase
+    fields = ["phase", "is_success", "started_dt", "finished_dt", "duration",
+              "bytes_in", "bytes_out", "throughput"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class ToolInvocationInline(admin.TabularInline):
+    model = ToolInvocation
+    fields = ["phase", "tool", "returncode", "started_dt", "wall_time", "cpu_user",
+              "cpu_system", "max_rss", "read_bytes", "write_bytes"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(DumpTask)
@@ -191,42 +213,181 @@ class DumpTaskAdmin(ModelAdmin):
     list_filter_submit = False
     list_fullwidth = False
     list_display = ["id", "created_dt", "database",
-                    "file_storage", "task_period", "max_dumpfiles_keep"]
+                    "file_storage", "backup_mode", "task_period", "max_dumpfiles_keep", "archive_status"]
+    list_select_related = ["database", "file_storage"]
     actions = ['execute_dump']
-    inlines = [DumpTaskOperationInline]
+    # операции задачи подгружаются отдельным запросом, постранично (operations_view)
+    change_form_after_template = "manager/dumptask/operations_panel.html"
+    operations_per_page = 20
+
+    def get_urls(self):
+        return [
+            path("<path:object_id>/operations/", self.admin_site.admin_view(self.operations_view),
+                 name="manager_dumptask_operations"),
+        ] + super().get_urls()
+
+    def operations_view(self, request, object_id):
+        """Фрагмент со страницей последних операций задачи (не больше BACKUP_TASK_HISTORY_LIMIT)."""
+        task = self.get_object(request, object_id)
+        if task is None:
+            raise Http404
+        if not self.has_view_permission(request, task):
+            raise PermissionDenied
+        operations = (
+            DumpTaskOperation.objects.filter(task=task)
+            .only("id", "created_dt", "status", "dump_size", "error_text")
+            .order_by("-created_dt")
+        )
+        status = request.GET.get("status", "")
+        if status in {str(value) for value in DumpOperationStatusChoices.values}:
+            operations = operations.filter(status=status)
+        else:
+            status = ""
+        limit = settings.BACKUP_TASK_HISTORY_LIMIT
+        page = Paginator(operations[:limit], self.operations_per_page).get_page(request.GET.get("page"))
+
+        context = {
+            "page": page,
+            "limit": limit,
+            "status": status,
+            "status_choices": [("", _("All"))] + list(DumpOperationStatusChoices.choices),
+            "base_url": reverse("admin:manager_dumptask_operations", args=[task.pk]),
+        }
+        return TemplateResponse(request, "manager/dumptask/operations.html", context)
+
+    @display(description=_("Archive"))
+    def archive_status(self, obj):
+        # непрерывный архив (WAL, binlog) работает отдельным процессом: без него восстановление на момент не выйдет
+        return wal_archive_warning(obj) or binlog_archive_warning(obj) or "-"
 
     @action(description=_("Execute dump"))
     def execute_dump(self, request: HttpRequest, queryset):
-        for task in queryset:
+        tasks = list(queryset.select_related("database"))
+        results = check_databases({task.database.pk: task.database for task in tasks}.values())
+        for task in tasks:
             db = task.database
-            db_interface = DB_INTERFACE[db.db_type]()
-            is_connected = db_interface.check_connection(db.connection_string)
+            is_connected, message = results[db.pk]
             if not is_connected:
-                messages.error(request, _(f"{task.id}: {db.name} Connection failed!"))
+                messages.error(request, _(f"{task.id}: {db.name} {message}"))
                 continue
             new_operation = DumpTaskOperation.objects.create(
                 task=task,
             )
-            subprocess.Popen(
-                ["python", "manage.py", "dump_operation", str(new_operation.id)])
+            dispatch_dump([new_operation.id])
             messages.success(request, _(
                 f"{task.id}: Operation of dump created {new_operation.id}"))
 
 
 @admin.register(DumpTaskOperation)
-class DumpTaskOperationAdmin(ModelAdmin):
+class DumpTaskOperationAdmin(OperationProgressMixin, OperationProfileMixin, ModelAdmin):
     compressed_fields = True
     warn_unsaved_form = True
     list_filter_submit = False
     list_fullwidth = False
-    list_display = ["id", "created_dt", "task__database", "status"]
-    actions = ["reexecute_dump", "restore_dump"]
+    list_display = ["id", "created_dt", "task__database", "status", "progress"]
+    list_select_related = ["task__database"]
+    ordering = ["-created_dt"]
+    # без COUNT(*) по всей таблице на каждой странице
+    show_full_result_count = False
+    actions = ["reexecute_dump", "restore_dump", "verify_dump", "compare_manifests"]
+    inlines = [OperationPhaseInline, ToolInvocationInline]
+    readonly_fields = ["checksum_blake2b", "checksum_sha256", "manifest_path", "encryption_key_id",
+                       "binlog_chain", "profile_artifact", "log_tail"]
+    profile_kind = "dump"
+    # содержимое дампа по манифесту — под формой, без скачивания файла
+    change_form_after_template = "manager/dumptaskoperation/manifest.html"
+
+    def get_urls(self):
+        return [
+            path("manifest-diff/<str:old_id>/<str:new_id>/", self.admin_site.admin_view(self.manifest_diff_view),
+                 name="manager_dumptaskoperation_manifest_diff"),
+        ] + super().get_urls()
+
+    @display(description=_("Binlog chain"))
+    def binlog_chain(self, obj):
+        return binlog_summary(obj) or "-"
+
+    @staticmethod
+    def _manifest_table(manifest):
+        tables = sorted((manifest or {}).get("tables", {}).items(), key=lambda item: -(item[1].get("bytes") or 0))
+        return {
+            "headers": [_("Table"), _("Rows (estimate)"), _("Size"), _("Offset"), _("Length")],
+            "rows": [
+                [
+                    name,
+                    stats.get("rows") if stats.get("rows") is not None else "-",
+                    _format_bytes(stats["bytes"]) if stats.get("bytes") is not None else "-",
+                    stats.get("offset", "-"),
+                    _format_bytes(stats["length"]) if "length" in stats else "-",
+                ]
+                for name, stats in tables
+            ],
+        }
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        operation = self.get_object(request, object_id)
+        manifest = operation.manifest if operation else None
+        extra_context = {
+            **(extra_context or {}),
+            "manifest": manifest,
+            "manifest_table": self._manifest_table(manifest) if manifest else None,
+        }
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    def manifest_diff_view(self, request, old_id, new_id):
+        """Сравнение двух дампов по манифестам из БД: добавленные, удалённые и изменившиеся таблицы."""
+        operations = {
+            operation.id: operation
+            for operation in DumpTaskOperation.objects.select_related("task__database").filter(id__in=[old_id, new_id])
+        }
+        if len(operations) != 2:
+            raise Http404
+        old, new = operations[old_id], operations[new_id]
+        if not self.has_view_permission(request, old) or not self.has_view_permission(request, new):
+            raise PermissionDenied
+
+        def signed(value, format_value=str):
+            if value is None:
+                return "-"
+            return f"+{format_value(value)}" if value > 0 else format_value(value)
+
+        def size(value):
+            return _format_bytes(value) if value is not None else "-"
+
+        diff = diff_manifests(old.manifest, new.manifest)
+        changes = {change: sum(1 for row in diff if row["change"] == change)
+                   for change in ("added", "removed", "changed", "same")}
+        context = {
+            **self.admin_site.each_context(request),
+            "title": _("Dump manifest diff"),
+            "opts": self.model._meta,
+            "old": old,
+            "new": new,
+            "changes": changes,
+            "diff": {
+                "headers": [_("Table"), _("Change"), _("Rows"), _("Rows delta"), _("Size"), _("Size delta")],
+                "rows": [
+                    [
+                        row["table"],
+                        row["change"],
+                        f"{row['rows_old'] if row['rows_old'] is not None else '-'} → "
+                        f"{row['rows_new'] if row['rows_new'] is not None else '-'}",
+                        signed(row["rows_delta"]),
+                        f"{size(row['bytes_old'])} → {size(row['bytes_new'])}",
+                        signed(row["bytes_delta"], _format_bytes),
+                    ]
+                    for row in diff if row["change"] != "same"
+                ],
+            },
+        }
+        return TemplateResponse(request, "manager/dumptaskoperation/manifest_diff.html", context)
 
     @action(description=_("ReExecute dump"))
     def reexecute_dump(self, request: HttpRequest, queryset):
-        for operation in queryset:
-            subprocess.Popen(
-                ["python", "manage.py", "dump_operation", str(operation.id)])
+        operation_ids = list(queryset.values_list("id", flat=True))
+        if is_queue_mode():
+            requeue(DumpTaskOperation, operation_ids)
+        dispatch_dump(operation_ids)
 
     @action(description=_("Restore dump"))
     def restore_dump(self, request: HttpRequest, queryset):
@@ -234,24 +395,242 @@ class DumpTaskOperationAdmin(ModelAdmin):
             new_restore_operation = RecoverBackupOperation.objects.create(
                 dump_operation=operation
             )
-            subprocess.Popen(
-                ["python", "manage.py", "restore_dump", str(new_restore_operation.id)])
+            dispatch_restore([new_restore_operation.id])
             messages.success(request, _(
                 f"Operation of restore dump created {new_restore_operation.id}"))
 
+    @action(description=_("Verify dump"))
+    def verify_dump(self, request: HttpRequest, queryset):
+        operation_ids = []
+        for operation in queryset.select_related("task__verify_database"):
+            if operation.task.verify_database is None:
+                messages.error(request, _(f"{operation.id}: task has no verification database"))
+                continue
+            if operation.status != DumpOperationStatusChoices.SUCCESS:
+                messages.error(request, _(f"{operation.id}: dump is not successful"))
+                continue
+            verification = VerificationOperation.objects.create(
+                dump_operation=operation, target_database=operation.task.verify_database)
+            operation_ids.append(verification.id)
+            messages.success(request, _(f"Operation of verification created {verification.id}"))
+        dispatch_verifications(operation_ids)
+
+    @action(description=_("Compare manifests"))
+    def compare_manifests(self, request: HttpRequest, queryset):
+        operations = list(queryset.order_by("created_dt").values_list("id", "manifest__isnull")[:3])
+        if len(operations) != 2:
+            messages.error(request, _("Select exactly two dump operations to compare"))
+            return None
+        if any(no_manifest for operation_id, no_manifest in operations):
+            messages.error(request, _("Both dump operations must have a manifest"))
+            return None
+        # старый дамп слева, новый справа
+        return HttpResponseRedirect(reverse(
+            "admin:manager_dumptaskoperation_manifest_diff", args=[operations[0][0], operations[1][0]]))
+
 
 @admin.register(RecoverBackupOperation)
-class RecoverBackupOperationAdmin(ModelAdmin):
+class RecoverBackupOperationAdmin(OperationProgressMixin, OperationProfileMixin, ModelAdmin):
     compressed_fields = True
     warn_unsaved_form = True
     list_filter_submit = False
     list_fullwidth = False
     actions = ["restore_dump"]
     list_display = ["created_dt", "dump_operation__task__database",
-                    "dump_operation__dump_path", "status"]
+                    "dump_operation__dump_path", "status", "progress"]
+    list_select_related = ["dump_operation__task__database"]
+    ordering = ["-created_dt"]
+    show_full_result_count = False
+    inlines = [OperationPhaseInline, ToolInvocationInline]
+    readonly_fields = ["profile_artifact", "log_tail"]
+    profile_kind = "restore"
 
     @action(description=_("Restore dump"))
     def restore_dump(self, request: HttpRequest, queryset):
-        for operation in queryset:
-            subprocess.Popen(
-                ["python", "manage.py", "restore_dump", str(operation.id)])
+        operation_ids = list(queryset.values_list("id", flat=True))
+        if is_queue_mode():
+            requeue(RecoverBackupOperation, operation_ids)
+        dispatch_restore(operation_ids)
+
+
+@admin.register(VerificationOperation)
+class VerificationOperationAdmin(OperationProgressMixin, ModelAdmin):
+    compressed_fields = True
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["created_dt", "dump_operation__task__database", "target_database",
+                    "status", "duration", "latency", "progress"]
+    list_select_related = ["dump_operation__task__database", "target_database"]
+    list_filter = ["status"]
+    ordering = ["-created_dt"]
+    show_full_result_count = False
+    inlines = [OperationPhaseInline, ToolInvocationInline]
+    readonly_fields = ["checks", "log_tail"]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(OperationPhase)
+class OperationPhaseAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["started_dt", "phase", "dump_operation__task__database",
+                    "is_success", "duration", "bytes_out", "throughput"]
+    list_select_related = ["dump_operation__task__database"]
+    list_filter = ["phase", "is_success", "dump_operation__task__database"]
+    date_hierarchy = "started_dt"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ToolInvocation)
+class ToolInvocationAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["started_dt", "tool", "phase", "dump_operation__task__database",
+                    "wall_time", "cpu_user", "cpu_system", "max_rss", "read_bytes", "write_bytes"]
+    list_select_related = ["dump_operation__task__database"]
+    list_filter = ["tool", "phase", "dump_operation__task__database"]
+    date_hierarchy = "started_dt"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WalBatch)
+class WalBatchAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["created_dt", "task__database", "first_segment", "last_segment",
+                    "segments", "closed_dt", "size"]
+    list_select_related = ["task__database"]
+    list_filter = ["task__database"]
+    date_hierarchy = "closed_dt"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BinlogBatch)
+class BinlogBatchAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["created_dt", "task__database", "first_file", "last_file",
+                    "files", "closed_dt", "binlog_size", "size"]
+    list_select_related = ["task__database"]
+    list_filter = ["task__database"]
+    date_hierarchy = "closed_dt"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DumpRunHistory)
+class DumpRunHistoryAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["created_dt", "task__database", "is_success", "duration", "baseline_duration",
+                    "dump_size", "baseline_size", "throughput", "duration_regression", "size_regression"]
+    list_filter = ["task__database", "is_success", "duration_regression", "size_regression"]
+    list_select_related = ["task__database"]
+    date_hierarchy = "created_dt"
+    list_before_template = "manager/dumprunhistory/list_before.html"
+    trend_days = [7, 30, 90, 365]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path("trends/", self.admin_site.admin_view(self.trends_view),
+                 name="manager_dumprunhistory_trends"),
+        ] + super().get_urls()
+
+    def trends_view(self, request):
+        """Графики длительности и размера дампов по дням и список отмеченных запусков."""
+        try:
+            days = int(request.GET.get("days", 90))
+        except ValueError:
+            days = 90
+        days = min(max(days, 1), max(self.trend_days))
+        since = timezone.now() - timedelta(days=days)
+
+        tasks = DumpTask.objects.select_related("database").filter(run_history__created_dt__gte=since).distinct()
+        task_id = request.GET.get("task")
+        if task_id:
+            tasks = tasks.filter(id=task_id)
+
+        charts = []
+        for task in tasks:
+            trend = daily_trend(task, days)
+            labels = [row["day"].isoformat() for row in trend]
+            charts.append({
+                "title": str(task.database),
+                "duration": json.dumps({"labels": labels, "datasets": [{
+                    "label": _("Duration, min"),
+                    "data": [round(row["duration"] / 60, 2) if row["duration"] else None for row in trend],
+                    "borderColor": "var(--color-primary-600)",
+                }]}),
+                "size": json.dumps({"labels": labels, "datasets": [{
+                    "label": _("Dump size, MB"),
+                    "data": [round(row["dump_size"] / 2 ** 20, 2) if row["dump_size"] else None for row in trend],
+                    "borderColor": "var(--color-primary-600)",
+                }]}),
+            })
+
+        flagged = DumpRunHistory.objects.select_related("task__database").filter(
+            Q(duration_regression=True) | Q(size_regression=True), created_dt__gte=since,
+        )
+        if task_id:
+            flagged = flagged.filter(task_id=task_id)
+        rows = [
+            [
+                timezone.localtime(run.created_dt).strftime("%Y-%m-%d %H:%M"),
+                str(run.task.database),
+                f"{run.duration:.0f} / {run.baseline_duration:.0f}" if run.duration_regression else "",
+                f"{run.dump_size} / {run.baseline_size}" if run.size_regression else "",
+            ]
+            for run in flagged[:20]
+        ]
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": _("Backup trends"),
+            "opts": self.model._meta,
+            "days": days,
+            "day_choices": self.trend_days,
+            "task_id": task_id,
+            "charts": charts,
+            "flagged": {
+                "headers": [_("Date"), _("Database"), _("Duration / baseline, s"), _("Size / baseline, bytes")],
+                "rows": rows,
+            },
+            "history_url": reverse("admin:manager_dumprunhistory_changelist"),
+        }
+        return TemplateResponse(request, "manager/dumprunhistory/trends.html", context)
+
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(ModelAdmin):
+    list_filter_submit = False
+    list_fullwidth = False
+    list_display = ["name", "is_active", "created_dt"]
+    fields = ["name", "key", "is_active"]
+    readonly_fields = ["key"]
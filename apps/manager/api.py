@@ -0,0 +1,214 @@
+"""
+JSON API для оркестрации: массовый запуск дампов и восстановлений, опрос
+статусов пачкой и постраничный список операций. Авторизация — ApiToken
+в заголовке Authorization: Bearer <key>.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         JsonResponse)
+from django.urls import path
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+
+from manager.choices import DumpOperationStatusChoices
+from manager.models import (ApiToken, DumpTask, DumpTaskOperation,
+                            RecoverBackupOperation)
+from manager.services.queue_service import dispatch_dump, dispatch_restore
+
+OPERATION_FIELDS = ["id", "status", "created_dt", "updated_dt", "error_text",
+                    "progress_phase", "progress_bytes", "progress_total"]
+
+# kind в URL -> модель, родитель операции и поля ответа
+RESOURCES = {
+    "dumps": {
+        "model": DumpTaskOperation,
+        "parent": "task",
+        "fields": OPERATION_FIELDS + ["task_id", "dump_path", "dump_size", "checksum_blake2b", "checksum_sha256"],
+    },
+    "restores": {
+        "model": RecoverBackupOperation,
+        "parent": "dump_operation",
+        "fields": OPERATION_FIELDS + ["dump_operation_id"],
+    },
+}
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_token_required(view):
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        scheme, _, key = request.headers.get("Authorization", "").partition(" ")
+        if scheme != "Bearer" or not key or not ApiToken.objects.filter(key=key, is_active=True).exists():
+            return _error("Invalid token", status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _resource(kind):
+    if kind not in RESOURCES:
+        raise Http404
+    return RESOURCES[kind]
+
+
+def _serialize(row):
+    row = dict(row)
+    row["status"] = DumpOperationStatusChoices(row["status"]).name.lower()
+    for key in ("created_dt", "updated_dt"):
+        row[key] = row[key].isoformat()
+    return row
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+
+
+def _encode_cursor(row):
+    raw = json.dumps([row["created_dt"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_dt, operation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(created_dt), operation_id
+
+
+def _create_dumps(ids):
+    tasks = set(DumpTask.objects.filter(id__in=ids).values_list("id", flat=True))
+    return [DumpTaskOperation(task_id=task_id) for task_id in ids if task_id in tasks], {
+        task_id: "Task not found" for task_id in ids if task_id not in tasks
+    }
+
+
+def _create_restores(ids):
+    dumps = dict(DumpTaskOperation.objects.filter(id__in=ids).values_list("id", "status"))
+    operations, errors = [], {}
+    for dump_id in ids:
+        if dump_id not in dumps:
+            errors[dump_id] = "Dump operation not found"
+        elif dumps[dump_id] != DumpOperationStatusChoices.SUCCESS:
+            errors[dump_id] = "Dump operation is not successful"
+        else:
+            operations.append(RecoverBackupOperation(dump_operation_id=dump_id))
+    return operations, errors
+
+
+CREATORS = {
+    "dumps": (_create_dumps, dispatch_dump),
+    "restores": (_create_restores, dispatch_restore),
+}
+
+
+@api_token_required
+@require_http_methods(["GET", "POST"])
+def operations(request, kind):
+    resource = _resource(kind)
+    if request.method == "POST":
+        return _bulk_create(request, kind, resource)
+    return _list(request, resource)
+
+
+def _bulk_create(request, kind, resource):
+    """
+    POST {"ids": [...]} — id задач (dumps) или успешных дампов (restores).
+    Все операции создаются одним bulk_create; не найденные id возвращаются в errors.
+    """
+    body = _json_body(request)
+    ids = body.get("ids") if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return _error("Expected {\"ids\": [<id>, ...]}")
+    if len(ids) > settings.BACKUP_API_MAX_BATCH:
+        return _error(f"At most {settings.BACKUP_API_MAX_BATCH} ids per request")
+    ids = list(dict.fromkeys(ids))
+
+    build, dispatch = CREATORS[kind]
+    new_operations, errors = build(ids)
+    with transaction.atomic():
+        resource["model"].objects.bulk_create(new_operations)
+    operation_ids = [str(operation.id) for operation in new_operations]
+    dispatch(operation_ids)
+
+    parent = f"{resource['parent']}_id"
+    return JsonResponse({
+        "operations": [{"id": str(operation.id), parent: getattr(operation, parent)} for operation in new_operations],
+        "errors": errors,
+    }, status=201 if new_operations else 400)
+
+
+def _list(request, resource):
+    """
+    GET ?limit=&cursor=&status=&<parent>= — операции от новых к старым.
+    Курсор — (created_dt, id) последней строки, поэтому страница не сдвигается
+    от новых операций и не требует OFFSET.
+    """
+    queryset = resource["model"].objects.order_by("-created_dt", "-id")
+    parent = request.GET.get(resource["parent"])
+    if parent:
+        queryset = queryset.filter(**{f"{resource['parent']}_id": parent})
+    status = request.GET.get("status")
+    if status:
+        try:
+            queryset = queryset.filter(status=DumpOperationStatusChoices[status.upper()])
+        except KeyError:
+            return _error("Unknown status")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            created_dt, operation_id = _decode_cursor(cursor)
+        except (ValueError, TypeError):
+            return _error("Invalid cursor")
+        queryset = queryset.filter(Q(created_dt__lt=created_dt) | Q(created_dt=created_dt, id__lt=operation_id))
+    try:
+        limit = min(max(int(request.GET.get("limit", 100)), 1), settings.BACKUP_API_MAX_BATCH)
+    except ValueError:
+        return _error("Invalid limit")
+
+    rows = list(queryset.values(*resource["fields"])[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return JsonResponse({"results": [_serialize(row) for row in rows[:limit]], "next_cursor": next_cursor})
+
+
+@api_token_required
+@require_GET
+def operations_status(request, kind):
+    """
+    GET ?ids=a,b,c — статусы пачки операций одним запросом. ETag считается по
+    содержимому ответа: при совпадении с If-None-Match отдаётся 304 без тела.
+    """
+    resource = _resource(kind)
+    ids = [i for value in request.GET.getlist("ids") for i in value.split(",") if i]
+    if not ids:
+        return _error("Expected ?ids=<id>,<id>,...")
+    if len(ids) > settings.BACKUP_API_MAX_BATCH:
+        return _error(f"At most {settings.BACKUP_API_MAX_BATCH} ids per request")
+
+    rows = resource["model"].objects.filter(id__in=ids).order_by("id").values(*resource["fields"])
+    body = json.dumps({"results": [_serialize(row) for row in rows]})
+    etag = quote_etag(hashlib.sha256(body.encode()).hexdigest())
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    return response
+
+
+urlpatterns = [
+    path("<str:kind>/", operations, name="api_operations"),
+    path("<str:kind>/status", operations_status, name="api_operations_status"),
+]
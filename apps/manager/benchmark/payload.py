@@ -0,0 +1,27 @@
+import random
+
+BLOCK_SIZE = 64 * 1024
+
+# Сжимаемая часть блока похожа на plain-дамп: повторяющиеся INSERT-строки
+SQL_LINE = b"INSERT INTO public.benchmark (id, name, created_dt) VALUES (42, 'synthetic row', now());\n"
+
+
+def write_payload(path, size, compressibility, seed=0):
+    """
+    Пишет синтетический дамп размером size байт.
+
+    compressibility — доля каждого блока, заполненная повторяющимся SQL
+    (0 — случайные байты, не сжимаются; 1 — сжимаются почти полностью).
+    При одинаковом seed содержимое одинаковое, прогоны сравнимы между собой.
+    """
+    rnd = random.Random(seed)
+    text_size = int(BLOCK_SIZE * compressibility)
+    text = (SQL_LINE * (text_size // len(SQL_LINE) + 1))[:text_size]
+    written = 0
+    with open(path, "wb") as f:
+        while written < size:
+            block = text + rnd.randbytes(BLOCK_SIZE - text_size)
+            block = block[:size - written]
+            f.write(block)
+            written += len(block)
+    return written
@@ -0,0 +1,256 @@
+import filecmp
+import json
+import os
+import resource
+import shutil
+import statistics
+import time
+
+from manager.services.databases.postgres import PostgresqlService
+from manager.services.encryption_service import DumpCipher
+from manager.services.manifest_service import LAYOUT_PG_BASEBACKUP_TAR
+from manager.services.process import Pipe, run_tool
+
+MB = 1024 * 1024
+
+# Режим — как дамп готовится к загрузке и как потребляется при восстановлении.
+# transform: утилита, через которую дамп проходит перед загрузкой (None — без обработки);
+# restore: утилита, которой скачанный файл подаётся на stdin, как psql/mysql при загрузке;
+# encrypt: дамп шифруется при загрузке и расшифровывается при скачивании (ключ хранилища).
+MODES = {
+    "plain": {
+        "transform": None,
+        "suffix": "",
+        "restore": ["sh", "-c", "cat > /dev/null"],
+    },
+    "gzip": {
+        "transform": ["gzip", "-1", "-c"],
+        "suffix": ".gz",
+        "restore": ["sh", "-c", "gzip -dc > /dev/null"],
+    },
+    "gzip-encrypted": {
+        "transform": ["gzip", "-1", "-c"],
+        "suffix": ".gz",
+        "restore": ["sh", "-c", "gzip -dc > /dev/null"],
+        "encrypt": True,
+    },
+}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class _Counter:
+    """Колбэк прогресса без записи в БД — чтобы накладные расходы колбэков попали в замер."""
+
+    def __init__(self):
+        self.done = 0
+
+    def add(self, count):
+        self.done += count
+
+    def set(self, done, total=None):
+        self.done = done
+
+
+def _reset_peak_rss():
+    # "5" в clear_refs сбрасывает VmHWM — пик RSS меряется для каждой стадии отдельно
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_kb():
+    return _status_kb("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(stage, nbytes, func):
+    _reset_peak_rss()
+    rss_before = _status_kb("VmRSS")
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return result, {
+        "stage": stage,
+        "bytes": nbytes,
+        "seconds": seconds,
+        "cpu_user": self_after.ru_utime - self_before.ru_utime,
+        "cpu_system": self_after.ru_stime - self_before.ru_stime,
+        "tool_cpu": (children_after.ru_utime + children_after.ru_stime
+                     - children_before.ru_utime - children_before.ru_stime),
+        "peak_rss_kb": _peak_rss_kb(),
+        "rss_before_kb": rss_before,
+    }
+
+
+def run_scenario(stand_in, mode, payload_path, workdir):
+    """Один прогон dump → [transform] → upload → download → restore. Возвращает стадии."""
+    config = MODES[mode]
+    operation_id = f"benchmark-{stand_in.name}-{mode}-{os.getpid()}"
+    service = stand_in.service()
+    counter = _Counter()
+    cipher = DumpCipher(os.urandom(32)) if config.get("encrypt") else None
+    stages = []
+
+    dump_path = os.path.join(workdir, f"dump_{operation_id}.sql")
+    _, stat = _measure("dump", os.path.getsize(payload_path),
+                       lambda: run_tool(["cat", payload_path], stdout_path=dump_path))
+    stages.append(stat)
+
+    upload_path = dump_path
+    if config["transform"]:
+        upload_path = dump_path + config["suffix"]
+        _, stat = _measure("transform", os.path.getsize(dump_path),
+                           lambda: run_tool(config["transform"] + [dump_path], stdout_path=upload_path))
+        stat["bytes_out"] = os.path.getsize(upload_path)
+        stages.append(stat)
+
+    size = os.path.getsize(upload_path)
+    (remote_path, error), stat = _measure(
+        "upload", size, lambda: service.upload_dump(upload_path, operation_id, progress=counter, cipher=cipher))
+    if error:
+        raise BenchmarkError(f"upload failed: {error}")
+    stages.append(stat)
+
+    download_dir = os.path.join(workdir, "download")
+    os.makedirs(download_dir, exist_ok=True)
+    (local_path, error), stat = _measure(
+        "download", size, lambda: service.download_dump(remote_path, download_dir, progress=counter, cipher=cipher))
+    if error:
+        raise BenchmarkError(f"download failed: {error}")
+    stages.append(stat)
+
+    if not filecmp.cmp(upload_path, local_path, shallow=False):
+        raise BenchmarkError("downloaded file differs from the uploaded one")
+
+    _, stat = _measure("restore", size, lambda: run_tool(config["restore"], stdin_path=local_path))
+    stages.append(stat)
+
+    service.delete_dump(remote_path)
+    for path in {dump_path, upload_path, local_path}:
+        os.remove(path)
+    return stages
+
+
+def run_base_backup_scenario(postgres, stand_in, rows, workdir):
+    """
+    Один прогон физической копии: pg_basebackup → загрузка потоком → скачивание
+    с распаковкой потоком, как у задач в режиме базовых копий. Восстановленный
+    каталог запускается вторым сервером, и в нём пересчитываются строки.
+    """
+    operation_id = f"benchmark-{stand_in.name}-basebackup-{os.getpid()}"
+    service = stand_in.service()
+    db_interface = PostgresqlService()
+    size = db_interface.cluster_size(postgres.connection_string())
+    counter = _Counter()
+    stages = []
+
+    def backup():
+        pipe = Pipe(lambda out: db_interface.stream_base_backup(postgres.connection_string(), out, progress=counter))
+        with pipe as stream:
+            remote_path, error = service.upload_fileobj(stream, f"{operation_id}.tar.gz", size_hint=size)
+        return remote_path, error or pipe.result[2]
+
+    (remote_path, error), stat = _measure("base_backup_upload", size, backup)
+    if error:
+        raise BenchmarkError(f"base backup failed: {error}")
+    stat["bytes_out"] = counter.done
+    stages.append(stat)
+
+    data_dir = os.path.join(workdir, f"restored_{os.getpid()}")
+
+    def restore():
+        pipe = Pipe(lambda out: service.download_fileobj(remote_path, out))
+        with pipe as stream:
+            _, error = db_interface.unpack_base_backup(stream, data_dir, LAYOUT_PG_BASEBACKUP_TAR)
+        return pipe.result if pipe.result and not pipe.interrupted else error
+
+    error, stat = _measure("download_unpack", counter.done, restore)
+    if error:
+        raise BenchmarkError(f"restore failed: {error}")
+    stages.append(stat)
+
+    try:
+        restored_rows = postgres.count_restored(data_dir)
+    finally:
+        service.delete_dump(remote_path)
+        shutil.rmtree(data_dir, ignore_errors=True)
+    if restored_rows != rows:
+        raise BenchmarkError(f"restored cluster has {restored_rows} rows instead of {rows}")
+    return stages
+
+
+def run_forked(func):
+    """
+    Выполняет func() в форкнутом процессе и возвращает её результат (JSON-совместимый).
+
+    Свой процесс на прогон — чтобы пик RSS и CPU клиента не смешивались
+    с серверами-заменителями и с предыдущими прогонами.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            data = {"result": func()}
+        except BaseException as e:
+            data = {"error": f"{type(e).__name__}: {e}"}
+        with os.fdopen(write_fd, "w") as f:
+            json.dump(data, f)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        raw = f.read()
+    os.waitpid(pid, 0)
+    if not raw:
+        raise BenchmarkError("benchmark process exited without a result")
+    data = json.loads(raw)
+    if "error" in data:
+        raise BenchmarkError(data["error"])
+    return data["result"]
+
+
+def summarize(runs):
+    """Медиана по повторам для времени и CPU, максимум для памяти."""
+    summary = []
+    for stage_runs in zip(*runs):
+        first = stage_runs[0]
+        seconds = statistics.median(run["seconds"] for run in stage_runs)
+        stage = {
+            "stage": first["stage"],
+            "bytes": first["bytes"],
+            "seconds": round(seconds, 4),
+            "mb_s": round(first["bytes"] / MB / seconds, 2) if seconds > 0 else None,
+            "cpu_user": round(statistics.median(run["cpu_user"] for run in stage_runs), 4),
+            "cpu_system": round(statistics.median(run["cpu_system"] for run in stage_runs), 4),
+            "tool_cpu": round(statistics.median(run["tool_cpu"] for run in stage_runs), 4),
+            "peak_rss_kb": max(run["peak_rss_kb"] for run in stage_runs),
+            # прирост относительно начала стадии: без памяти, унаследованной при fork
+            "peak_rss_growth_kb": max(
+                run["peak_rss_kb"] - run["rss_before_kb"] if run["rss_before_kb"] else 0
+                for run in stage_runs
+            ),
+        }
+        if "bytes_out" in first:
+            stage["bytes_out"] = first["bytes_out"]
+        summary.append(stage)
+    return summary
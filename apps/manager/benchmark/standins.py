@@ -0,0 +1,384 @@
+"""
+Локальные заменители хранилищ для бенчмарка.
+
+Каждый заменитель поднимает сервер в потоках текущего процесса (или подменяет
+клиента, как для Яндекс Диска) и отдаёт несохранённый FileStorage, по которому
+get_storage_service строит обычный сервис — через него и идёт замер.
+PostgresStandIn — локальный кластер PostgreSQL для физических копий.
+"""
+import logging
+import os
+import shutil
+import socket
+import threading
+
+import boto3
+import paramiko
+import psycopg2
+
+from manager.choices import DBType
+from manager.models import FileStorage, UserDatabase
+from manager.services.databases.postgres import PG_BASEBACKUP
+from manager.services.process import run_tool
+from manager.services.storage_factory import get_storage_service
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark"
+
+
+class BackendUnavailable(Exception):
+    """Для заменителя не установлена библиотека — бэкенд пропускается."""
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StandIn:
+    name = None
+
+    def __init__(self, root):
+        self.root = os.path.join(root, self.name)
+        os.makedirs(self.root, exist_ok=True)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def storage(self):
+        raise NotImplementedError
+
+    def service(self):
+        return get_storage_service(self.storage())
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class S3StandIn(StandIn):
+    """moto в режиме сервера: настоящий HTTP, как у S3-совместимых хранилищ."""
+
+    name = "s3"
+    bucket = "benchmark"
+
+    def start(self):
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            raise BackendUnavailable("moto[server] is not installed")
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        self.port = _free_port()
+        self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=self.port, verbose=False)
+        self._server.start()
+        storage = self.storage()
+        boto3.client(
+            "s3", endpoint_url=storage.host,
+            aws_access_key_id=storage.access_key, aws_secret_access_key=storage.secret_key,
+        ).create_bucket(Bucket=self.bucket)
+
+    def stop(self):
+        self._server.stop()
+
+    def storage(self):
+        return FileStorage(
+            name=self.name, type=FileStorage.TYPE_S3, host=f"http://127.0.0.1:{self.port}",
+            bucket_name=self.bucket, access_key=USERNAME, secret_key=PASSWORD,
+        )
+
+
+class _SSHServer(paramiko.ServerInterface):
+    def check_auth_password(self, username, password):
+        if username == USERNAME and password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+
+class _SFTPServer(paramiko.SFTPServerInterface):
+    """SFTP поверх локального каталога root (пути клиента — относительно него)."""
+
+    def __init__(self, server, root, *args, **kwargs):
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip("/"))
+
+    def list_folder(self, path):
+        path = self._path(path)
+        try:
+            return [
+                paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)), name)
+                for name in os.listdir(path)
+            ]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._path(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(self._path(path), flags, 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _SFTPHandle(flags)
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._path(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+
+class SFTPStandIn(StandIn):
+    """SFTP-сервер на paramiko в потоках этого процесса."""
+
+    name = "sftp"
+
+    def start(self):
+        logger = logging.getLogger("manager.benchmark.sftp")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        self._host_key = paramiko.RSAKey.generate(2048)
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self._sock.settimeout(0.5)
+        self.port = self._sock.getsockname()[1]
+        self._transports = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            # разрыв соединения клиентом — штатное завершение, а не ошибка сервера
+            transport.set_log_channel("manager.benchmark.sftp")
+            transport.add_server_key(self._host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, _SFTPServer, self.root)
+            transport.start_server(server=_SSHServer())
+            self._transports.append(transport)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._sock.close()
+        for transport in self._transports:
+            transport.close()
+
+    def storage(self):
+        return FileStorage(
+            name=self.name, type=FileStorage.TYPE_SFTP, host=f"127.0.0.1:{self.port}",
+            bucket_name="/", access_key=USERNAME, secret_key=PASSWORD,
+        )
+
+
+class FTPStandIn(StandIn):
+    """FTP-сервер на pyftpdlib в отдельном потоке."""
+
+    name = "ftp"
+
+    def start(self):
+        try:
+            from pyftpdlib.authorizers import DummyAuthorizer
+            from pyftpdlib.handlers import FTPHandler
+            from pyftpdlib.servers import FTPServer
+        except ImportError:
+            raise BackendUnavailable("pyftpdlib is not installed")
+        # без своего обработчика pyftpdlib при старте цикла включает вывод INFO в stderr
+        logger = logging.getLogger("pyftpdlib")
+        if not logger.handlers:
+            logger.addHandler(logging.NullHandler())
+        logger.setLevel(logging.WARNING)
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(USERNAME, PASSWORD, self.root, perm="elradfmwMT")
+        handler = type("BenchmarkFTPHandler", (FTPHandler,), {"authorizer": authorizer})
+        self._server = FTPServer(("127.0.0.1", 0), handler)
+        self.port = self._server.address[1]
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            self._server.ioloop.loop(timeout=0.5, blocking=False)
+        self._server.close_all()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def storage(self):
+        return FileStorage(
+            name=self.name, type=FileStorage.TYPE_FTP, host=f"127.0.0.1:{self.port}",
+            bucket_name="/", access_key=USERNAME, secret_key=PASSWORD,
+        )
+
+
+class _LocalYaDisk:
+    """Подмена клиента yadisk.YaDisk: те же вызовы, файлы в локальном каталоге."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def exists(self, path):
+        return os.path.exists(self._path(path))
+
+    def mkdir(self, path):
+        os.mkdir(self._path(path))
+
+    def upload(self, fileobj, path):
+        with open(self._path(path), "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def download(self, path, fileobj):
+        with open(self._path(path), "rb") as f:
+            shutil.copyfileobj(f, fileobj)
+
+    def remove(self, path, permanently=False):
+        os.remove(self._path(path))
+
+
+class YandexDiskStandIn(StandIn):
+    """
+    Яндекс Диск без сети: сервис настоящий, клиент подменён. Замер показывает
+    накладные расходы сервиса и обёрток прогресса, но не REST API Диска.
+    """
+
+    name = "yadisk"
+
+    def storage(self):
+        return FileStorage(name=self.name, type=FileStorage.TYPE_YADISK, secret_key=PASSWORD)
+
+    def service(self):
+        service = super().service()
+        service._y = _LocalYaDisk(self.root)
+        return service
+
+
+STAND_INS = {cls.name: cls for cls in (S3StandIn, SFTPStandIn, FTPStandIn, YandexDiskStandIn)}
+
+
+class PostgresStandIn(StandIn):
+    """
+    Кластер PostgreSQL из initdb на свободном порту: pg_basebackup и распаковка
+    копии проверяются на настоящем сервере, а восстановленный каталог
+    запускается вторым сервером. Нужны серверные утилиты рядом с pg_basebackup.
+    """
+
+    name = "postgres"
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.bin_dir = os.path.dirname(PG_BASEBACKUP)
+        self.data_dir = os.path.join(self.root, "data")
+        self.port = None
+
+    def _tool(self, name):
+        return os.path.join(self.bin_dir, name)
+
+    def start(self):
+        if not os.path.exists(self._tool("initdb")):
+            raise BackendUnavailable(f"PostgreSQL server is not installed in {self.bin_dir}")
+        if os.geteuid() == 0:
+            raise BackendUnavailable("PostgreSQL server refuses to run as root")
+        # trust для 127.0.0.1, включая подключения репликации (их использует pg_basebackup)
+        run_tool([self._tool("initdb"), "-D", self.data_dir, "-U", USERNAME, "--auth=trust", "--no-sync"])
+        self.port = self._pg_ctl_start(self.data_dir)
+
+    def _pg_ctl_start(self, data_dir):
+        port = _free_port()
+        options = f"-p {port} -c listen_addresses=127.0.0.1 -c unix_socket_directories={self.root} -c fsync=off"
+        run_tool([self._tool("pg_ctl"), "-D", data_dir, "-o", options, "-w",
+                  "-l", os.path.join(self.root, f"{os.path.basename(data_dir)}.log"), "start"])
+        return port
+
+    def _pg_ctl_stop(self, data_dir):
+        run_tool([self._tool("pg_ctl"), "-D", data_dir, "-m", "fast", "-w", "stop"])
+
+    def stop(self):
+        if self.port:
+            self._pg_ctl_stop(self.data_dir)
+            self.port = None
+
+    def connection_string(self, port=None):
+        return f"postgresql://{USERNAME}@127.0.0.1:{port or self.port}/postgres"
+
+    def database(self):
+        return UserDatabase(name=self.name, db_type=DBType.POSTGRESQL, connection_string=self.connection_string())
+
+    def load(self, size):
+        """Таблица benchmark примерно на size байт; возвращает число строк."""
+        rows = max(1, size // 200)
+        with psycopg2.connect(self.connection_string()) as conn:
+            with conn.cursor() as cur:
+                cur.execute("DROP TABLE IF EXISTS benchmark")
+                cur.execute("CREATE TABLE benchmark AS SELECT g AS id, repeat(md5(g::text), 4) AS data "
+                            "FROM generate_series(1, %s) g", [rows])
+        return rows
+
+    def count_restored(self, data_dir):
+        """Запускает восстановленный каталог вторым сервером и считает строки benchmark."""
+        port = self._pg_ctl_start(data_dir)
+        try:
+            with psycopg2.connect(self.connection_string(port)) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT count(*) FROM benchmark")
+                    return cur.fetchone()[0]
+        finally:
+            self._pg_ctl_stop(data_dir)
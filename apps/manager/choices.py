@@ -15,8 +15,32 @@ class DumpTaskPeriodsChoices(IntegerChoices):
     EVERYMONTH = 4, _('Every month')
 
 
+class BackupModeChoices(IntegerChoices):
+    LOGICAL = 1, _('Logical dump')
+    PITR = 2, _('Base backup + WAL archive (point-in-time recovery)')
+    PHYSICAL = 3, _('Base backup (physical copy of the cluster)')
+    BINLOG = 4, _('Logical dump + binlog archive (point-in-time recovery)')
+
+
 class DumpOperationStatusChoices(IntegerChoices):
     CREATED = 1, _('Created')
     IN_PROCESS = 2, _('In Process')
     FAIL = 3, _('Fail')
     SUCCESS = 4, _('Success')
+
+
+class OperationPhaseChoices(IntegerChoices):
+    CONNECTION_CHECK = 1, _('Connection check')
+    DUMP = 2, _('Dump')
+    TRANSFORM = 3, _('Transform')
+    UPLOAD = 4, _('Upload')
+    RETENTION = 5, _('Retention')
+    DOWNLOAD = 6, _('Download')
+    LOAD = 7, _('Load')
+    VERIFY = 8, _('Verify')
+
+
+class ProfileModeChoices(IntegerChoices):
+    OFF = 0, _('Off')
+    CPROFILE = 1, _('cProfile')
+    SAMPLING = 2, _('Sampling (collapsed stacks)')
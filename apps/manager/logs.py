@@ -0,0 +1,50 @@
+import json
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_operation_id = ContextVar("operation_id", default=None)
+_log_tail = ContextVar("log_tail", default=None)
+
+
+@contextmanager
+def operation_logging(operation_id):
+    """
+    Всё, что логируется внутри блока, помечается operation_id, а stderr утилит
+    собирается в кольцевой буфер последних BACKUP_LOG_TAIL_LINES строк операции.
+    """
+    id_token = _operation_id.set(str(operation_id))
+    tail_token = _log_tail.set(deque(maxlen=settings.BACKUP_LOG_TAIL_LINES))
+    try:
+        yield
+    finally:
+        _operation_id.reset(id_token)
+        _log_tail.reset(tail_token)
+
+
+def current_log_tail():
+    """Буфер stderr текущей операции (None вне operation_logging)."""
+    return _log_tail.get()
+
+
+class OperationFilter(logging.Filter):
+    def filter(self, record):
+        record.operation_id = _operation_id.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "operation_id": getattr(record, "operation_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
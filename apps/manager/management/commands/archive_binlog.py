@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from manager.services.binlog_service import BinlogArchiver
+
+
+class Command(BaseCommand):
+    help = 'Stream binary logs of MySQL tasks in binlog archive mode to their file storages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Upload already received binlog files and exit')
+
+    def handle(self, *args, **options):
+        print("Binlog archiver started")
+        BinlogArchiver().run(once=options['once'])
+        print("Binlog archiver finished")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from manager.services.wal_service import WalArchiver
+
+
+class Command(BaseCommand):
+    help = 'Stream WAL of PostgreSQL tasks in point-in-time recovery mode to their file storages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Upload already received WAL segments and exit')
+
+    def handle(self, *args, **options):
+        print("WAL archiver started")
+        WalArchiver().run(once=options['once'])
+        print("WAL archiver finished")
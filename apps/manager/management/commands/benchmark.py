@@ -0,0 +1,151 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from importlib import metadata
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from manager.benchmark.payload import write_payload
+from manager.benchmark.runner import (MB, MODES, BenchmarkError, run_base_backup_scenario, run_forked,
+                                      run_scenario, summarize)
+from manager.benchmark.standins import STAND_INS, BackendUnavailable, PostgresStandIn
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _versions():
+    versions = {}
+    for package in ("boto3", "paramiko", "yadisk", "moto", "pyftpdlib"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+class Command(BaseCommand):
+    help = ('Benchmark dump -> upload -> download -> restore against local stand-ins '
+            'of every storage backend and print the results as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=256, help='Synthetic dump size in MB')
+        parser.add_argument('--compressibility', type=float, default=0.5,
+                            help='Share of each block filled with repetitive SQL, 0..1')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random part of the payload')
+        parser.add_argument('--backends', type=_csv, default=list(STAND_INS),
+                            help=f'Comma-separated subset of: {", ".join(STAND_INS)}')
+        parser.add_argument('--modes', type=_csv, default=list(MODES),
+                            help=f'Comma-separated subset of: {", ".join(MODES)}')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per backend and mode (median is reported)')
+        parser.add_argument('--workdir', default=settings.BACKUP_SPOOL_DIR,
+                            help='Directory for the payload and the stand-in storage')
+        parser.add_argument('--output', help='Write JSON to this file instead of stdout')
+        parser.add_argument('--basebackup', action='store_true',
+                            help='Also stream pg_basebackup of a local PostgreSQL cluster (--size MB) '
+                                 'to every backend and restore it')
+
+    def handle(self, *args, **options):
+        unknown = set(options['backends']) - set(STAND_INS) | set(options['modes']) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown backends/modes: {', '.join(sorted(unknown))}")
+        if not 0 <= options['compressibility'] <= 1:
+            raise CommandError("--compressibility must be between 0 and 1")
+
+        root = tempfile.mkdtemp(prefix="backup_manager_benchmark_", dir=options['workdir'])
+        try:
+            report = self._run(root, options)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+        data = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], "w") as f:
+                f.write(data + "\n")
+        else:
+            print(data)
+
+    def _run(self, root, options):
+        payload_path = os.path.join(root, "payload.sql")
+        write_payload(payload_path, options['size'] * MB, options['compressibility'], options['seed'])
+        workdir = os.path.join(root, "work")
+        os.makedirs(workdir)
+
+        report = {
+            "started_dt": timezone.now().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+            "payload": {
+                "size": options['size'] * MB,
+                "compressibility": options['compressibility'],
+                "seed": options['seed'],
+            },
+            "repeat": options['repeat'],
+            "results": [],
+        }
+
+        postgres = rows = None
+        if options['basebackup']:
+            postgres = PostgresStandIn(root)
+            try:
+                postgres.start()
+                rows = postgres.load(options['size'] * MB)
+            except BackendUnavailable as e:
+                self.stderr.write(f"basebackup: skipped ({e})")
+                report["results"].append({"mode": "basebackup", "skipped": str(e)})
+                postgres = None
+        try:
+            for backend in options['backends']:
+                self._run_backend(backend, root, options, payload_path, workdir, postgres, rows, report)
+        finally:
+            if postgres:
+                postgres.stop()
+        return report
+
+    def _run_backend(self, backend, root, options, payload_path, workdir, postgres, rows, report):
+        stand_in = STAND_INS[backend](os.path.join(root, "storage"))
+        try:
+            stand_in.start()
+        except BackendUnavailable as e:
+            self.stderr.write(f"{backend}: skipped ({e})")
+            report["results"].append({"backend": backend, "skipped": str(e)})
+            return
+        scenarios = {
+            mode: (lambda mode=mode: run_scenario(stand_in, mode, payload_path, workdir))
+            for mode in options['modes']
+        }
+        if postgres:
+            scenarios["basebackup"] = lambda: run_base_backup_scenario(postgres, stand_in, rows, workdir)
+        try:
+            for mode, scenario in scenarios.items():
+                self.stderr.write(f"{backend}/{mode}: running")
+                result = {"backend": backend, "mode": mode}
+                try:
+                    runs = [run_forked(scenario) for _ in range(options['repeat'])]
+                    result["stages"] = summarize(runs)
+                    result["total_seconds"] = round(sum(stage["seconds"] for stage in result["stages"]), 4)
+                except BenchmarkError as e:
+                    self.stderr.write(f"{backend}/{mode}: failed ({e})")
+                    result["error"] = str(e)
+                report["results"].append(result)
+        finally:
+            stand_in.stop()
@@ -1,17 +1,37 @@
 from datetime import datetime
 
 from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 
 from manager.models import DumpTask, DumpTaskOperation
 from manager.choices import DumpTaskPeriodsChoices
 from manager.services.backup_service import BackupService
+from manager.services.metrics_service import compact_metrics
+from manager.services.queue_service import is_queue_mode
+from manager.services.workspace_service import WorkspaceService
 
 
 class Command(BaseCommand):
     help = 'Check and execute dump operations'
 
+    def _enqueue_dump(self, task):
+        # cron запускается на каждой ноде: плановый дамп периода ставим только один раз.
+        # Ключ расписания уникален в задаче, ручные запуски (без ключа) этому не мешают
+        schedule_key = f"{task.task_period}:{timezone.localdate().isoformat()}"
+        try:
+            with transaction.atomic():
+                new_operation = DumpTaskOperation.objects.create(task=task, schedule_key=schedule_key)
+        except IntegrityError:
+            print(f"Task {task.id} already queued for {schedule_key}")
+            return
+        print(f"New operation {task.id} queued: ", {new_operation.id})
+
     def _process_dump(self, task):
         print("Process task:", task.id)
+        if is_queue_mode():
+            self._enqueue_dump(task)
+            return
         new_operation = DumpTaskOperation.objects.create(
             task=task,
         )
@@ -21,6 +41,8 @@ class Command(BaseCommand):
 
 
     def handle(self, *args, **options):
+        WorkspaceService().cleanup_stale()
+        compact_metrics()
         every_day_tasks = DumpTask.objects.filter(task_period=DumpTaskPeriodsChoices.EVERYDAY)
         for task in every_day_tasks:
             self._process_dump(task)
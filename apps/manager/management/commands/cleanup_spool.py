@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from manager.services.metrics_service import compact_metrics
+from manager.services.workspace_service import WorkspaceService
+
+
+class Command(BaseCommand):
+    help = 'Remove workspaces left in the spool by crashed operations and compact their metric files'
+
+    def handle(self, *args, **options):
+        removed = WorkspaceService().cleanup_stale()
+        print(f"Removed stale workspaces: {removed}")
+        print(f"Compacted metric files: {compact_metrics()}")
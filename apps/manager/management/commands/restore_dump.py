@@ -1,19 +1,34 @@
 from django.core.management.base import BaseCommand
 
 
+from manager.choices import ProfileModeChoices
 from manager.services.backup_service import BackupService
+from manager.services.queue_service import run_operations
+from manager.services.workspace_service import WorkspaceService
 
 
 class Command(BaseCommand):
     help = 'Operation of restore dump'
 
     def add_arguments(self, parser):
-        parser.add_argument('operation_id', type=str, help='Operation Id')
+        parser.add_argument('operation_ids', nargs='+', type=str,
+                            help='Operation Ids (several run as a pool of BACKUP_DISPATCH_CONCURRENCY processes)')
+        parser.add_argument('--profile', choices=['cprofile', 'sampling'],
+                            help='Profile the restore run (by default the task setting is used)')
 
 
     def handle(self, *args, **options):
-        operation_id = options['operation_id']
-        backup_service = BackupService(operation_id)
+        operation_ids = options['operation_ids']
+        WorkspaceService().cleanup_stale()
+        if len(operation_ids) > 1:
+            results = run_operations(
+                'restore_dump', operation_ids, ['--profile', options['profile']] if options['profile'] else [])
+            failed = sum(1 for code in results.values() if code)
+            self.stdout.write(f"Operations run: {len(results)}, crashed: {failed}")
+            return
+
+        profile_mode = ProfileModeChoices[options['profile'].upper()] if options['profile'] else None
+        backup_service = BackupService(operation_ids[0], profile_mode=profile_mode)
         backup_service.restore_dump()
 
         # Проверка на max_cnt_keep
@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from manager.models import DumpTaskOperation
+from manager.services.backup_service import BackupService
+from manager.services.queue_service import (WORKER_ID, Lease, LeaseLost,
+                                            QueueService)
+from manager.services.workspace_service import WorkspaceService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Claim queued dump/restore operations from the shared database and execute them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        WorkspaceService().cleanup_stale()
+        queue_service = QueueService()
+        print(f"Worker {WORKER_ID} started")
+        while True:
+            close_old_connections()
+            model, operation_id = queue_service.claim_next()
+            if not operation_id:
+                if options['once']:
+                    break
+                time.sleep(settings.BACKUP_WORKER_POLL_INTERVAL)
+                continue
+
+            print(f"Worker {WORKER_ID} claimed {model.__name__} {operation_id}")
+            try:
+                with Lease(model, operation_id) as lease:
+                    backup_service = BackupService(str(operation_id), lease=lease)
+                    if model is DumpTaskOperation:
+                        backup_service.make_dump()
+                    else:
+                        backup_service.restore_dump()
+            except LeaseLost:
+                # операцию уже ведёт другой воркер: её статус не трогаем
+                print(f"Worker {WORKER_ID} lost the lease of {model.__name__} {operation_id}")
+            except Exception:
+                # операцию уже пометил FAIL Lease.__exit__; воркер берёт следующую
+                logger.exception("Worker %s crashed on %s %s", WORKER_ID, model.__name__, operation_id)
+        print(f"Worker {WORKER_ID} finished")
@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from manager.services.workspace_service import WorkspaceService
+
+
+class Command(BaseCommand):
+    help = 'Show spool usage as JSON'
+
+    def handle(self, *args, **options):
+        print(json.dumps(WorkspaceService().usage(), indent=2))
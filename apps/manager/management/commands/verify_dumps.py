@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+
+from manager.choices import DumpOperationStatusChoices
+from manager.models import VerificationOperation
+from manager.services.backup_service import BackupService
+from manager.services.verification_service import (run_verifications,
+                                                   schedule_verifications)
+from manager.services.workspace_service import WorkspaceService
+
+
+class Command(BaseCommand):
+    help = ('Verify dumps by restoring them into the verification database of their task. '
+            'Without ids, schedules verifications of the latest dumps and runs all pending ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('operation_ids', nargs='*', type=str, help='Verification operation Ids')
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help='Verifications running at once (BACKUP_VERIFY_CONCURRENCY by default)')
+
+    def handle(self, *args, **options):
+        operation_ids = options['operation_ids']
+        WorkspaceService().cleanup_stale()
+
+        if len(operation_ids) == 1:
+            BackupService(operation_ids[0]).verify_dump()
+            return
+
+        if not operation_ids:
+            schedule_verifications()
+            operation_ids = [
+                str(operation_id) for operation_id in VerificationOperation.objects.filter(
+                    status=DumpOperationStatusChoices.CREATED).order_by("created_dt").values_list("id", flat=True)
+            ]
+        results = run_verifications(operation_ids, options['concurrency'])
+        failed = sum(1 for code in results.values() if code)
+        self.stdout.write(f"Verifications run: {len(results)}, crashed: {failed}")
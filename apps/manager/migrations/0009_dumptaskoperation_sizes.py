@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0008_alter_filestorage_access_key_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='dump_size',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Dump file size'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='source_size',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Source database size'),
+        ),
+    ]
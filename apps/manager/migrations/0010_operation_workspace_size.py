@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0009_dumptaskoperation_sizes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='workspace_size',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Peak workspace size'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='workspace_size',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Peak workspace size'),
+        ),
+    ]
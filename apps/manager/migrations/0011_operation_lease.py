@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0010_operation_workspace_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Attempts'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='lease_expires_dt',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Lease expires at'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='lease_owner',
+            field=models.CharField(blank=True, default=None, max_length=255, null=True, verbose_name='Lease owner'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Attempts'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='lease_expires_dt',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Lease expires at'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='lease_owner',
+            field=models.CharField(blank=True, default=None, max_length=255, null=True, verbose_name='Lease owner'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0011_operation_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationPhase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.IntegerField(choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load')], verbose_name='Phase')),
+                ('is_success', models.BooleanField(default=True, verbose_name='Success')),
+                ('started_dt', models.DateTimeField(verbose_name='Started at')),
+                ('finished_dt', models.DateTimeField(verbose_name='Finished at')),
+                ('duration', models.FloatField(verbose_name='Duration, s')),
+                ('bytes_in', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes in')),
+                ('bytes_out', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes out')),
+                ('throughput', models.FloatField(blank=True, default=None, null=True, verbose_name='Throughput, bytes/s')),
+                ('dump_operation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='phases', to='manager.dumptaskoperation')),
+                ('recover_operation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='phases', to='manager.recoverbackupoperation')),
+            ],
+            options={
+                'verbose_name': 'Operation Phase',
+                'verbose_name_plural': 'Operation Phases',
+                'ordering': ['started_dt'],
+                'indexes': [models.Index(fields=['phase', 'started_dt'], name='manager_ope_phase_04e3d1_idx')],
+            },
+        ),
+    ]
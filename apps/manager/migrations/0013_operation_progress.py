@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0012_operationphase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='progress_bytes',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes done'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='progress_phase',
+            field=models.IntegerField(blank=True, choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load')], default=None, null=True, verbose_name='Progress phase'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='progress_rate',
+            field=models.FloatField(blank=True, default=None, null=True, verbose_name='Rate, bytes/s'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='progress_total',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes total'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='progress_updated_dt',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Progress updated at'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='progress_bytes',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes done'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='progress_phase',
+            field=models.IntegerField(blank=True, choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load')], default=None, null=True, verbose_name='Progress phase'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='progress_rate',
+            field=models.FloatField(blank=True, default=None, null=True, verbose_name='Rate, bytes/s'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='progress_total',
+            field=models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes total'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='progress_updated_dt',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='Progress updated at'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0013_operation_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptask',
+            name='profile_mode',
+            field=models.IntegerField(choices=[(0, 'Off'), (1, 'cProfile'), (2, 'Sampling (collapsed stacks)')], default=0, help_text='Profile every dump and restore of this task', verbose_name='Profiling'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='profile_path',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=1024, null=True, verbose_name='Profile'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='profile_path',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=1024, null=True, verbose_name='Profile'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0014_operation_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ToolInvocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phase', models.IntegerField(choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load')], verbose_name='Phase')),
+                ('tool', models.CharField(max_length=255, verbose_name='Tool')),
+                ('returncode', models.IntegerField(blank=True, default=None, null=True, verbose_name='Return code')),
+                ('started_dt', models.DateTimeField(verbose_name='Started at')),
+                ('wall_time', models.FloatField(verbose_name='Wall time, s')),
+                ('cpu_user', models.FloatField(blank=True, default=None, null=True, verbose_name='User CPU, s')),
+                ('cpu_system', models.FloatField(blank=True, default=None, null=True, verbose_name='System CPU, s')),
+                ('max_rss', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Max RSS, bytes')),
+                ('read_bytes', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Read from storage, bytes')),
+                ('write_bytes', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Written to storage, bytes')),
+                ('dump_operation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tool_invocations', to='manager.dumptaskoperation')),
+                ('recover_operation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tool_invocations', to='manager.recoverbackupoperation')),
+            ],
+            options={
+                'verbose_name': 'Tool Invocation',
+                'verbose_name_plural': 'Tool Invocations',
+                'ordering': ['started_dt'],
+                'indexes': [models.Index(fields=['tool', 'started_dt'], name='manager_too_tool_face48_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0015_toolinvocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='log_tail',
+            field=models.TextField(blank=True, default=None, editable=False, null=True, verbose_name='Tool output (tail)'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='log_tail',
+            field=models.TextField(blank=True, default=None, editable=False, null=True, verbose_name='Tool output (tail)'),
+        ),
+    ]
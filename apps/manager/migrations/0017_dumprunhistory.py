@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0016_operation_log_tail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DumpRunHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_id', models.CharField(max_length=100, verbose_name='Operation')),
+                ('created_dt', models.DateTimeField(auto_now_add=True, verbose_name='Finished at')),
+                ('is_success', models.BooleanField(verbose_name='Success')),
+                ('source_size', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Database size')),
+                ('dump_size', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Dump size')),
+                ('duration', models.FloatField(verbose_name='Duration, s')),
+                ('dump_duration', models.FloatField(blank=True, default=None, null=True, verbose_name='Dump duration, s')),
+                ('upload_duration', models.FloatField(blank=True, default=None, null=True, verbose_name='Upload duration, s')),
+                ('throughput', models.FloatField(blank=True, default=None, null=True, verbose_name='Throughput, bytes/s')),
+                ('baseline_duration', models.FloatField(blank=True, default=None, null=True, verbose_name='Baseline duration, s')),
+                ('baseline_size', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Baseline dump size')),
+                ('duration_regression', models.BooleanField(default=False, verbose_name='Duration regression')),
+                ('size_regression', models.BooleanField(default=False, verbose_name='Size deviation')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_history', to='manager.dumptask')),
+            ],
+            options={
+                'verbose_name': 'Dump Run History',
+                'verbose_name_plural': 'Dump Run History',
+                'ordering': ['-created_dt'],
+                'indexes': [models.Index(fields=['task', 'created_dt'], name='manager_dum_task_id_49ccda_idx'), models.Index(fields=['task', 'is_success', 'created_dt'], name='manager_dum_task_id_021789_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0017_dumprunhistory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dumptaskoperation',
+            index=models.Index(fields=['task', 'status', 'created_dt'], name='manager_dum_task_id_01f2d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dumptaskoperation',
+            index=models.Index(fields=['status', 'created_dt'], name='manager_dum_status_56289e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dumptaskoperation',
+            index=models.Index(fields=['created_dt'], name='manager_dum_created_5d6edc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recoverbackupoperation',
+            index=models.Index(fields=['dump_operation', 'status', 'created_dt'], name='manager_rec_dump_op_b7af48_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recoverbackupoperation',
+            index=models.Index(fields=['status', 'created_dt'], name='manager_rec_status_9be21c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recoverbackupoperation',
+            index=models.Index(fields=['created_dt'], name='manager_rec_created_438297_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:39
+
+import manager.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0018_operation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Name')),
+                ('key', models.CharField(default=manager.models._generate_api_key, editable=False, max_length=64, unique=True, verbose_name='Key')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('created_dt', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+            ],
+            options={
+                'verbose_name': 'API Token',
+                'verbose_name_plural': 'API Tokens',
+            },
+        ),
+    ]
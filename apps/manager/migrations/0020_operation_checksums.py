@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0019_apitoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='checksum_blake2b',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=128, null=True, verbose_name='BLAKE2b checksum'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='checksum_sha256',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=64, null=True, verbose_name='SHA-256 checksum'),
+        ),
+    ]
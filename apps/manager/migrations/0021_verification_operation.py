@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0020_operation_checksums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptask',
+            name='verify_database',
+            field=models.ForeignKey(blank=True, help_text='Scratch database of the same type: dumps are restored into it and checked. All its data is replaced on every verification', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='manager.userdatabase', verbose_name='Verification database'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='manifest',
+            field=models.JSONField(blank=True, default=None, editable=False, null=True, verbose_name='Manifest'),
+        ),
+        migrations.AlterField(
+            model_name='dumptaskoperation',
+            name='progress_phase',
+            field=models.IntegerField(blank=True, choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load'), (8, 'Verify')], default=None, null=True, verbose_name='Progress phase'),
+        ),
+        migrations.AlterField(
+            model_name='operationphase',
+            name='phase',
+            field=models.IntegerField(choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load'), (8, 'Verify')], verbose_name='Phase'),
+        ),
+        migrations.AlterField(
+            model_name='recoverbackupoperation',
+            name='progress_phase',
+            field=models.IntegerField(blank=True, choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load'), (8, 'Verify')], default=None, null=True, verbose_name='Progress phase'),
+        ),
+        migrations.AlterField(
+            model_name='toolinvocation',
+            name='phase',
+            field=models.IntegerField(choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load'), (8, 'Verify')], verbose_name='Phase'),
+        ),
+        migrations.CreateModel(
+            name='VerificationOperation',
+            fields=[
+                ('id', models.CharField(db_index=True, default=uuid.uuid4, editable=False, max_length=100, primary_key=True, serialize=False)),
+                ('created_dt', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('updated_dt', models.DateTimeField(auto_now=True, verbose_name='Date of update')),
+                ('status', models.IntegerField(choices=[(1, 'Created'), (2, 'In Process'), (3, 'Fail'), (4, 'Success')], default=1, verbose_name='Status')),
+                ('error_text', models.TextField(blank=True, default=None, null=True, verbose_name='Error text')),
+                ('duration', models.FloatField(blank=True, default=None, null=True, verbose_name='Duration, s')),
+                ('latency', models.FloatField(blank=True, default=None, help_text='Time from the start of the dump to the end of its verification', null=True, verbose_name='Latency, s')),
+                ('checks', models.JSONField(blank=True, default=None, editable=False, null=True, verbose_name='Checks')),
+                ('workspace_size', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Peak workspace size')),
+                ('progress_phase', models.IntegerField(blank=True, choices=[(1, 'Connection check'), (2, 'Dump'), (3, 'Transform'), (4, 'Upload'), (5, 'Retention'), (6, 'Download'), (7, 'Load'), (8, 'Verify')], default=None, null=True, verbose_name='Progress phase')),
+                ('progress_bytes', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes done')),
+                ('progress_total', models.BigIntegerField(blank=True, default=None, null=True, verbose_name='Bytes total')),
+                ('progress_rate', models.FloatField(blank=True, default=None, null=True, verbose_name='Rate, bytes/s')),
+                ('progress_updated_dt', models.DateTimeField(blank=True, default=None, null=True, verbose_name='Progress updated at')),
+                ('log_tail', models.TextField(blank=True, default=None, editable=False, null=True, verbose_name='Tool output (tail)')),
+                ('dump_operation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verifications', to='manager.dumptaskoperation')),
+                ('target_database', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='manager.userdatabase', verbose_name='Verification database')),
+            ],
+            options={
+                'verbose_name': 'Verification Operation',
+                'verbose_name_plural': 'Verification Operations',
+            },
+        ),
+        migrations.AddField(
+            model_name='operationphase',
+            name='verification_operation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='phases', to='manager.verificationoperation'),
+        ),
+        migrations.AddField(
+            model_name='toolinvocation',
+            name='verification_operation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tool_invocations', to='manager.verificationoperation'),
+        ),
+        migrations.AddIndex(
+            model_name='verificationoperation',
+            index=models.Index(fields=['dump_operation', 'status', 'created_dt'], name='manager_ver_dump_op_741fec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='verificationoperation',
+            index=models.Index(fields=['status', 'created_dt'], name='manager_ver_status_a4ad62_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0021_verification_operation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='manifest_path',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=250, null=True, verbose_name='Manifest File Path'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0022_dump_manifest_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='tables',
+            field=models.JSONField(blank=True, default=None, help_text='Restore only these tables, e.g. ["orders", "customers"] (MySQL dumps with a table index). Empty — restore the whole dump', null=True, verbose_name='Tables'),
+        ),
+    ]
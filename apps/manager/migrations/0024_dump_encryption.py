@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0023_restore_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptask',
+            name='encryption_key',
+            field=models.CharField(blank=True, help_text='Overrides the encryption key of the storage for this task', max_length=64, null=True, verbose_name='Encryption key'),
+        ),
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='encryption_key_id',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=16, null=True, verbose_name='Encryption key id'),
+        ),
+        migrations.AddField(
+            model_name='filestorage',
+            name='encryption_key',
+            field=models.CharField(blank=True, help_text='Base64 of 32 random bytes (openssl rand -base64 32). Dumps are encrypted with AES-256-GCM before upload; keep a copy of the key: without it the dumps cannot be restored', max_length=64, null=True, verbose_name='Encryption key'),
+        ),
+    ]
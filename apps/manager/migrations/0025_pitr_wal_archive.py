@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0024_dump_encryption'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptask',
+            name='backup_mode',
+            field=models.IntegerField(choices=[(1, 'Logical dump'), (2, 'Base backup + WAL archive (point-in-time recovery)')], default=1, help_text='Point-in-time recovery (Postgres only): the task period sets how often a base backup is taken, WAL is streamed to the storage continuously by archive_wal', verbose_name='Backup mode'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='target_directory',
+            field=models.CharField(blank=True, default=None, help_text='Base backups: empty directory on this host where the cluster is restored; start PostgreSQL on it to replay WAL', max_length=1024, null=True, verbose_name='Target data directory'),
+        ),
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='target_time',
+            field=models.DateTimeField(blank=True, default=None, help_text='Base backups: replay WAL up to this moment. Empty — up to the latest archived WAL', null=True, verbose_name='Recovery target time'),
+        ),
+        migrations.CreateModel(
+            name='WalBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_dt', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('first_segment', models.CharField(max_length=24, verbose_name='First segment')),
+                ('last_segment', models.CharField(max_length=24, verbose_name='Last segment')),
+                ('segments', models.PositiveIntegerField(verbose_name='Segments')),
+                ('closed_dt', models.DateTimeField(verbose_name='Last segment closed at')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('path', models.CharField(max_length=250, verbose_name='File Path')),
+                ('checksum_blake2b', models.CharField(max_length=128, verbose_name='BLAKE2b checksum')),
+                ('encryption_key_id', models.CharField(blank=True, default=None, max_length=16, null=True, verbose_name='Encryption key id')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wal_batches', to='manager.dumptask')),
+            ],
+            options={
+                'verbose_name': 'WAL batch',
+                'verbose_name_plural': 'WAL batches',
+                'indexes': [models.Index(fields=['task', 'last_segment'], name='manager_wal_task_id_372fa6_idx')],
+            },
+        ),
+    ]
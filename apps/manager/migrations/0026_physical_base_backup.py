@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0025_pitr_wal_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dumptask',
+            name='backup_mode',
+            field=models.IntegerField(choices=[(1, 'Logical dump'), (2, 'Base backup + WAL archive (point-in-time recovery)'), (3, 'Base backup (physical copy of the cluster)')], default=1, help_text='Physical modes are Postgres only: a base backup of the whole cluster is streamed to the storage every task period; for point-in-time recovery archive_wal also streams WAL continuously', verbose_name='Backup mode'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0026_physical_base_backup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recoverbackupoperation',
+            name='target_position',
+            field=models.CharField(blank=True, default=None, help_text='MySQL dumps with a binlog archive: replay binlog up to this position, e.g. binlog.000042:1337 (see mysqlbinlog output)', max_length=255, null=True, verbose_name='Recovery target binlog position'),
+        ),
+        migrations.AlterField(
+            model_name='dumptask',
+            name='backup_mode',
+            field=models.IntegerField(choices=[(1, 'Logical dump'), (2, 'Base backup + WAL archive (point-in-time recovery)'), (3, 'Base backup (physical copy of the cluster)'), (4, 'Logical dump + binlog archive (point-in-time recovery)')], default=1, help_text='Physical modes are Postgres only: a base backup of the whole cluster is streamed to the storage every task period; for point-in-time recovery archive_wal also streams WAL continuously. Binlog archive is MySQL only: archive_binlog streams binary logs from the position of the last dump', verbose_name='Backup mode'),
+        ),
+        migrations.AlterField(
+            model_name='recoverbackupoperation',
+            name='target_time',
+            field=models.DateTimeField(blank=True, default=None, help_text='Base backups and MySQL dumps with a binlog archive: replay WAL or binlog up to this moment. Empty — up to the latest archived', null=True, verbose_name='Recovery target time'),
+        ),
+        migrations.CreateModel(
+            name='BinlogBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_dt', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('first_file', models.CharField(max_length=255, verbose_name='First file')),
+                ('last_file', models.CharField(max_length=255, verbose_name='Last file')),
+                ('files', models.PositiveIntegerField(verbose_name='Files')),
+                ('closed_dt', models.DateTimeField(verbose_name='Last file closed at')),
+                ('binlog_size', models.BigIntegerField(verbose_name='Binlog size')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('path', models.CharField(max_length=250, verbose_name='File Path')),
+                ('checksum_blake2b', models.CharField(max_length=128, verbose_name='BLAKE2b checksum')),
+                ('encryption_key_id', models.CharField(blank=True, default=None, max_length=16, null=True, verbose_name='Encryption key id')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='binlog_batches', to='manager.dumptask')),
+            ],
+            options={
+                'verbose_name': 'Binlog batch',
+                'verbose_name_plural': 'Binlog batches',
+                'indexes': [models.Index(fields=['task', 'last_file'], name='manager_bin_task_id_7574b8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manager', '0027_binlog_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dumptaskoperation',
+            name='schedule_key',
+            field=models.CharField(blank=True, default=None, editable=False, max_length=32, null=True, verbose_name='Schedule key'),
+        ),
+        migrations.AddConstraint(
+            model_name='dumptaskoperation',
+            constraint=models.UniqueConstraint(fields=('task', 'schedule_key'), name='unique_task_schedule_key'),
+        ),
+    ]
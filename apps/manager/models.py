@@ -1,10 +1,18 @@
+import secrets
 import uuid
+from datetime import datetime
 
 from django.db import models
 from django.utils.translation import gettext as _
 from django.core.exceptions import ValidationError
 
-from manager.choices import DBType, DumpTaskPeriodsChoices, DumpOperationStatusChoices
+from manager.choices import (BackupModeChoices, DBType, DumpOperationStatusChoices,
+                             DumpTaskPeriodsChoices, OperationPhaseChoices,
+                             ProfileModeChoices)
+from manager.services.encryption_service import parse_key
+from manager.services.manifest_service import (LAYOUT_PG_BASEBACKUP,
+                                               LAYOUT_PG_BASEBACKUP_TAR,
+                                               parse_binlog_position)
 
 
 class AbstractBaseModel(models.Model):
@@ -20,6 +28,30 @@ class AbstractBaseModel(models.Model):
         abstract = True
 
 
+ENCRYPTION_KEY_HELP = _(
+    "Base64 of 32 random bytes (openssl rand -base64 32). Dumps are encrypted with AES-256-GCM "
+    "before upload; keep a copy of the key: without it the dumps cannot be restored")
+
+
+def is_base_backup(dump_operation):
+    """Дамп — физическая копия кластера (pg_basebackup), а не логический дамп."""
+    return (dump_operation.manifest or {}).get("layout") in (LAYOUT_PG_BASEBACKUP, LAYOUT_PG_BASEBACKUP_TAR)
+
+
+def has_binlog(dump_operation):
+    """Дамп MySQL с позицией binlog: после загрузки к нему проигрывается архив binlog задачи."""
+    return bool((dump_operation.manifest or {}).get("binlog"))
+
+
+def validate_encryption_key(value):
+    if not value:
+        return
+    try:
+        parse_key(value)
+    except ValueError as e:
+        raise ValidationError({"encryption_key": str(e)})
+
+
 class FileStorage(models.Model):
     TYPE_S3 = "s3"
     TYPE_YADISK = "yadisk"
@@ -45,6 +77,8 @@ class FileStorage(models.Model):
         "S3 Access Key / FTP/SFTP username"))
     secret_key = models.CharField(max_length=255, blank=True, null=True,
                                   help_text=_("S3 Secret Key / OAuth-токен (Yandex Disk) / FTP/SFTP password"))
+    encryption_key = models.CharField(
+        _("Encryption key"), max_length=64, blank=True, null=True, help_text=ENCRYPTION_KEY_HELP)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -87,6 +121,7 @@ class FileStorage(models.Model):
                 storage_type = "FTP" if t == self.TYPE_FTP else "SFTP"
                 raise ValidationError({f: _(f"Required for {storage_type}")
                                       for f in missing})
+        validate_encryption_key(self.encryption_key)
 
 
 class UserDatabase(AbstractBaseModel):
@@ -112,8 +147,36 @@ class DumpTask(AbstractBaseModel):
     # Fields
     task_period = models.IntegerField(
         _("Task Period"), choices=DumpTaskPeriodsChoices.choices)
+    backup_mode = models.IntegerField(
+        _("Backup mode"), choices=BackupModeChoices.choices, default=BackupModeChoices.LOGICAL,
+        help_text=_("Physical modes are Postgres only: a base backup of the whole cluster is streamed to the "
+                    "storage every task period; for point-in-time recovery archive_wal also streams WAL "
+                    "continuously. Binlog archive is MySQL only: archive_binlog streams binary logs "
+                    "from the position of the last dump"))
     max_dumpfiles_keep = models.PositiveIntegerField(
         _("Max Dump files count to keep"), default=1)
+    profile_mode = models.IntegerField(
+        _("Profiling"), choices=ProfileModeChoices.choices, default=ProfileModeChoices.OFF,
+        help_text=_("Profile every dump and restore of this task"))
+    verify_database = models.ForeignKey(
+        "manager.UserDatabase", on_delete=models.SET_NULL, null=True, blank=True, related_name="+",
+        verbose_name=_("Verification database"),
+        help_text=_("Scratch database of the same type: dumps are restored into it and checked. "
+                    "All its data is replaced on every verification"))
+    encryption_key = models.CharField(
+        _("Encryption key"), max_length=64, blank=True, null=True,
+        help_text=_("Overrides the encryption key of the storage for this task"))
+
+    def clean(self):
+        validate_encryption_key(self.encryption_key)
+        base_backup = self.backup_mode in (BackupModeChoices.PITR, BackupModeChoices.PHYSICAL)
+        if base_backup and self.database_id and self.database.db_type != DBType.POSTGRESQL:
+            raise ValidationError({"backup_mode": _("Base backups are available for Postgres only")})
+        if (self.backup_mode == BackupModeChoices.BINLOG and self.database_id
+                and self.database.db_type != DBType.MYSQL):
+            raise ValidationError({"backup_mode": _("Binlog archive is available for MySQL only")})
+        if base_backup and self.verify_database_id:
+            raise ValidationError({"verify_database": _("Base backups cannot be verified by restoring")})
 
     def __str__(self):
         return str(self.id)
@@ -134,6 +197,51 @@ class DumpTaskOperation(AbstractBaseModel):
         _("Error text"), blank=True, default=None, null=True)
     dump_path = models.CharField(
         _("Dump File Path"), max_length=250, null=True, blank=True, default=None)
+    source_size = models.BigIntegerField(
+        _("Source database size"), null=True, blank=True, default=None)
+    dump_size = models.BigIntegerField(
+        _("Dump file size"), null=True, blank=True, default=None)
+    workspace_size = models.BigIntegerField(
+        _("Peak workspace size"), null=True, blank=True, default=None)
+    checksum_blake2b = models.CharField(
+        _("BLAKE2b checksum"), max_length=128, null=True, blank=True, default=None, editable=False)
+    checksum_sha256 = models.CharField(
+        _("SHA-256 checksum"), max_length=64, null=True, blank=True, default=None, editable=False)
+    # содержимое дампа (см. manifest_service.build_manifest): таблицы с оценками строк и размера,
+    # их смещения в файле дампа, версии утилит; копия лежит в хранилище по manifest_path
+    manifest = models.JSONField(_("Manifest"), null=True, blank=True, default=None, editable=False)
+    manifest_path = models.CharField(
+        _("Manifest File Path"), max_length=250, null=True, blank=True, default=None, editable=False)
+    # отпечаток ключа, которым зашифрован дамп (encryption_service.key_id); None — дамп не зашифрован
+    encryption_key_id = models.CharField(
+        _("Encryption key id"), max_length=16, null=True, blank=True, default=None, editable=False)
+    lease_owner = models.CharField(
+        _("Lease owner"), max_length=255, null=True, blank=True, default=None)
+    lease_expires_dt = models.DateTimeField(
+        _("Lease expires at"), null=True, blank=True, default=None)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    # запуск по расписанию (check_dump_operations): "<период>:<дата>"; у ручных запусков None.
+    # Уникален в задаче — cron на нескольких нодах ставит плановый дамп один раз
+    schedule_key = models.CharField(
+        _("Schedule key"), max_length=32, null=True, blank=True, default=None, editable=False)
+    progress_phase = models.IntegerField(
+        _("Progress phase"), choices=OperationPhaseChoices.choices, null=True, blank=True, default=None)
+    progress_bytes = models.BigIntegerField(_("Bytes done"), null=True, blank=True, default=None)
+    progress_total = models.BigIntegerField(_("Bytes total"), null=True, blank=True, default=None)
+    progress_rate = models.FloatField(_("Rate, bytes/s"), null=True, blank=True, default=None)
+    progress_updated_dt = models.DateTimeField(
+        _("Progress updated at"), null=True, blank=True, default=None)
+    profile_path = models.CharField(
+        _("Profile"), max_length=1024, null=True, blank=True, default=None, editable=False)
+    log_tail = models.TextField(
+        _("Tool output (tail)"), null=True, blank=True, default=None, editable=False)
+
+    @property
+    def progress_eta(self):
+        """Оставшееся время в секундах по текущей скорости или None."""
+        if not self.progress_rate or not self.progress_total or self.progress_bytes is None:
+            return None
+        return max(self.progress_total - self.progress_bytes, 0) / self.progress_rate
 
     def __str__(self):
         return str(self.id)
@@ -141,6 +249,16 @@ class DumpTaskOperation(AbstractBaseModel):
     class Meta:
         verbose_name = _('Dump Task Operation')
         verbose_name_plural = _('Dump Tasks Operations')
+        constraints = [
+            models.UniqueConstraint(fields=["task", "schedule_key"], name="unique_task_schedule_key"),
+        ]
+        indexes = [
+            # ротация и последние успешные дампы задачи
+            models.Index(fields=["task", "status", "created_dt"]),
+            # очередь воркеров и список в админке
+            models.Index(fields=["status", "created_dt"]),
+            models.Index(fields=["created_dt"]),
+        ]
 
 
 class RecoverBackupOperation(AbstractBaseModel):
@@ -153,6 +271,81 @@ class RecoverBackupOperation(AbstractBaseModel):
         _("Status"), choices=DumpOperationStatusChoices.choices, default=DumpOperationStatusChoices.CREATED)
     error_text = models.TextField(
         _("Error text"), blank=True, default=None, null=True)
+    tables = models.JSONField(
+        _("Tables"), null=True, blank=True, default=None,
+        help_text=_('Restore only these tables, e.g. ["orders", "customers"] (MySQL dumps with a table index). '
+                    'Empty — restore the whole dump'))
+    target_time = models.DateTimeField(
+        _("Recovery target time"), null=True, blank=True, default=None,
+        help_text=_("Base backups and MySQL dumps with a binlog archive: replay WAL or binlog up to this "
+                    "moment. Empty — up to the latest archived"))
+    target_position = models.CharField(
+        _("Recovery target binlog position"), max_length=255, null=True, blank=True, default=None,
+        help_text=_("MySQL dumps with a binlog archive: replay binlog up to this position, "
+                    "e.g. binlog.000042:1337 (see mysqlbinlog output)"))
+    target_directory = models.CharField(
+        _("Target data directory"), max_length=1024, null=True, blank=True, default=None,
+        help_text=_("Base backups: empty directory on this host where the cluster is restored; "
+                    "start PostgreSQL on it to replay WAL"))
+    workspace_size = models.BigIntegerField(
+        _("Peak workspace size"), null=True, blank=True, default=None)
+    lease_owner = models.CharField(
+        _("Lease owner"), max_length=255, null=True, blank=True, default=None)
+    lease_expires_dt = models.DateTimeField(
+        _("Lease expires at"), null=True, blank=True, default=None)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    progress_phase = models.IntegerField(
+        _("Progress phase"), choices=OperationPhaseChoices.choices, null=True, blank=True, default=None)
+    progress_bytes = models.BigIntegerField(_("Bytes done"), null=True, blank=True, default=None)
+    progress_total = models.BigIntegerField(_("Bytes total"), null=True, blank=True, default=None)
+    progress_rate = models.FloatField(_("Rate, bytes/s"), null=True, blank=True, default=None)
+    progress_updated_dt = models.DateTimeField(
+        _("Progress updated at"), null=True, blank=True, default=None)
+    profile_path = models.CharField(
+        _("Profile"), max_length=1024, null=True, blank=True, default=None, editable=False)
+    log_tail = models.TextField(
+        _("Tool output (tail)"), null=True, blank=True, default=None, editable=False)
+
+    @property
+    def progress_eta(self):
+        """Оставшееся время в секундах по текущей скорости или None."""
+        if not self.progress_rate or not self.progress_total or self.progress_bytes is None:
+            return None
+        return max(self.progress_total - self.progress_bytes, 0) / self.progress_rate
+
+    def clean(self):
+        super().clean()
+        if self.tables is not None and (
+            not isinstance(self.tables, list) or not all(isinstance(table, str) and table for table in self.tables)
+        ):
+            raise ValidationError({"tables": _("Expected a list of table names")})
+        if self.dump_operation_id and is_base_backup(self.dump_operation):
+            if not self.target_directory:
+                raise ValidationError({"target_directory": _("Required to restore a base backup")})
+            if self.tables:
+                raise ValidationError({"tables": _("Base backups are restored as a whole cluster")})
+            if self.target_time and self.dump_operation.task.backup_mode != BackupModeChoices.PITR:
+                raise ValidationError({"target_time": _("The task of this base backup doesn't archive WAL")})
+            # копия согласована с момента своего окончания (created_dt манифеста)
+            finished = (self.dump_operation.manifest or {}).get("created_dt")
+            finished = datetime.fromisoformat(finished) if finished else self.dump_operation.created_dt
+            if self.target_time and self.target_time < finished:
+                raise ValidationError({"target_time": _("Target time is earlier than the end of the base backup")})
+            if self.target_position:
+                raise ValidationError({"target_position": _("Binlog positions apply to MySQL dumps only")})
+        elif self.dump_operation_id and has_binlog(self.dump_operation):
+            if self.target_directory:
+                raise ValidationError({"target_directory": _("MySQL dumps are restored into the task database")})
+            if self.tables and (self.target_time or self.target_position):
+                raise ValidationError({"tables": _("Binlog is replayed only when the whole dump is restored")})
+            if self.target_time and self.target_position:
+                raise ValidationError(_("Set either target time or target position"))
+            if self.target_position and not parse_binlog_position(self.target_position):
+                raise ValidationError({"target_position": _("Expected <binlog file>:<position>")})
+            if self.target_time and self.target_time < self.dump_operation.created_dt:
+                raise ValidationError({"target_time": _("Target time is earlier than the dump")})
+        elif self.target_time or self.target_directory or self.target_position:
+            raise ValidationError(_("Recovery targets apply to base backups and MySQL dumps with a binlog archive"))
 
     def __str__(self):
         return str(self.id)
@@ -160,3 +353,245 @@ class RecoverBackupOperation(AbstractBaseModel):
     class Meta:
         verbose_name = _('Recover Backup Operation')
         verbose_name_plural = _('Recover Backup Operations')
+        indexes = [
+            models.Index(fields=["dump_operation", "status", "created_dt"]),
+            models.Index(fields=["status", "created_dt"]),
+            models.Index(fields=["created_dt"]),
+        ]
+
+
+class WalBatch(models.Model):
+    """
+    Пачка сегментов WAL задачи с режимом PITR, загруженная в хранилище одним
+    файлом (tar из сжатых сегментов и .history). Сегменты пачек задачи идут
+    подряд; closed_dt — когда завершился её последний сегмент: по нему
+    выбираются пачки для восстановления на момент времени.
+    """
+    task = models.ForeignKey("manager.DumpTask", on_delete=models.CASCADE, related_name="wal_batches")
+    created_dt = models.DateTimeField(_("Date of creation"), auto_now_add=True)
+    first_segment = models.CharField(_("First segment"), max_length=24)
+    last_segment = models.CharField(_("Last segment"), max_length=24)
+    segments = models.PositiveIntegerField(_("Segments"))
+    closed_dt = models.DateTimeField(_("Last segment closed at"))
+    size = models.BigIntegerField(_("Size"))
+    path = models.CharField(_("File Path"), max_length=250)
+    checksum_blake2b = models.CharField(_("BLAKE2b checksum"), max_length=128)
+    encryption_key_id = models.CharField(
+        _("Encryption key id"), max_length=16, null=True, blank=True, default=None)
+
+    def __str__(self):
+        return f"{self.first_segment}..{self.last_segment}"
+
+    class Meta:
+        verbose_name = _("WAL batch")
+        verbose_name_plural = _("WAL batches")
+        indexes = [
+            models.Index(fields=["task", "last_segment"]),
+        ]
+
+
+class BinlogBatch(models.Model):
+    """
+    Пачка файлов binlog задачи MySQL в режиме BINLOG, загруженная в хранилище
+    одним файлом (tar.gz). Файлы пачек задачи идут подряд; цепочка дампа —
+    пачки от файла его позиции binlog (manifest["binlog"]) до нужного момента.
+    closed_dt — когда завершился последний файл пачки.
+    """
+    task = models.ForeignKey("manager.DumpTask", on_delete=models.CASCADE, related_name="binlog_batches")
+    created_dt = models.DateTimeField(_("Date of creation"), auto_now_add=True)
+    first_file = models.CharField(_("First file"), max_length=255)
+    last_file = models.CharField(_("Last file"), max_length=255)
+    files = models.PositiveIntegerField(_("Files"))
+    closed_dt = models.DateTimeField(_("Last file closed at"))
+    binlog_size = models.BigIntegerField(_("Binlog size"))
+    size = models.BigIntegerField(_("Size"))
+    path = models.CharField(_("File Path"), max_length=250)
+    checksum_blake2b = models.CharField(_("BLAKE2b checksum"), max_length=128)
+    encryption_key_id = models.CharField(
+        _("Encryption key id"), max_length=16, null=True, blank=True, default=None)
+
+    def __str__(self):
+        return f"{self.first_file}..{self.last_file}"
+
+    class Meta:
+        verbose_name = _("Binlog batch")
+        verbose_name_plural = _("Binlog batches")
+        indexes = [
+            models.Index(fields=["task", "last_file"]),
+        ]
+
+
+class VerificationOperation(AbstractBaseModel):
+    """Проверка дампа: восстановление во временную БД и сверка таблиц с манифестом дампа."""
+    # Relations
+    dump_operation = models.ForeignKey(
+        "manager.DumpTaskOperation", on_delete=models.CASCADE, related_name="verifications")
+    target_database = models.ForeignKey(
+        "manager.UserDatabase", on_delete=models.CASCADE, related_name="+",
+        verbose_name=_("Verification database"))
+
+    # Fields
+    status = models.IntegerField(
+        _("Status"), choices=DumpOperationStatusChoices.choices, default=DumpOperationStatusChoices.CREATED)
+    error_text = models.TextField(
+        _("Error text"), blank=True, default=None, null=True)
+    duration = models.FloatField(_("Duration, s"), null=True, blank=True, default=None)
+    latency = models.FloatField(
+        _("Latency, s"), null=True, blank=True, default=None,
+        help_text=_("Time from the start of the dump to the end of its verification"))
+    checks = models.JSONField(_("Checks"), null=True, blank=True, default=None, editable=False)
+    workspace_size = models.BigIntegerField(
+        _("Peak workspace size"), null=True, blank=True, default=None)
+    progress_phase = models.IntegerField(
+        _("Progress phase"), choices=OperationPhaseChoices.choices, null=True, blank=True, default=None)
+    progress_bytes = models.BigIntegerField(_("Bytes done"), null=True, blank=True, default=None)
+    progress_total = models.BigIntegerField(_("Bytes total"), null=True, blank=True, default=None)
+    progress_rate = models.FloatField(_("Rate, bytes/s"), null=True, blank=True, default=None)
+    progress_updated_dt = models.DateTimeField(
+        _("Progress updated at"), null=True, blank=True, default=None)
+    log_tail = models.TextField(
+        _("Tool output (tail)"), null=True, blank=True, default=None, editable=False)
+
+    @property
+    def progress_eta(self):
+        """Оставшееся время в секундах по текущей скорости или None."""
+        if not self.progress_rate or not self.progress_total or self.progress_bytes is None:
+            return None
+        return max(self.progress_total - self.progress_bytes, 0) / self.progress_rate
+
+    def __str__(self):
+        return str(self.id)
+
+    class Meta:
+        verbose_name = _('Verification Operation')
+        verbose_name_plural = _('Verification Operations')
+        indexes = [
+            models.Index(fields=["dump_operation", "status", "created_dt"]),
+            models.Index(fields=["status", "created_dt"]),
+        ]
+
+
+class OperationPhase(models.Model):
+    # Relations: фаза принадлежит дампу, восстановлению или проверке
+    dump_operation = models.ForeignKey(
+        "manager.DumpTaskOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="phases")
+    recover_operation = models.ForeignKey(
+        "manager.RecoverBackupOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="phases")
+    verification_operation = models.ForeignKey(
+        "manager.VerificationOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="phases")
+
+    # Fields
+    phase = models.IntegerField(_("Phase"), choices=OperationPhaseChoices.choices)
+    is_success = models.BooleanField(_("Success"), default=True)
+    started_dt = models.DateTimeField(_("Started at"))
+    finished_dt = models.DateTimeField(_("Finished at"))
+    duration = models.FloatField(_("Duration, s"))
+    bytes_in = models.BigIntegerField(_("Bytes in"), null=True, blank=True, default=None)
+    bytes_out = models.BigIntegerField(_("Bytes out"), null=True, blank=True, default=None)
+    throughput = models.FloatField(
+        _("Throughput, bytes/s"), null=True, blank=True, default=None)
+
+    def __str__(self):
+        return self.get_phase_display()
+
+    class Meta:
+        verbose_name = _('Operation Phase')
+        verbose_name_plural = _('Operation Phases')
+        ordering = ["started_dt"]
+        indexes = [
+            models.Index(fields=["phase", "started_dt"]),
+        ]
+
+
+class ToolInvocation(models.Model):
+    # Relations: запуск утилиты принадлежит дампу, восстановлению или проверке
+    dump_operation = models.ForeignKey(
+        "manager.DumpTaskOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="tool_invocations")
+    recover_operation = models.ForeignKey(
+        "manager.RecoverBackupOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="tool_invocations")
+    verification_operation = models.ForeignKey(
+        "manager.VerificationOperation", on_delete=models.CASCADE,
+        null=True, blank=True, related_name="tool_invocations")
+
+    # Fields
+    phase = models.IntegerField(_("Phase"), choices=OperationPhaseChoices.choices)
+    tool = models.CharField(_("Tool"), max_length=255)
+    returncode = models.IntegerField(_("Return code"), null=True, blank=True, default=None)
+    started_dt = models.DateTimeField(_("Started at"))
+    wall_time = models.FloatField(_("Wall time, s"))
+    cpu_user = models.FloatField(_("User CPU, s"), null=True, blank=True, default=None)
+    cpu_system = models.FloatField(_("System CPU, s"), null=True, blank=True, default=None)
+    max_rss = models.BigIntegerField(_("Max RSS, bytes"), null=True, blank=True, default=None)
+    read_bytes = models.BigIntegerField(_("Read from storage, bytes"), null=True, blank=True, default=None)
+    write_bytes = models.BigIntegerField(_("Written to storage, bytes"), null=True, blank=True, default=None)
+
+    def __str__(self):
+        return self.tool
+
+    class Meta:
+        verbose_name = _('Tool Invocation')
+        verbose_name_plural = _('Tool Invocations')
+        ordering = ["started_dt"]
+        indexes = [
+            models.Index(fields=["tool", "started_dt"]),
+        ]
+
+
+class DumpRunHistory(models.Model):
+    """
+    Итоги запуска дампа. Только добавляется и не удаляется ротацией,
+    в отличие от DumpTaskOperation, — по ней строятся тренды задач.
+    """
+    # Relations
+    task = models.ForeignKey("manager.DumpTask", on_delete=models.CASCADE, related_name="run_history")
+
+    # Fields
+    operation_id = models.CharField(_("Operation"), max_length=100)
+    created_dt = models.DateTimeField(_("Finished at"), auto_now_add=True)
+    is_success = models.BooleanField(_("Success"))
+    source_size = models.BigIntegerField(_("Database size"), null=True, blank=True, default=None)
+    dump_size = models.BigIntegerField(_("Dump size"), null=True, blank=True, default=None)
+    duration = models.FloatField(_("Duration, s"))
+    dump_duration = models.FloatField(_("Dump duration, s"), null=True, blank=True, default=None)
+    upload_duration = models.FloatField(_("Upload duration, s"), null=True, blank=True, default=None)
+    throughput = models.FloatField(_("Throughput, bytes/s"), null=True, blank=True, default=None)
+    baseline_duration = models.FloatField(_("Baseline duration, s"), null=True, blank=True, default=None)
+    baseline_size = models.BigIntegerField(_("Baseline dump size"), null=True, blank=True, default=None)
+    duration_regression = models.BooleanField(_("Duration regression"), default=False)
+    size_regression = models.BooleanField(_("Size deviation"), default=False)
+
+    def __str__(self):
+        return self.operation_id
+
+    class Meta:
+        verbose_name = _('Dump Run History')
+        verbose_name_plural = _('Dump Run History')
+        ordering = ["-created_dt"]
+        indexes = [
+            models.Index(fields=["task", "created_dt"]),
+            models.Index(fields=["task", "is_success", "created_dt"]),
+        ]
+
+
+def _generate_api_key():
+    return secrets.token_urlsafe(32)
+
+
+class ApiToken(models.Model):
+    """Токен JSON API (заголовок Authorization: Bearer <key>)."""
+    name = models.CharField(_("Name"), max_length=100)
+    key = models.CharField(_("Key"), max_length=64, unique=True, default=_generate_api_key, editable=False)
+    is_active = models.BooleanField(_("Active"), default=True)
+    created_dt = models.DateTimeField(_("Date of creation"), auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = _('API Token')
+        verbose_name_plural = _('API Tokens')
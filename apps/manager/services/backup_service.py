@@ -1,30 +1,453 @@
+import logging
 import os
-from manager.choices import DumpOperationStatusChoices
-from manager.models import (DumpTaskOperation, FileStorage,
-                            RecoverBackupOperation)
+import tarfile
+import time
+
+from django.utils import timezone
+
+from manager.choices import (BackupModeChoices, DumpOperationStatusChoices,
+                             OperationPhaseChoices)
+from manager.logs import current_log_tail, operation_logging
+from manager.models import (BinlogBatch, DumpTaskOperation, FileStorage,
+                            RecoverBackupOperation, VerificationOperation,
+                            WalBatch, has_binlog, is_base_backup)
+from manager.services.binlog_service import (binlog_chain,
+                                             extract_binlog_batch,
+                                             stale_binlog_batches)
+from manager.services.checksum_service import StreamChecksum
+from manager.services.connection_service import database_is_reachable
 from manager.services.databases import DB_INTERFACE
+from manager.services.encryption_service import (DecryptionError, DumpCipher,
+                                                 dump_cipher, restore_cipher)
+from manager.services.history_service import record_run
+from manager.services.manifest_service import (LAYOUT_GZIP_FRAMES,
+                                               LAYOUT_PG_BASEBACKUP_TAR,
+                                               DumpIndex, build_manifest,
+                                               frame_ranges,
+                                               parse_binlog_position,
+                                               write_manifest)
+from manager.services.metrics_service import in_progress, storage_error
+from manager.services.phase_service import PhaseRecorder
+from manager.services.process import Pipe
+from manager.services.profile_service import profile_operation
+from manager.services.progress_service import ProgressReporter
+from manager.services.queue_service import WORKER_ID
+from manager.services.space_service import estimate_dump_size
 from manager.services.storage_factory import get_storage_service
+from manager.services.transfer_service import TransferPool
+from manager.services.verification_service import (claim_verification,
+                                                   compare_tables)
+from manager.services.wal_service import (extract_wal_batch,
+                                          stale_wal_batches, wal_chain)
+from manager.services.workspace_service import WorkspaceService
+
+logger = logging.getLogger(__name__)
 
 
 class BackupService:
 
-    def __init__(self, operation_id):
+    def __init__(self, operation_id, profile_mode=None, lease=None):
         self.operation_id = operation_id
+        # None — профилировать, только если это включено в задаче
+        self.profile_mode = profile_mode
+        # Lease воркера в режиме queue; без неё операция ведётся отдельным процессом
+        self.lease = lease
+        self.phases = None
+
+    def _update_operation(self, operation, **fields):
+        """
+        Сохраняет только переданные поля. Полный save() дольше держит блокировку
+        SQLite и затирает поля, которые параллельно пишут другие (аренда воркера).
+        Под арендой пишет, только пока операция за этим воркером, иначе бросает LeaseLost.
+        """
+        for name, value in fields.items():
+            setattr(operation, name, value)
+        if self.lease is None:
+            operation.save(update_fields=[*fields, "updated_dt"])
+            return
+        self.lease.check()
+        updated = type(operation).objects.filter(id=operation.id, lease_owner=WORKER_ID).update(
+            updated_dt=timezone.now(), **fields)
+        if not updated:
+            self.lease.lost = True
+            self.lease.check()
 
     def _set_error4operation(self, operation, error):
-        print(error)
-        operation.status = DumpOperationStatusChoices.FAIL
-        operation.error_text = error
-        operation.save()
+        logger.error(error)
+        # хвост stderr утилит операции — то, чего нет в тексте CalledProcessError
+        tail = current_log_tail()
+        self._update_operation(
+            operation,
+            status=DumpOperationStatusChoices.FAIL,
+            error_text=error,
+            log_tail="\n".join(tail) if tail else None,
+        )
+        if isinstance(operation, DumpTaskOperation):
+            record_run(operation, False, self.phases.durations if self.phases else {})
+
+    @staticmethod
+    def _target_reachable(db, phases):
+        with phases.phase(OperationPhaseChoices.CONNECTION_CHECK) as stat:
+            is_connected = database_is_reachable(db)
+            if not is_connected:
+                # Для восстановления допускаем отсутствие самой БД: важно, чтобы сервер/учётка были доступны
+                db_interface = DB_INTERFACE[db.db_type]()
+                if hasattr(db_interface, "server_alive") and db_interface.server_alive(db.connection_string):
+                    is_connected = True
+            stat.is_success = is_connected
+        return is_connected
+
+    @staticmethod
+    def _table_ranges(dump_operation, tables):
+        """Диапазоны байт дампа для частичного восстановления tables -> (ranges, error)."""
+        manifest = dump_operation.manifest or {}
+        if manifest.get("layout") != LAYOUT_GZIP_FRAMES:
+            return None, "Partial restore needs a dump with a table index (MySQL dumps made by this version)"
+        unknown = [table for table in tables if table not in manifest["tables"]
+                   or "offset" not in manifest["tables"][table]]
+        if unknown:
+            return None, f"Tables not found in the dump: {', '.join(unknown)}"
+        return frame_ranges(manifest, tables), None
+
+    @staticmethod
+    def _extract_ranges(filepath, ranges):
+        """Оставляет в скачанном целиком дампе только ranges (для хранилищ без чтения диапазонов)."""
+        partial_path = f"{filepath}.part"
+        with open(filepath, "rb") as src, open(partial_path, "wb") as dst:
+            for offset, length in ranges:
+                src.seek(offset)
+                while length:
+                    chunk = src.read(min(length, 1024 * 1024))
+                    if not chunk:
+                        raise IOError("Dump is shorter than its index")
+                    dst.write(chunk)
+                    length -= len(chunk)
+        os.replace(partial_path, filepath)
+
+    def _download(self, storage_service, dump_operation, workdir, progress, ranges, cipher):
+        """
+        Скачивает дамп или только ranges. Диапазоны читаются из хранилища, если оно
+        умеет (S3 Range GET, SFTP seek); их целостность проверяет gzip (CRC32 каждого кадра)
+        при загрузке, у зашифрованного дампа — ещё и тег каждого блока. Иначе дамп
+        скачивается целиком, со сверкой суммы, и обрезается локально.
+        Возвращает (filepath, error, action) — action для метрики ошибок хранилища.
+        """
+        if ranges and hasattr(storage_service, "download_ranges"):
+            if not cipher:
+                filepath, error = storage_service.download_ranges(
+                    dump_operation.dump_path, ranges, workdir, progress=progress)
+                return filepath, error, "download"
+            filepath, error = storage_service.download_ranges(
+                dump_operation.dump_path, cipher.encrypted_ranges(ranges, dump_operation.dump_size),
+                workdir, progress=progress)
+            if error:
+                return None, error, "download"
+            try:
+                cipher.decrypt_ranges(filepath, ranges, dump_operation.dump_size)
+            except (DecryptionError, OSError) as e:
+                return None, f"Failed to decrypt the dump: {e}", "checksum"
+            return filepath, None, None
+
+        checksum = StreamChecksum(sha256=bool(dump_operation.checksum_sha256))
+        filepath, error = storage_service.download_dump(
+            dump_operation.dump_path, workdir, progress=progress, checksum=checksum, cipher=cipher)
+        if error:
+            return None, error, "download"
+        error = checksum.verify(dump_operation)
+        if error:
+            return None, error, "checksum"
+        if ranges:
+            try:
+                self._extract_ranges(filepath, ranges)
+            except OSError as e:
+                return None, f"Failed to extract tables from the dump: {e}", "download"
+        return filepath, None, None
+
+    def _download_and_load(self, operation, dump_operation, db, storage, phases, kind, tables=None):
+        """
+        Скачивает дамп в спул и загружает его в db (восстановление и проверка);
+        с tables — только эти таблицы. Возвращает ошибку или None.
+        """
+        db_interface = DB_INTERFACE[db.db_type]()
+        cipher, error = restore_cipher(dump_operation)
+        if error:
+            return error
+        ranges = None
+        if tables:
+            ranges, error = self._table_ranges(dump_operation, tables)
+            if error:
+                return error
+        download_size = sum(length for _, length in ranges) if ranges else dump_operation.dump_size
+        # скачанный дамп (и его копии при загрузке) должны поместиться в спул
+        required_size = (download_size or 0) * db_interface.restore_space_factor
+        workspace, error = WorkspaceService().acquire(kind, operation.id, required_size)
+        if error:
+            return error
+
+        storage_service = get_storage_service(storage)
+        try:
+            # DOWNLOAD DUMP: сумма считается по ходу скачивания, битый дамп не дойдёт до загрузки в БД
+            with phases.phase(OperationPhaseChoices.DOWNLOAD) as stat:
+                with ProgressReporter(operation, OperationPhaseChoices.DOWNLOAD, download_size) as progress:
+                    filepath, error, action = self._download(
+                        storage_service, dump_operation, workspace.path, progress, ranges, cipher)
+                if error:
+                    storage_error(storage, action)
+                else:
+                    stat.bytes_in = stat.bytes_out = os.path.getsize(filepath)
+                stat.is_success = not error
+            if error:
+                return error
+
+            # RESTORE DUMP
+            with phases.phase(OperationPhaseChoices.LOAD) as stat:
+                stat.bytes_in = os.path.getsize(filepath)
+                with ProgressReporter(operation, OperationPhaseChoices.LOAD, stat.bytes_in) as progress:
+                    _, error = db_interface.load_dump(
+                        filepath=filepath,
+                        connection_string=db.connection_string,
+                        progress=progress,
+                        **({"tables": tables} if tables else {}),
+                    )
+                stat.is_success = not error
+            return error
+        finally:
+            # удаляем каталог операции со всеми временными файлами
+            operation.workspace_size = workspace.peak_usage
+            workspace.cleanup()
+
+    @staticmethod
+    def _download_batches(storage_service, batches, workdir, ciphers, progress):
+        """
+        Скачивает пачки архива (WAL, binlog) окнами по BACKUP_TRANSFER_CONCURRENCY
+        параллельно. Отдаёт (batch, path, checksum, error) по порядку цепочки: пока
+        вызывающий распаковывает окно, следующее ещё не скачивается, так что в
+        спуле не больше одного окна.
+        """
+        pool = TransferPool()
+        for start in range(0, len(batches), pool.concurrency):
+            window = batches[start:start + pool.concurrency]
+            checksums = [StreamChecksum(sha256=False) for _ in window]
+            results = pool.download_many(storage_service, [
+                (batch.path, checksum, ciphers[batch.encryption_key_id])
+                for batch, checksum in zip(window, checksums)
+            ], workdir, progress)
+            for batch, checksum, (batch_path, error) in zip(window, checksums, results):
+                yield batch, batch_path, checksum, error
+
+    @staticmethod
+    def _window_size(batches):
+        # место под одно окно параллельных скачиваний — самые большие пачки
+        sizes = sorted((batch.size for batch in batches), reverse=True)
+        return sum(sizes[:TransferPool().concurrency])
+
+    def _restore_base_backup(self, operation, dump_operation, storage, phases):
+        """
+        Восстановление базовой копии PostgreSQL: копия скачивается и разворачивается
+        в operation.target_directory одним конвейером, без файла в спуле. У задач
+        с архивом WAL нужные пачки WAL кладутся в <target_directory>_wal, и WAL
+        до target_time проигрывает PostgreSQL при запуске на этом каталоге.
+        Возвращает ошибку или None.
+        """
+        db_interface = DB_INTERFACE[dump_operation.task.database.db_type]()
+        cipher, error = restore_cipher(dump_operation)
+        if error:
+            return error
+        pitr = dump_operation.task.backup_mode == BackupModeChoices.PITR
+        batches = []
+        if pitr:
+            batches, error = wal_chain(dump_operation, operation.target_time)
+            if error:
+                return error
+        batch_ciphers = {}
+        for batch in batches:
+            if batch.encryption_key_id not in batch_ciphers:
+                batch_ciphers[batch.encryption_key_id], error = restore_cipher(batch)
+                if error:
+                    return error
+
+        storage_service = get_storage_service(storage)
+        # RESTORE BASE BACKUP: скачивание и распаковка — один конвейер, сумма сверяется в конце
+        with phases.phase(OperationPhaseChoices.LOAD) as stat:
+            with ProgressReporter(operation, OperationPhaseChoices.LOAD, dump_operation.dump_size) as progress:
+                checksum = StreamChecksum(sha256=bool(dump_operation.checksum_sha256))
+                pipe = Pipe(lambda out: storage_service.download_fileobj(
+                    dump_operation.dump_path, out, checksum=checksum, cipher=cipher))
+                with pipe as stream:
+                    _, error = db_interface.unpack_base_backup(
+                        stream, operation.target_directory, dump_operation.manifest["layout"], progress=progress)
+            # ошибка хранилища первична, если распаковка не бросила поток раньше
+            if pipe.result and not pipe.interrupted:
+                storage_error(storage, "download")
+                error = pipe.result
+            elif not error:
+                error = checksum.verify(dump_operation)
+                if error:
+                    storage_error(storage, "checksum")
+            stat.bytes_in = progress.done
+            stat.is_success = not error
+        if error or not pitr:
+            return error
+
+        workspace, error = WorkspaceService().acquire("restore", operation.id, self._window_size(batches))
+        if error:
+            return error
+        wal_dir = f"{operation.target_directory}_wal"
+        try:
+            # пачки WAL окнами: скачать параллельно, сверить, распаковать сегменты, удалить
+            with phases.phase(OperationPhaseChoices.DOWNLOAD) as stat:
+                with ProgressReporter(
+                        operation, OperationPhaseChoices.DOWNLOAD, sum(batch.size for batch in batches)) as progress:
+                    stat.bytes_in = 0
+                    downloads = self._download_batches(
+                        storage_service, batches, workspace.path, batch_ciphers, progress)
+                    for batch, batch_path, checksum, error in downloads:
+                        if error:
+                            storage_error(storage, "download")
+                            break
+                        if checksum.blake2b != batch.checksum_blake2b:
+                            storage_error(storage, "checksum")
+                            error = f"WAL batch {batch.first_segment} checksum mismatch"
+                            break
+                        stat.bytes_in += os.path.getsize(batch_path)
+                        try:
+                            extract_wal_batch(batch_path, wal_dir)
+                        except (OSError, tarfile.TarError, EOFError) as e:
+                            error = f"Failed to unpack WAL batch {batch.first_segment}: {e}"
+                            break
+                        finally:
+                            os.remove(batch_path)
+                stat.is_success = not error
+        finally:
+            operation.workspace_size = workspace.peak_usage
+            workspace.cleanup()
+        if error:
+            return error
+        db_interface.configure_recovery(operation.target_directory, wal_dir, target_time=operation.target_time)
+        return None
+
+    def _replay_binlog(self, operation, dump_operation, db, storage, phases, batches):
+        """
+        Проигрывает в db цепочку binlog после загруженного дампа: пачки скачиваются
+        и распаковываются в спул (mysqlbinlog читает все файлы одним сеансом), затем
+        события идут в mysql с позиции дампа до operation.target_position или
+        target_time. Возвращает ошибку или None.
+        """
+        ciphers = {}
+        for batch in batches:
+            if batch.encryption_key_id not in ciphers:
+                ciphers[batch.encryption_key_id], error = restore_cipher(batch)
+                if error:
+                    return error
+        start = dump_operation.manifest["binlog"]
+        target = parse_binlog_position(operation.target_position) if operation.target_position else None
+
+        # распакованные binlog и одно окно скачанных пачек
+        required_size = sum(batch.binlog_size for batch in batches) + self._window_size(batches)
+        workspace, error = WorkspaceService().acquire("restore", operation.id, required_size)
+        if error:
+            return error
+        storage_service = get_storage_service(storage)
+        binlog_dir = os.path.join(workspace.path, "binlog")
+        files = []
+        try:
+            with phases.phase(OperationPhaseChoices.DOWNLOAD) as stat:
+                with ProgressReporter(
+                        operation, OperationPhaseChoices.DOWNLOAD, sum(batch.size for batch in batches)) as progress:
+                    stat.bytes_in = 0
+                    downloads = self._download_batches(storage_service, batches, workspace.path, ciphers, progress)
+                    for batch, batch_path, checksum, error in downloads:
+                        if error:
+                            storage_error(storage, "download")
+                            break
+                        if checksum.blake2b != batch.checksum_blake2b:
+                            storage_error(storage, "checksum")
+                            error = f"Binlog batch {batch.first_file} checksum mismatch"
+                            break
+                        stat.bytes_in += os.path.getsize(batch_path)
+                        try:
+                            files.extend(extract_binlog_batch(
+                                batch_path, binlog_dir, start["file"], target["file"] if target else None))
+                        except (OSError, tarfile.TarError, EOFError) as e:
+                            error = f"Failed to unpack binlog batch {batch.first_file}: {e}"
+                            break
+                        finally:
+                            os.remove(batch_path)
+                stat.is_success = not error
+            if error:
+                return error
+
+            # REPLAY BINLOG: объём SQL заранее не известен
+            with phases.phase(OperationPhaseChoices.LOAD) as stat:
+                with ProgressReporter(operation, OperationPhaseChoices.LOAD) as progress:
+                    _, error = DB_INTERFACE[db.db_type]().replay_binlog(
+                        db.connection_string,
+                        [os.path.join(binlog_dir, name) for name in files],
+                        start["position"],
+                        stop_position=target["position"] if target else None,
+                        stop_datetime=operation.target_time,
+                        progress=progress,
+                    )
+                stat.bytes_in = progress.done
+                stat.is_success = not error
+            return error
+        finally:
+            operation.workspace_size = max(operation.workspace_size or 0, workspace.peak_usage)
+            workspace.cleanup()
+
+    def _stream_base_backup(self, operation, db, storage, storage_service, cipher, tables, tools):
+        """
+        Базовая копия PostgreSQL из pg_basebackup прямо в хранилище, без файла в
+        спуле: снятие и загрузка идут одним конвейером и пишутся одной фазой UPLOAD.
+        Заполняет размер, суммы и манифест operation. Возвращает (remote_path, error).
+        """
+        db_interface = DB_INTERFACE[db.db_type]()
+        with self.phases.phase(OperationPhaseChoices.UPLOAD) as stat:
+            with ProgressReporter(operation, OperationPhaseChoices.UPLOAD, operation.source_size) as progress:
+                checksum = StreamChecksum()
+                pipe = Pipe(lambda out: db_interface.stream_base_backup(
+                    db.connection_string, out, progress=progress, checksum=checksum))
+                with pipe as stream:
+                    remote_path, error = storage_service.upload_fileobj(
+                        stream, f"{operation.id}.tar.gz", cipher=cipher, size_hint=operation.source_size)
+                wal, details, backup_error = pipe.result
+            if error:
+                storage_error(storage, "upload")
+            elif backup_error:
+                # pg_basebackup упал, а в хранилище успел лечь оборванный поток
+                storage_service.delete_dump(remote_path)
+                error = backup_error
+            stat.is_success = not error
+            if error:
+                return None, error
+            operation.dump_size = progress.done
+            operation.checksum_blake2b = checksum.blake2b
+            operation.checksum_sha256 = checksum.sha256
+            stat.bytes_in = operation.dump_size
+            stat.bytes_out = DumpCipher.encrypted_size(operation.dump_size) if cipher else operation.dump_size
+
+        index = DumpIndex()
+        index.layout = LAYOUT_PG_BASEBACKUP_TAR
+        operation.manifest = build_manifest(operation, db, tables, index, tools)
+        operation.manifest["wal"] = wal
+        operation.manifest["base_backup"] = details
+        return remote_path, None
 
     def make_dump(self):
+        with (
+            in_progress("dump"),
+            operation_logging(self.operation_id),
+            profile_operation(DumpTaskOperation, self.operation_id, self.profile_mode),
+        ):
+            return self._make_dump()
+
+    def _make_dump(self):
         operation = DumpTaskOperation.objects.filter(id=self.operation_id).first()
         if not operation:
             return False, f"Operation {self.operation_id} doesn't exist"
 
-        operation.status = DumpOperationStatusChoices.IN_PROCESS
-        operation.error_text = None
-        operation.save()
+        self._update_operation(
+            operation, status=DumpOperationStatusChoices.IN_PROCESS, error_text=None, log_tail=None)
 
         db = operation.task.database
         storage = operation.task.file_storage  # теперь это FileStorage
@@ -35,39 +458,119 @@ class BackupService:
             self._set_error4operation(operation, error)
             return False, error
 
+        try:
+            cipher = dump_cipher(operation.task)
+        except ValueError as e:
+            error = f"Invalid encryption key: {e}"
+            self._set_error4operation(operation, error)
+            return False, error
+
+        phases = self.phases = PhaseRecorder(operation, db, storage, lease=self.lease)
         db_interface = DB_INTERFACE[db.db_type]()
-        is_connected = db_interface.check_connection(db.connection_string)
+        with phases.phase(OperationPhaseChoices.CONNECTION_CHECK) as stat:
+            is_connected = database_is_reachable(db)
+            stat.is_success = is_connected
         if not is_connected:
             error = "Database connection failed"
             self._set_error4operation(operation, error)
             return False, error
 
-        filepath, error = db_interface.dump_database(db.connection_string, operation.id)
+        base_backup = operation.task.backup_mode in (BackupModeChoices.PITR, BackupModeChoices.PHYSICAL)
+        binlog = operation.task.backup_mode == BackupModeChoices.BINLOG
+        if base_backup:
+            # физическая копия идёт в хранилище потоком: в спуле только манифест
+            operation.source_size = db_interface.cluster_size(db.connection_string)
+            estimated_size = 0
+        else:
+            # оценка размера дампа и резерв места в спуле до начала долгой работы
+            operation.source_size = db_interface.estimate_size(db.connection_string)
+            estimated_size = estimate_dump_size(operation.task, operation.source_size)
+        # таблицы и их оценки на момент дампа, версии утилит — для манифеста дампа
+        tables = db_interface.table_stats(db.connection_string)
+        tools = db_interface.tool_versions(db.connection_string)
+        workspace, error = WorkspaceService().acquire("dump", operation.id, estimated_size)
         if error:
             self._set_error4operation(operation, error)
             return False, error
 
-        # получаем нужный сервис (S3 или Yandex) по типу
         try:
+            # получаем нужный сервис (S3 или Yandex) по типу
             storage_service = get_storage_service(storage)
 
-            remote_path, error = storage_service.upload_dump(filepath, operation.id)
-            if error:
-                self._set_error4operation(operation, error)
-                return False, error
+            if base_backup:
+                remote_path, error = self._stream_base_backup(
+                    operation, db, storage, storage_service, cipher, tables, tools)
+                if error:
+                    self._set_error4operation(operation, error)
+                    return False, error
+            else:
+                with phases.phase(OperationPhaseChoices.DUMP) as stat:
+                    with ProgressReporter(operation, OperationPhaseChoices.DUMP, estimated_size) as progress:
+                        checksum = StreamChecksum()
+                        index = DumpIndex()
+                        filepath, error = db_interface.dump_database(
+                            db.connection_string, operation.id, workspace.path, progress=progress, checksum=checksum,
+                            index=index, **({"binlog_position": True} if binlog else {}))
+                    # с этой позиции archive_binlog продолжает дамп, с неё же binlog проигрывается при восстановлении
+                    position = db_interface.read_binlog_position(filepath) if binlog and not error else None
+                    if binlog and not error and not position:
+                        error = "mysqldump didn't record the binlog position (is binary logging enabled?)"
+                    stat.is_success = not error
+                    if not error:
+                        operation.dump_size = os.path.getsize(filepath)
+                        operation.checksum_blake2b = checksum.blake2b
+                        operation.checksum_sha256 = checksum.sha256
+                        stat.bytes_in = operation.source_size
+                        stat.bytes_out = operation.dump_size
+                        operation.manifest = build_manifest(operation, db, tables, index, tools)
+                        if binlog:
+                            operation.manifest["binlog"] = position
+                if error:
+                    self._set_error4operation(operation, error)
+                    return False, error
+
+                with phases.phase(OperationPhaseChoices.UPLOAD) as stat:
+                    upload_size = DumpCipher.encrypted_size(operation.dump_size) if cipher else operation.dump_size
+                    with ProgressReporter(operation, OperationPhaseChoices.UPLOAD, upload_size) as progress:
+                        remote_path, error = storage_service.upload_dump(
+                            filepath, operation.id, progress=progress,
+                            checksums={"blake2b": operation.checksum_blake2b, "sha256": operation.checksum_sha256},
+                            cipher=cipher)
+                    stat.is_success = not error
+                    stat.bytes_in = operation.dump_size
+                    stat.bytes_out = upload_size
+                if error:
+                    storage_error(storage, "upload")
+                    self._set_error4operation(operation, error)
+                    return False, error
+
+            # манифест рядом с дампом (<operation_id>.json): содержимое видно без скачивания дампа
+            manifest_path, manifest_error = storage_service.upload_dump(
+                write_manifest(operation.manifest, workspace.path, operation.id), operation.id, cipher=cipher)
+            if manifest_error:
+                storage_error(storage, "upload")
+                logger.warning("Failed to upload dump manifest: %s", manifest_error)
         finally:
-            # удаляем временный файл
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except Exception as e:
-                    print(f"Failed to remove temp file {filepath}: {e}")
-
-        print(f"File uploaded successfully to {remote_path}")
-        operation.status = DumpOperationStatusChoices.SUCCESS
-        operation.error_text = None
-        operation.dump_path = remote_path
-        operation.save()
+            # удаляем каталог операции со всеми временными файлами
+            operation.workspace_size = workspace.peak_usage
+            workspace.cleanup()
+
+        logger.info("File uploaded successfully to %s", remote_path)
+        self._update_operation(
+            operation,
+            status=DumpOperationStatusChoices.SUCCESS,
+            error_text=None,
+            dump_path=remote_path,
+            manifest_path=manifest_path,
+            encryption_key_id=cipher.key_id if cipher else None,
+            source_size=operation.source_size,
+            dump_size=operation.dump_size,
+            manifest=operation.manifest,
+            checksum_blake2b=operation.checksum_blake2b,
+            checksum_sha256=operation.checksum_sha256,
+            workspace_size=operation.workspace_size,
+        )
+        record_run(operation, True, phases.durations)
 
         # max_files_keep (чуть поправил off-by-one: держим ровно max_files_cnt последних)
         previous_dump_operations = DumpTaskOperation.objects.filter(
@@ -79,33 +582,59 @@ class BackupService:
         files2delete = []
         operations2delete = []
 
+        oldest_kept = None
         for idx, dump_operation in enumerate(previous_dump_operations):
             if idx < max_files_cnt:
+                oldest_kept = dump_operation
                 continue
             files2delete.append(dump_operation.dump_path)
+            if dump_operation.manifest_path:
+                files2delete.append(dump_operation.manifest_path)
             operations2delete.append(dump_operation.id)
 
+        # WAL (binlog) до начала самой старой оставшейся копии (дампа) больше не восстановить
+        wal_batches2delete = []
+        binlog_batches2delete = []
+        if operations2delete and oldest_kept is not None and is_base_backup(oldest_kept):
+            wal_batches2delete = stale_wal_batches(operation.task, oldest_kept)
+            files2delete.extend(batch.path for batch in wal_batches2delete)
+        elif operations2delete and oldest_kept is not None and has_binlog(oldest_kept):
+            binlog_batches2delete = stale_binlog_batches(operation.task, oldest_kept)
+            files2delete.extend(batch.path for batch in binlog_batches2delete)
+
         # delete files
         if files2delete:
-            for file_backup_path in files2delete:
-                try:
-                    storage_service.delete_dump(file_backup_path)
-                except Exception:
-                    pass
+            with phases.phase(OperationPhaseChoices.RETENTION) as stat:
+                failed = TransferPool().delete_many(storage_service, files2delete)
+                stat.is_success = not failed
+            if failed:
+                storage_error(storage, "delete")
+                logger.warning("Failed to delete old dumps: %s", failed)
         if operations2delete:
             DumpTaskOperation.objects.filter(id__in=operations2delete).delete()
+        if wal_batches2delete:
+            WalBatch.objects.filter(id__in=[batch.id for batch in wal_batches2delete]).delete()
+        if binlog_batches2delete:
+            BinlogBatch.objects.filter(id__in=[batch.id for batch in binlog_batches2delete]).delete()
 
-        print("Dump Success")
+        logger.info("Dump Success")
         return True, None
 
     def restore_dump(self):
+        with (
+            in_progress("restore"),
+            operation_logging(self.operation_id),
+            profile_operation(RecoverBackupOperation, self.operation_id, self.profile_mode),
+        ):
+            return self._restore_dump()
+
+    def _restore_dump(self):
         operation = RecoverBackupOperation.objects.filter(id=self.operation_id).first()
         if not operation:
             return False, f"Operation {self.operation_id} doesn't exist"
 
-        operation.status = DumpOperationStatusChoices.IN_PROCESS
-        operation.error_text = None
-        operation.save()
+        self._update_operation(
+            operation, status=DumpOperationStatusChoices.IN_PROCESS, error_text=None, log_tail=None)
 
         dump_operation = operation.dump_operation
         db = dump_operation.task.database
@@ -116,44 +645,104 @@ class BackupService:
             self._set_error4operation(operation, error)
             return False, error
 
-        db_interface = DB_INTERFACE[db.db_type]()
-        is_connected = db_interface.check_connection(db.connection_string)
-        if not is_connected:
-            # Для восстановления допускаем отсутствие самой БД: важно, чтобы сервер/учётка были доступны
-            if hasattr(db_interface, "server_alive") and db_interface.server_alive(db.connection_string):
-                is_connected = True
+        phases = self.phases = PhaseRecorder(operation, db, storage, lease=self.lease)
+        if is_base_backup(dump_operation):
+            # базовая копия разворачивается в каталог, сервер БД не нужен
+            error = self._restore_base_backup(operation, dump_operation, storage, phases)
+        elif not self._target_reachable(db, phases):
+            error = "Database connection failed"
+        else:
+            # цепочка binlog — до загрузки дампа: недостающий архив не должен стоить перезаписанной БД
+            batches = None
+            if has_binlog(dump_operation) and not operation.tables:
+                batches, error = binlog_chain(dump_operation, operation.target_time, operation.target_position)
+            if not error:
+                error = self._download_and_load(
+                    operation, dump_operation, db, storage, phases, "restore", tables=operation.tables)
+            if not error and batches:
+                error = self._replay_binlog(operation, dump_operation, db, storage, phases, batches)
+        if error:
+            self._set_error4operation(operation, error)
+            return False, error
 
-        if not is_connected:
+        logger.info("File restored successfully")
+        self._update_operation(
+            operation,
+            status=DumpOperationStatusChoices.SUCCESS,
+            error_text=None,
+            workspace_size=operation.workspace_size,
+        )
+        return True, None
+
+    def verify_dump(self):
+        with in_progress("verify"), operation_logging(self.operation_id):
+            return self._verify_dump()
+
+    def _verify_dump(self):
+        if not claim_verification(self.operation_id):
+            if not VerificationOperation.objects.filter(id=self.operation_id).exists():
+                return False, f"Operation {self.operation_id} doesn't exist"
+            logger.info("Verification %s is already taken", self.operation_id)
+            return False, f"Operation {self.operation_id} is not pending"
+        operation = VerificationOperation.objects.get(id=self.operation_id)
+
+        started = time.monotonic()
+
+        dump_operation = operation.dump_operation
+        source = dump_operation.task.database
+        db = operation.target_database
+        storage = dump_operation.task.file_storage
+
+        # проверка затирает целевую БД — она не должна совпадать с исходной
+        if db.pk == source.pk or db.connection_string == source.connection_string:
+            error = "Verification database must differ from the source database"
+            self._set_error4operation(operation, error)
+            return False, error
+        if db.db_type != source.db_type:
+            error = "Verification database type differs from the source database type"
+            self._set_error4operation(operation, error)
+            return False, error
+        if dump_operation.status != DumpOperationStatusChoices.SUCCESS:
+            error = "Dump operation is not successful"
+            self._set_error4operation(operation, error)
+            return False, error
+        if is_base_backup(dump_operation):
+            error = "Base backups can't be verified by loading into a database"
+            self._set_error4operation(operation, error)
+            return False, error
+
+        phases = self.phases = PhaseRecorder(operation, db, storage, lease=self.lease)
+        if not self._target_reachable(db, phases):
             error = "Database connection failed"
             self._set_error4operation(operation, error)
             return False, error
 
-        storage_service = get_storage_service(storage)
-        # DOWNLOAD DUMP
-        filepath, error = storage_service.download_dump(dump_operation.dump_path)
+        error = self._download_and_load(operation, dump_operation, db, storage, phases, "verify")
         if error:
             self._set_error4operation(operation, error)
             return False, error
 
-        # RESTORE DUMP
         try:
-            _, error = db_interface.load_dump(
-                filepath=filepath,
-                connection_string=db.connection_string
-            )
-            if error:
-                self._set_error4operation(operation, error)
-                return False, error
-        finally:
-            # удаляем временный файл
-            if filepath and os.path.exists(filepath):
-                try:
-                    os.remove(filepath)
-                except Exception as e:
-                    print(f"Failed to remove temp file {filepath}: {e}")
-
-        print("File restored successfully")
-        operation.status = DumpOperationStatusChoices.SUCCESS
-        operation.error_text = None
-        operation.save()
+            with phases.phase(OperationPhaseChoices.VERIFY) as stat:
+                checks = compare_tables(DB_INTERFACE[db.db_type](), db.connection_string, dump_operation.manifest)
+                stat.is_success = checks["passed"]
+        except Exception as e:
+            error = f"Sanity checks error: {e}"
+            self._set_error4operation(operation, error)
+            return False, error
+
+        error = None if checks["passed"] else f"Sanity checks failed: {checks['summary']}"
+        self._update_operation(
+            operation,
+            status=DumpOperationStatusChoices.SUCCESS if checks["passed"] else DumpOperationStatusChoices.FAIL,
+            error_text=error,
+            checks=checks,
+            duration=time.monotonic() - started,
+            latency=(timezone.now() - dump_operation.created_dt).total_seconds(),
+            workspace_size=operation.workspace_size,
+        )
+        if error:
+            logger.error(error)
+            return False, error
+        logger.info("Dump verified: %s", checks["summary"])
         return True, None
@@ -0,0 +1,382 @@
+import gzip
+import logging
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from manager.choices import BackupModeChoices, DBType, DumpOperationStatusChoices
+from manager.models import BinlogBatch, DumpTask, DumpTaskOperation
+from manager.services.checksum_service import StreamChecksum
+from manager.services.databases import DB_INTERFACE
+from manager.services.encryption_service import dump_cipher
+from manager.services.manifest_service import (BINLOG_FILE_RE,
+                                               parse_binlog_position)
+from manager.services.metrics_service import storage_error
+from manager.services.progress_service import ProgressWriter
+from manager.services.storage_factory import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+# Больше файлов в одну пачку не кладём: после простоя архиватора их может накопиться много
+BATCH_FILES = 16
+# Пауза перед перезапуском упавшего mysqlbinlog, растёт до RESTART_DELAY_MAX
+RESTART_DELAY = 5
+RESTART_DELAY_MAX = 300
+
+
+def binlog_number(name):
+    """Номер файла binlog: 'binlog.000042' -> 42."""
+    return int(BINLOG_FILE_RE.match(name)["number"])
+
+
+def next_binlog(name):
+    """Следующий файл binlog после name (ширина номера сохраняется)."""
+    match = BINLOG_FILE_RE.match(name)
+    number = match["number"]
+    return f"{match['base']}.{int(number) + 1:0{len(number)}d}"
+
+
+def server_id(task):
+    """server_id, под которым mysqlbinlog задачи подключается к серверу как реплика."""
+    return 0x40000000 + zlib.crc32(str(task.id).encode()) % 0x3FFFFFFF
+
+
+def binlog_tasks():
+    return DumpTask.objects.filter(
+        backup_mode=BackupModeChoices.BINLOG, database__db_type=DBType.MYSQL,
+    ).select_related("database", "file_storage")
+
+
+def binlog_archive_warning(task):
+    """
+    Предупреждение для админки: у задачи в режиме BINLOG давно (BACKUP_ARCHIVE_STALE_SECONDS)
+    не было новых пачек binlog — скорее всего, не запущен archive_binlog. None — всё в порядке.
+    """
+    if task.backup_mode != BackupModeChoices.BINLOG:
+        return None
+    last_dt = task.binlog_batches.order_by("-created_dt").values_list("created_dt", flat=True).first()
+    age = timezone.now() - (last_dt or task.created_dt)
+    if age <= timedelta(seconds=settings.BACKUP_ARCHIVE_STALE_SECONDS):
+        return None
+    if last_dt is None:
+        return "No binlog archived yet, is archive_binlog running?"
+    return f"No binlog archived for {timedelta(seconds=int(age.total_seconds()))}, is archive_binlog running?"
+
+
+def _task_batches(task_id):
+    """Пачки задачи по порядку файлов binlog."""
+    return sorted(BinlogBatch.objects.filter(task_id=task_id), key=lambda batch: binlog_number(batch.first_file))
+
+
+class BinlogReceiver:
+    """
+    mysqlbinlog --read-from-remote-server одной задачи и выгрузка его файлов пачками.
+
+    Файлы binlog пишутся как есть в <BACKUP_BINLOG_SPOOL_DIR>/<task_id>; все,
+    кроме последнего (в него mysqlbinlog ещё пишет), завершены и уходят в
+    хранилище одним tar.gz, после загрузки удаляются. Текущий файл, в который
+    что-то записано, архиватор закрывает FLUSH BINARY LOGS через
+    BACKUP_BINLOG_BATCH_SECONDS, так что архив отстаёт от сервера не больше чем
+    примерно на это время. Поток начинается с файла позиции последнего
+    успешного дампа задачи, дальше — со следующего после выгруженных.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.directory = os.path.join(settings.BACKUP_BINLOG_SPOOL_DIR, str(task.id))
+        self.process = None
+        self._restart_at = 0
+        self._restart_delay = RESTART_DELAY
+        self._current = None  # (имя, когда замечен, размер тогда)
+
+    @property
+    def db_interface(self):
+        return DB_INTERFACE[self.task.database.db_type]()
+
+    # --- mysqlbinlog
+
+    def _log_stderr(self, pipe):
+        for raw in iter(pipe.readline, b""):
+            logger.warning("mysqlbinlog [%s]: %s", self.task.id, raw.decode(errors="replace").rstrip())
+
+    def start_file(self):
+        """С какого файла читать binlog: после выгруженных, но не раньше позиции последнего дампа."""
+        candidates = []
+        batches = _task_batches(self.task.id)
+        if batches:
+            candidates.append(next_binlog(batches[-1].last_file))
+        dump_operation = DumpTaskOperation.objects.filter(
+            task=self.task, status=DumpOperationStatusChoices.SUCCESS, manifest__binlog__isnull=False,
+        ).order_by("-created_dt").first()
+        if dump_operation:
+            # после разрыва архива (binlog удалены на сервере) цепочка продолжается с нового дампа
+            candidates.append(dump_operation.manifest["binlog"]["file"])
+        return max(candidates, key=binlog_number) if candidates else None
+
+    def start(self):
+        start_file = self.start_file()
+        if start_file is None:
+            # позиция появится с первым дампом задачи
+            self._schedule_restart()
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        command = self.db_interface.receive_binlog_command(
+            self.task.database.connection_string, self.directory, start_file, server_id(self.task))
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        threading.Thread(target=self._log_stderr, args=(self.process.stderr,), daemon=True).start()
+        logger.info("mysqlbinlog started for task %s from %s (pid %s)", self.task.id, start_file, self.process.pid)
+
+    def _schedule_restart(self):
+        self._restart_at = time.monotonic() + self._restart_delay
+        self._restart_delay = min(self._restart_delay * 2, RESTART_DELAY_MAX)
+
+    def ensure_running(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            logger.warning("mysqlbinlog for task %s exited with code %s",
+                           self.task.id, self.process.returncode)
+            self.process = None
+            self._schedule_restart()
+        if time.monotonic() >= self._restart_at:
+            self.start()
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    # --- выгрузка
+
+    def files(self):
+        """Файлы binlog в спуле: [(имя, mtime)] по номерам."""
+        try:
+            names = [name for name in os.listdir(self.directory) if BINLOG_FILE_RE.match(name)]
+        except FileNotFoundError:
+            return []
+        return [(name, os.path.getmtime(os.path.join(self.directory, name)))
+                for name in sorted(names, key=binlog_number)]
+
+    def _flush_if_idle(self, current):
+        """Закрывает текущий файл, который давно открыт и в который что-то записано."""
+        size = os.path.getsize(os.path.join(self.directory, current))
+        if self._current is None or self._current[0] != current:
+            self._current = (current, time.monotonic(), size)
+            return
+        _, seen, seen_size = self._current
+        if size > seen_size and time.monotonic() - seen >= settings.BACKUP_BINLOG_BATCH_SECONDS:
+            try:
+                self.db_interface.flush_binary_logs(self.task.database.connection_string)
+            except Exception as e:
+                logger.warning("FLUSH BINARY LOGS failed for task %s: %s", self.task.id, e)
+            self._current = None
+
+    def tick(self):
+        files = self.files()
+        if not files:
+            return None
+        if self.process is not None:
+            self._flush_if_idle(files[-1][0])
+        # последний файл ещё пишется; без процесса он мог оборваться — его перечитает следующий запуск
+        completed = files[:-1]
+        if not completed:
+            return None
+        return self.upload(completed[:BATCH_FILES])
+
+    def flush(self):
+        """Выгрузить все завершённые файлы (при остановке архиватора)."""
+        while self.tick():
+            pass
+
+    def upload(self, files):
+        """Загружает files одной пачкой; при успехе удаляет их и возвращает BinlogBatch."""
+        first, last = files[0][0], files[-1][0]
+        filepath = os.path.join(self.directory, f"batch_{binlog_number(first)}_{binlog_number(last)}.tgz")
+        checksum = StreamChecksum(sha256=False)
+        binlog_size = 0
+        with (
+            open(filepath, "wb") as f,
+            gzip.GzipFile(fileobj=ProgressWriter(f, None, checksum), mode="wb",
+                          compresslevel=settings.BACKUP_BINLOG_COMPRESS_LEVEL) as compressed,
+            tarfile.open(fileobj=compressed, mode="w|") as tar,
+        ):
+            for name, _ in files:
+                path = os.path.join(self.directory, name)
+                binlog_size += os.path.getsize(path)
+                tar.add(path, arcname=name)
+        size = os.path.getsize(filepath)
+
+        storage = self.task.file_storage
+        cipher = dump_cipher(self.task)
+        try:
+            remote_path, error = get_storage_service(storage).upload_dump(
+                filepath, f"binlog_{self.task.id}_{binlog_number(first)}_{binlog_number(last)}",
+                checksums={"blake2b": checksum.blake2b}, cipher=cipher)
+        finally:
+            os.remove(filepath)
+        if error:
+            storage_error(storage, "upload")
+            logger.error("Failed to upload binlog %s..%s of task %s: %s", first, last, self.task.id, error)
+            return None
+
+        batch = BinlogBatch.objects.create(
+            task=self.task,
+            first_file=first,
+            last_file=last,
+            files=len(files),
+            closed_dt=datetime.fromtimestamp(max(mtime for _, mtime in files), tz=dt_timezone.utc),
+            binlog_size=binlog_size,
+            size=size,
+            path=remote_path,
+            checksum_blake2b=checksum.blake2b,
+            encryption_key_id=cipher.key_id if cipher else None,
+        )
+        for name, _ in files:
+            os.remove(os.path.join(self.directory, name))
+        logger.info("Binlog %s..%s of task %s uploaded (%s files)", first, last, self.task.id, len(files))
+        return batch
+
+
+class BinlogArchiver:
+    """
+    Непрерывный архив binlog всех задач MySQL с режимом BINLOG (команда
+    archive_binlog): по mysqlbinlog на задачу, перезапуск упавших, выгрузка
+    пачек. Список задач перечитывается на каждом шаге. Архиватор должен
+    работать на одной ноде.
+    """
+
+    def __init__(self):
+        self.receivers = {}
+
+    def _sync(self):
+        tasks = {str(task.id): task for task in binlog_tasks()}
+        for task_id in set(self.receivers) - set(tasks):
+            # задача удалена или сменила режим: файлы остаются в спуле
+            self.receivers.pop(task_id).stop()
+        for task_id, task in tasks.items():
+            if task_id in self.receivers:
+                self.receivers[task_id].task = task
+            else:
+                self.receivers[task_id] = BinlogReceiver(task)
+
+    def run(self, once=False):
+        try:
+            while True:
+                close_old_connections()
+                self._sync()
+                for receiver in self.receivers.values():
+                    # сбой одной задачи (хранилище, диск) не останавливает архив остальных
+                    try:
+                        if once:
+                            receiver.flush()
+                        else:
+                            receiver.ensure_running()
+                            receiver.tick()
+                    except Exception:
+                        logger.exception("Binlog archiving failed for task %s", receiver.task.id)
+                if once:
+                    return
+                time.sleep(settings.BACKUP_BINLOG_POLL_INTERVAL)
+        finally:
+            if not once:
+                for receiver in self.receivers.values():
+                    receiver.stop()
+                    receiver.flush()
+
+
+def binlog_chain(dump_operation, target_time=None, target_position=None):
+    """
+    Пачки binlog, которые проигрываются после загрузки дампа dump_operation
+    до target_time или target_position ('binlog.000042:1337'); без цели — до
+    конца архива -> (batches, error). Пачки должны идти без разрывов от файла
+    позиции дампа. Для target_time берётся ещё одна пачка после первой,
+    закрытой позже него: время события — начало транзакции, она может лежать
+    в следующем файле.
+    """
+    start = binlog_number(dump_operation.manifest["binlog"]["file"])
+    batches = [batch for batch in _task_batches(dump_operation.task_id) if binlog_number(batch.last_file) >= start]
+
+    expected = start
+    for batch in batches:
+        if binlog_number(batch.first_file) > expected:
+            return None, f"Binlog archive has a gap before {batch.first_file}"
+        expected = binlog_number(batch.last_file) + 1
+
+    if target_position:
+        target = parse_binlog_position(target_position)
+        number = binlog_number(target["file"])
+        if number < start or (number == start and target["position"] < dump_operation.manifest["binlog"]["position"]):
+            return None, "Target position is earlier than the dump"
+        chain = [batch for batch in batches if binlog_number(batch.first_file) <= number]
+        if not chain or binlog_number(chain[-1].last_file) < number:
+            return None, f"Binlog is archived only up to {chain[-1].last_file if chain else 'the dump'}"
+        return chain, None
+
+    if target_time is None:
+        return batches, None
+
+    for position, batch in enumerate(batches):
+        if batch.closed_dt >= target_time:
+            return batches[:position + 2], None
+    archived = batches[-1].closed_dt.isoformat() if batches else "the dump"
+    return None, f"Binlog is archived only up to {archived}, later than the target time is needed"
+
+
+def extract_binlog_batch(filepath, binlog_dir, first_file, last_file=None):
+    """
+    Файлы пачки от first_file до last_file (включительно) -> binlog_dir.
+    Возвращает их имена по порядку.
+    """
+    os.makedirs(binlog_dir, exist_ok=True)
+    low = binlog_number(first_file)
+    high = binlog_number(last_file) if last_file else None
+    names = []
+    with tarfile.open(filepath, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or not BINLOG_FILE_RE.match(member.name):
+                continue
+            number = binlog_number(member.name)
+            if number < low or (high is not None and number > high):
+                continue
+            with open(os.path.join(binlog_dir, member.name), "wb") as out:
+                shutil.copyfileobj(tar.extractfile(member), out)
+            names.append(member.name)
+    return sorted(names, key=binlog_number)
+
+
+def binlog_summary(dump_operation):
+    """Цепочка binlog дампа для админки: сколько пачек архива и до какого файла и момента."""
+    if not (dump_operation.manifest or {}).get("binlog"):
+        return None
+    binlog = dump_operation.manifest["binlog"]
+    batches, error = binlog_chain(dump_operation)
+    if error:
+        return f"{binlog['file']}:{binlog['position']}, {error}"
+    if not batches:
+        return f"{binlog['file']}:{binlog['position']}, nothing archived yet"
+    return (f"{binlog['file']}:{binlog['position']} .. {batches[-1].last_file} "
+            f"({len(batches)} batches, up to {batches[-1].closed_dt:%Y-%m-%d %H:%M:%S})")
+
+
+def stale_binlog_batches(task, oldest_dump_operation):
+    """Пачки, которые не нужны самому старому оставшемуся дампу задачи (их можно удалить)."""
+    binlog = (oldest_dump_operation.manifest or {}).get("binlog")
+    if not binlog:
+        return []
+    start = binlog_number(binlog["file"])
+    return [batch for batch in _task_batches(task.id) if binlog_number(batch.last_file) < start]
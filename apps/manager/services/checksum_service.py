@@ -0,0 +1,62 @@
+import hashlib
+
+from django.conf import settings
+
+
+class StreamChecksum:
+    """
+    Контрольные суммы дампа, которые считаются по ходу записи или чтения
+    потока, без отдельного прохода по файлу: BLAKE2b всегда, SHA-256 — если
+    включён BACKUP_CHECKSUM_SHA256 (или явно sha256=True при проверке).
+    """
+
+    def __init__(self, sha256=None):
+        if sha256 is None:
+            sha256 = settings.BACKUP_CHECKSUM_SHA256
+        self._blake2b = hashlib.blake2b()
+        self._sha256 = hashlib.sha256() if sha256 else None
+
+    def reset(self):
+        """Начать заново (поток пишется повторно, например при повторе утилиты)."""
+        self._blake2b = hashlib.blake2b()
+        if self._sha256 is not None:
+            self._sha256 = hashlib.sha256()
+
+    def update(self, data):
+        self._blake2b.update(data)
+        if self._sha256 is not None:
+            self._sha256.update(data)
+
+    @property
+    def blake2b(self):
+        return self._blake2b.hexdigest()
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest() if self._sha256 is not None else None
+
+    def verify(self, operation):
+        """Сверяет посчитанное с суммами операции дампа. Возвращает текст ошибки или None."""
+        if operation.checksum_blake2b and operation.checksum_blake2b != self.blake2b:
+            return f"Checksum mismatch: BLAKE2b {self.blake2b}, expected {operation.checksum_blake2b}"
+        if operation.checksum_sha256 and self.sha256 and operation.checksum_sha256 != self.sha256:
+            return f"Checksum mismatch: SHA-256 {self.sha256}, expected {operation.checksum_sha256}"
+        return None
+
+
+class ChecksumWriter:
+    """
+    Файловый объект только для записи, без seek/tell: zipfile пишет в него архив
+    строго последовательно (с data descriptor-ами), и сумма совпадает с файлом.
+    """
+
+    def __init__(self, fileobj, checksum):
+        self._fileobj = fileobj
+        self._checksum = checksum
+
+    def write(self, data):
+        self._checksum.update(data)
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from ftplib import FTP, error_perm as FTPError
+
+import boto3
+import paramiko
+import yadisk
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.cache import cache
+
+from manager.models import FileStorage
+from manager.services.databases import DB_INTERFACE
+
+logger = logging.getLogger(__name__)
+
+# Таймаут подключения каждого драйвера; общий срок проверки — BACKUP_CHECK_TIMEOUT
+CONNECT_TIMEOUT = 5
+
+
+def _cache_key(kind, *parts):
+    # в ключ входят параметры подключения: после правки объекта старый результат не используется
+    digest = hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+    return f"connection_check:{kind}:{digest}"
+
+
+def _database_key(db):
+    return _cache_key("database", db.pk, db.db_type, db.connection_string)
+
+
+def _storage_key(storage):
+    return _cache_key("storage", storage.pk, storage.type, storage.host, storage.bucket_name,
+                      storage.access_key, storage.secret_key)
+
+
+def _split_host(host, default_port):
+    host, _, port = host.partition(":")
+    return host, int(port) if port else default_port
+
+
+def _check_database(db):
+    try:
+        if DB_INTERFACE[db.db_type]().check_connection(db.connection_string):
+            return True, "connection success!"
+    except Exception as e:
+        return False, f"Connection failed: {e}"
+    return False, "Connection failed!"
+
+
+def _check_storage(storage):
+    try:
+        if storage.type == FileStorage.TYPE_YADISK:
+            if not storage.secret_key:
+                return False, "Yandex Disk token is empty (secret_key)."
+            y = yadisk.YaDisk(token=storage.secret_key,
+                              default_args={"timeout": CONNECT_TIMEOUT, "n_retries": 0})
+            if not y.check_token():
+                return False, "Yandex Disk token is invalid."
+            y.get_disk_info()
+            return True, "(Yandex Disk) connection success!"
+        elif storage.type == FileStorage.TYPE_FTP:
+            host, port = _split_host(storage.host, 21)
+            ftp = FTP()
+            ftp.connect(host, port, timeout=CONNECT_TIMEOUT)
+            ftp.login(storage.access_key, storage.secret_key)
+            ftp.pwd()  # Test command
+            ftp.quit()
+            return True, "(FTP) connection success!"
+        elif storage.type == FileStorage.TYPE_SFTP:
+            host, port = _split_host(storage.host, 22)
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(
+                hostname=host,
+                port=port,
+                username=storage.access_key,
+                password=storage.secret_key,
+                timeout=CONNECT_TIMEOUT,
+                banner_timeout=CONNECT_TIMEOUT,
+                auth_timeout=CONNECT_TIMEOUT,
+            )
+            try:
+                sftp = ssh.open_sftp()
+                sftp.listdir('.')  # Test command
+                sftp.close()
+            finally:
+                ssh.close()
+            return True, "(SFTP) connection success!"
+        else:
+            s3_client = boto3.client(
+                "s3",
+                endpoint_url=storage.host,
+                aws_access_key_id=storage.access_key,
+                aws_secret_access_key=storage.secret_key,
+                verify=(storage.host or "").startswith("https"),
+                config=Config(connect_timeout=CONNECT_TIMEOUT, read_timeout=CONNECT_TIMEOUT,
+                              retries={"max_attempts": 1}),
+            )
+            s3_client.list_buckets()
+            return True, "(S3) connection success!"
+    except ClientError as e:
+        return False, f"Connection failed: {e}"
+    except FTPError as e:
+        return False, f"FTP Connection failed: {e}"
+    except paramiko.SSHException as e:
+        return False, f"SFTP Connection failed: {e}"
+    except Exception as e:
+        return False, f"Connection failed: {e}"
+
+
+def _run_checks(check, objects, key, reuse_failures=True):
+    """
+    Проверяет объекты параллельно в пуле потоков и возвращает {pk: (ok, message)}.
+    Вся пачка укладывается в BACKUP_CHECK_TIMEOUT: не успевшие считаются
+    неудачными, их потоки дорабатывают в фоне до своих таймаутов подключения.
+    Результаты кешируются на BACKUP_CHECK_CACHE_TTL и переиспользуются
+    (неудачные — только если reuse_failures).
+    """
+    results = {}
+    pending = {}
+    for obj in objects:
+        cached = cache.get(key(obj))
+        if cached is not None and (cached[0] or reuse_failures):
+            results[obj.pk] = tuple(cached)
+        else:
+            pending[obj.pk] = obj
+    if not pending:
+        return results
+
+    timeout = settings.BACKUP_CHECK_TIMEOUT
+    executor = ThreadPoolExecutor(max_workers=min(len(pending), settings.BACKUP_CHECK_WORKERS),
+                                  thread_name_prefix="connection-check")
+    futures = {executor.submit(check, obj): obj for obj in pending.values()}
+    done, _ = wait(futures, timeout=timeout)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, obj in futures.items():
+        if future in done:
+            result = future.result()
+        else:
+            result = (False, f"Connection check timed out after {timeout:g}s")
+            logger.warning("Connection check of %s timed out", obj)
+        results[obj.pk] = result
+        cache.set(key(obj), result, settings.BACKUP_CHECK_CACHE_TTL)
+    return results
+
+
+def check_databases(databases, reuse_failures=True):
+    return _run_checks(_check_database, databases, _database_key, reuse_failures)
+
+
+def check_storages(storages, reuse_failures=True):
+    return _run_checks(_check_storage, storages, _storage_key, reuse_failures)
+
+
+def database_is_reachable(db):
+    """Для начала операции: недавний успешный результат берётся из кеша, неудачный перепроверяется."""
+    is_connected, _ = check_databases([db], reuse_failures=False)[db.pk]
+    return is_connected
@@ -1,5 +1,6 @@
+import logging
 import os
-from urllib.parse import urlparse
+from urllib.parse import unquote, urlparse
 import shutil
 import subprocess
 import tempfile
@@ -8,8 +9,16 @@ import zipfile
 from clickhouse_driver import Client
 from clickhouse_driver.errors import NetworkError, ServerException
 
+from manager.services.checksum_service import ChecksumWriter
+from manager.services.manifest_service import add_section
+from manager.services.process import run_tool
+
+logger = logging.getLogger(__name__)
+
 
 class ClickhouseService:
+    # Архив распаковывается в /var/lib/clickhouse/backup, в спуле лежит только zip
+    restore_space_factor = 1
 
     def parse_connection_string(self, connection_string):
         parsed_url = urlparse(connection_string)
@@ -27,7 +36,7 @@ class ClickhouseService:
             parsed_url = urlparse(connection_string)
 
             if parsed_url.scheme != "clickhouse":
-                print("Invalid connection string scheme. Expected 'clickhouse'")
+                logger.error("Invalid connection string scheme. Expected 'clickhouse'")
                 return False
 
             # Извлекаем параметры из строки подключения
@@ -43,7 +52,10 @@ class ClickhouseService:
                 port=port,
                 user=user,
                 password=password,
-                database=database
+                database=database,
+                connect_timeout=5,
+                send_receive_timeout=5,
+                sync_request_timeout=5,
             )
 
             # Пробуем выполнить простой запрос
@@ -51,13 +63,69 @@ class ClickhouseService:
             return True
 
         except (NetworkError, ServerException) as e:
-            print(f"Connection failed: {e}")
+            logger.warning("Connection failed: %s", e)
             return False
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            logger.exception("Unexpected error: %s", e)
             return False
 
-    def _create_config(self, connection_string):
+    def estimate_size(self, connection_string):
+        """Размер активных партов БД в байтах (system.parts) или None."""
+        try:
+            user, password, host, port, database = self.parse_connection_string(connection_string)
+            client = Client(host=host, port=port, user=user, password=password, database=database)
+            rows = client.execute(
+                "SELECT sum(bytes_on_disk) FROM system.parts WHERE active AND database = %(database)s",
+                {"database": database}
+            )
+            return int(rows[0][0] or 0)
+        except Exception as e:
+            logger.warning("Failed to estimate database size: %s", e)
+            return None
+
+    def table_stats(self, connection_string):
+        """{"table": {"rows": строк в активных партах, "bytes": размер на диске}} или None."""
+        try:
+            user, password, host, port, database = self.parse_connection_string(connection_string)
+            client = Client(host=host, port=port, user=user, password=password, database=database)
+            rows = client.execute(
+                "SELECT table, sum(rows), sum(bytes_on_disk) FROM system.parts "
+                "WHERE active AND database = %(database)s GROUP BY table",
+                {"database": database}
+            )
+            return {table: {"rows": int(count), "bytes": int(size)} for table, count, size in rows}
+        except Exception as e:
+            logger.warning("Failed to read table stats: %s", e)
+            return None
+
+    def tool_versions(self, connection_string):
+        """Версии clickhouse-backup и сервера (для манифеста дампа)."""
+        versions = {}
+        try:
+            versions["client"] = subprocess.check_output(
+                ["clickhouse-backup", "--version"], stderr=subprocess.STDOUT, text=True, timeout=10).strip()
+        except Exception as e:
+            logger.warning("Failed to read clickhouse-backup version: %s", e)
+        try:
+            user, password, host, port, database = self.parse_connection_string(connection_string)
+            client = Client(host=host, port=port, user=user, password=password, database=database,
+                            connect_timeout=5, send_receive_timeout=30)
+            versions["server"] = client.execute("SELECT version()")[0][0]
+        except Exception as e:
+            logger.warning("Failed to read server version: %s", e)
+        return versions
+
+    def count_rows(self, connection_string, tables):
+        """Точное число строк в таблицах -> {table: count}."""
+        user, password, host, port, database = self.parse_connection_string(connection_string)
+        client = Client(host=host, port=port, user=user, password=password, database=database)
+        counts = {}
+        for table in tables:
+            quoted = table.replace("`", "\\`")
+            counts[table] = client.execute(f"SELECT count() FROM `{quoted}`")[0][0]
+        return counts
+
+    def _create_config(self, connection_string, workdir):
         user, password, host, port, database = self.parse_connection_string(connection_string)
         # Динамически создаём временный конфиг
         config_content = f"""
@@ -82,39 +150,58 @@ s3:
   path: "/"
 """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".yml") as temp_config:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".yml", dir=workdir) as temp_config:
                 config_file_path = temp_config.name
                 temp_config.write(config_content.encode())
         except Exception as e:
             return None, f"Error cretate temp config: {e}"
         return config_file_path, None
     
-    def dump_database(self, connection_string, operation_id):
+    @staticmethod
+    def _zip_sections(infos, end, sections):
+        """Диапазоны таблиц в архиве: файлы партов shadow/<db>/<table>/... идут подряд."""
+        infos = sorted(infos, key=lambda info: info.header_offset)
+        for index, info in enumerate(infos):
+            parts = info.filename.split("/")
+            if len(parts) < 3 or parts[0] != "shadow":
+                continue
+            entry_end = infos[index + 1].header_offset if index + 1 < len(infos) else end
+            add_section(sections, unquote(parts[2]), info.header_offset, entry_end)
+
+    def dump_database(self, connection_string, operation_id, workdir, progress=None, checksum=None,
+                      index=None):
         file_name = f"dump_{operation_id}"
+        # локальное хранилище clickhouse-backup: туда он кладёт hardlink-и партов
         folder_prefix = "/var/lib/clickhouse/backup/"
         backup_path = os.path.join(folder_prefix, file_name)
-        zip_file_path = f"/tmp/{file_name}.zip"
+        zip_file_path = os.path.join(workdir, f"{file_name}.zip")
 
-        config_file_path, error = self._create_config(connection_string)
+        config_file_path, error = self._create_config(connection_string, workdir)
         if error:
             return None, error
 
         try:
-            command = f"clickhouse-backup create {file_name} --config {config_file_path}"
-            subprocess.run(command, shell=True, check=True)
+            run_tool(["clickhouse-backup", "create", file_name, "--config", config_file_path])
         except Exception as e:
             return None, f"Error executing command: {e}"
         finally:
             # Удаление временного файла конфигурации
             os.remove(config_file_path)
         try:
-            # Упаковка папки в zip-архив
-            with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(backup_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, start=backup_path)
-                        zipf.write(file_path, arcname)
+            # Упаковка папки в zip-архив; с checksum архив пишется потоком и сразу хешируется
+            with open(zip_file_path, 'wb') as f:
+                target = ChecksumWriter(f, checksum) if checksum else f
+                with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for root, dirs, files in os.walk(backup_path):
+                        for file in files:
+                            file_path = os.path.join(root, file)
+                            arcname = os.path.relpath(file_path, start=backup_path)
+                            zipf.write(file_path, arcname)
+                            if progress:
+                                progress.add(os.path.getsize(file_path))
+                    if index is not None:
+                        # перед центральным каталогом: fp.tell() — конец данных последнего файла
+                        self._zip_sections(zipf.infolist(), zipf.fp.tell(), index.tables)
 
             # Удаление папки с бэкапом после упаковки
             shutil.rmtree(backup_path)
@@ -123,27 +210,29 @@ s3:
 
         return zip_file_path, None
     
-    def load_dump(self, connection_string, filepath):
+    def load_dump(self, connection_string, filepath, progress=None):
         """Загрузка дампа в ClickHouse из zip-архива."""
         file_name = os.path.basename(filepath).replace(".zip", "")
         folder_prefix = "/var/lib/clickhouse/backup/"
         backup_path = os.path.join(folder_prefix, file_name)
 
-        config_file_path, error = self._create_config(connection_string)
+        config_file_path, error = self._create_config(connection_string, os.path.dirname(filepath))
         if error:
             return False, error
         # Распаковываем архив в /var/lib/clickhouse/backup
         try:
             with zipfile.ZipFile(filepath, 'r') as zip_ref:
-                zip_ref.extractall(backup_path)
+                for member in zip_ref.infolist():
+                    zip_ref.extract(member, backup_path)
+                    if progress:
+                        progress.add(member.compress_size)
         except Exception as e:
             os.remove(config_file_path)
             return False, f"Error extracting zip file: {e}"
 
         # Выполняем команду восстановления дампа
         try:
-            command = f"clickhouse-backup restore {file_name} --config {config_file_path} --data"
-            subprocess.run(command, shell=True, check=True)
+            run_tool(["clickhouse-backup", "restore", file_name, "--config", config_file_path, "--data"])
         except subprocess.CalledProcessError as e:
             return False, f"Error restoring backup: {e}"
         finally:
@@ -1,3 +1,6 @@
+import gzip
+import logging
+import os
 import shlex
 import shutil
 import subprocess
@@ -6,6 +9,17 @@ from urllib.parse import unquote, urlparse
 import pymysql
 from pymysql.err import OperationalError
 
+from manager.services.manifest_service import (MYSQL_BINLOG_POSITION_RE,
+                                               MYSQL_SECTION_RE, DumpIndex,
+                                               FramedGzipWriter, mysql_table)
+from manager.services.process import CHUNK_SIZE, Pipe, run_tool
+from manager.services.progress_service import ProgressReader
+
+logger = logging.getLogger(__name__)
+
+# Позиция binlog стоит в прологе дампа, до первой таблицы: дальше не читаем
+BINLOG_POSITION_SCAN = 1024 * 1024
+
 
 class MySQLService:
     """
@@ -18,6 +32,8 @@ class MySQLService:
       плюс триггеры/ивенты/рутины.
     """
 
+    restore_space_factor = 1
+
     @staticmethod
     def _supports_flag(binary: str, flag: str) -> bool:
         """
@@ -108,10 +124,102 @@ class MySQLService:
         except Exception:
             return False
 
-    def dump_database(self, connection_string: str, operation_id: int):
+    @staticmethod
+    def estimate_size(connection_string: str):
+        """Объём данных БД в байтах по information_schema (индексы в дамп не попадают)."""
+        try:
+            user, password, host, port, database = MySQLService._parse_connection_string(connection_string)
+            conn = pymysql.connect(
+                host=host, port=port, user=user, password=password, database=database,
+                connect_timeout=5, charset="utf8mb4"
+            )
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT COALESCE(SUM(data_length), 0) FROM information_schema.tables "
+                        "WHERE table_schema = %s",
+                        (database,)
+                    )
+                    return int(cur.fetchone()[0])
+        except Exception as e:
+            logger.warning("Failed to estimate database size: %s", e)
+            return None
+
+    @staticmethod
+    def table_stats(connection_string: str):
+        """{"table": {"rows": оценка TABLE_ROWS, "bytes": данные + индексы}} или None."""
+        try:
+            user, password, host, port, database = MySQLService._parse_connection_string(connection_string)
+            conn = pymysql.connect(
+                host=host, port=port, user=user, password=password, database=database,
+                connect_timeout=5, charset="utf8mb4"
+            )
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT table_name, table_rows, data_length + index_length "
+                        "FROM information_schema.tables "
+                        "WHERE table_schema = %s AND table_type = 'BASE TABLE'",
+                        (database,)
+                    )
+                    return {
+                        table: {"rows": rows, "bytes": size}
+                        for table, rows, size in cur.fetchall()
+                    }
+        except Exception as e:
+            logger.warning("Failed to read table stats: %s", e)
+            return None
+
+    def tool_versions(self, connection_string: str):
+        """Версии mysqldump и сервера (для манифеста дампа)."""
+        versions = {}
+        try:
+            versions["client"] = subprocess.check_output(
+                [self._bin(["mysqldump", "mariadb-dump"]), "--version"], stderr=subprocess.STDOUT, text=True,
+                timeout=10).strip()
+        except Exception as e:
+            logger.warning("Failed to read mysqldump version: %s", e)
+        try:
+            user, password, host, port, database = self._parse_connection_string(connection_string)
+            conn = pymysql.connect(
+                host=host, port=port, user=user, password=password, database=database,
+                connect_timeout=5, charset="utf8mb4"
+            )
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT VERSION()")
+                    versions["server"] = cur.fetchone()[0]
+        except Exception as e:
+            logger.warning("Failed to read server version: %s", e)
+        return versions
+
+    @staticmethod
+    def count_rows(connection_string: str, tables):
+        """Точное число строк в таблицах -> {table: count}."""
+        user, password, host, port, database = MySQLService._parse_connection_string(connection_string)
+        conn = pymysql.connect(
+            host=host, port=port, user=user, password=password, database=database,
+            connect_timeout=5, charset="utf8mb4"
+        )
+        counts = {}
+        with conn:
+            with conn.cursor() as cur:
+                for table in tables:
+                    cur.execute("SELECT COUNT(*) FROM `{}`".format(table.replace("`", "``")))
+                    counts[table] = cur.fetchone()[0]
+        return counts
+
+    def dump_database(self, connection_string: str, operation_id: int, workdir: str, progress=None,
+                      checksum=None, index=None, binlog_position=False):
+        """
+        Дамп пишется кадрами gzip по таблицам (FramedGzipWriter): в index — сжатые
+        смещения таблиц, по ним можно восстановить отдельные таблицы, не скачивая весь дамп.
+        binlog_position — записать в пролог позицию binlog, согласованную со снимком
+        (читается read_binlog_position); нужны binlog на сервере и право RELOAD.
+        """
         user, password, host, port, database = self._parse_connection_string(connection_string)
 
-        output_file = f"/tmp/dump_{operation_id}.sql"
+        output_file = os.path.join(workdir, f"dump_{operation_id}.sql.gz")
         mysqldump = self._bin(["mysqldump", "mariadb-dump"])
 
         _ = self._brand(mysqldump)
@@ -139,30 +247,143 @@ class MySQLService:
         if self._supports_flag(mysqldump, "--set-gtid-purged"):
             cmd.append("--set-gtid-purged=OFF")
 
+        # Позиция для архива binlog: MySQL 8.0.26+ — --source-data, раньше и в MariaDB — --master-data
+        if binlog_position:
+            if self._supports_flag(mysqldump, "--source-data"):
+                cmd.append("--source-data=2")
+            else:
+                cmd.append("--master-data=2")
+
         # Логируем без пароля
         safe_cmd = [x if not x.startswith("--password=") else "--password=****" for x in cmd]
-        print("Выполняем команду mysqldump:", " ".join(shlex.quote(x) for x in safe_cmd), f"{database=}")
+        logger.info("Выполняем команду mysqldump: %s database=%s", " ".join(shlex.quote(x) for x in safe_cmd), database)
 
+        # секция таблицы (структура + данные) — отдельный кадр; progress и checksum — по сжатому
+        index = index if index is not None else DumpIndex()
         try:
             with open(output_file, "wb") as f:
-                subprocess.run(cmd + [database], check=True, stdout=f)
-        except subprocess.CalledProcessError as e:
-            # Доп. фолбэк: если упало из-за неизвестного флага — повторим без спорных ключей
-            msg = str(e)
-            if "unknown option" in msg.lower() or "unknown variable" in msg.lower():
-                print("Повтор дампа без спорных ключей (--set-gtid-purged/--column-statistics).")
-                fallback = [a for a in cmd if not a.startswith(
-                    "--set-gtid-purged") and not a.startswith("--column-statistics")]
-                with open(output_file, "wb") as f:
-                    subprocess.run(fallback + [database], check=True, stdout=f)
-            else:
-                return None, f"Ошибка при создании дампа MySQL: {e}"
+                writer = FramedGzipWriter(f, index, MYSQL_SECTION_RE, mysql_table, checksum, progress)
+                try:
+                    run_tool(cmd + [database], stdout_file=writer)
+                except subprocess.CalledProcessError as e:
+                    # Доп. фолбэк: если упало из-за неизвестного флага — повторим без спорных ключей
+                    # причина — в stderr утилиты, str(e) содержит только команду и код возврата
+                    msg = (e.stderr or "").lower()
+                    if "unknown option" not in msg and "unknown variable" not in msg:
+                        return None, f"Ошибка при создании дампа MySQL: {e}"
+                    logger.info("Повтор дампа без спорных ключей (--set-gtid-purged/--column-statistics).")
+                    fallback = [a for a in cmd if not a.startswith(
+                        "--set-gtid-purged") and not a.startswith("--column-statistics")]
+                    writer.reset()
+                    run_tool(fallback + [database], stdout_file=writer)
+                writer.close()
         except Exception as e:
             return None, f"Неизвестная ошибка дампа MySQL: {e}"
 
         return output_file, None
 
-    def load_dump(self, connection_string: str, filepath: str):
+    @staticmethod
+    def read_binlog_position(filepath):
+        """Позиция binlog из пролога дампа -> {"file", "position"} или None."""
+        with gzip.open(filepath, "rb") as f:
+            match = MYSQL_BINLOG_POSITION_RE.search(f.read(BINLOG_POSITION_SCAN))
+        if not match:
+            return None
+        return {"file": match["file"].decode(), "position": int(match["position"])}
+
+    def receive_binlog_command(self, connection_string: str, directory: str, start_file: str, server_id: int):
+        """
+        mysqlbinlog, который подключается к серверу как реплика и пишет файлы
+        binlog как есть (--raw) в directory под их именами, начиная со start_file,
+        и ждёт новых событий (--stop-never). Нужно право REPLICATION SLAVE.
+        """
+        user, password, host, port, database = self._parse_connection_string(connection_string)
+        mysqlbinlog = self._bin(["mysqlbinlog", "mariadb-binlog"])
+        cmd = [
+            mysqlbinlog,
+            f"--host={host}",
+            f"--port={port}",
+            f"--user={user}",
+            f"--password={password}",
+            "--read-from-remote-server",
+            "--raw",
+            "--stop-never",
+            # префикс имён файлов: каталог со слешем на конце
+            f"--result-file={os.path.join(directory, '')}",
+        ]
+        # у реплик одного сервера server_id должны различаться
+        if self._supports_flag(mysqlbinlog, "--connection-server-id"):
+            cmd.append(f"--connection-server-id={server_id}")
+        else:
+            cmd.append(f"--stop-never-slave-server-id={server_id}")
+        return cmd + [start_file]
+
+    def flush_binary_logs(self, connection_string: str):
+        """Закрывает текущий файл binlog (FLUSH BINARY LOGS, право RELOAD)."""
+        user, password, host, port, database = self._parse_connection_string(connection_string)
+        conn = pymysql.connect(
+            host=host, port=port, user=user, password=password,
+            connect_timeout=5, charset="utf8mb4"
+        )
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("FLUSH BINARY LOGS")
+
+    def replay_binlog(self, connection_string: str, files, start_position: int, stop_position=None,
+                      stop_datetime=None, progress=None):
+        """
+        Проигрывает файлы binlog (по порядку) в БД после загрузки дампа: события
+        этой БД с start_position первого файла до stop_position последнего или до
+        stop_datetime. mysqlbinlog и mysql соединены пайпом, все файлы идут
+        одним сеансом — временные таблицы и переменные переживают ротацию.
+        progress считает SQL, переданный в mysql. Возвращает (ok, error).
+        """
+        user, password, host, port, database = self._parse_connection_string(connection_string)
+        mysqlbinlog = self._bin(["mysqlbinlog", "mariadb-binlog"])
+        replay_cmd = [mysqlbinlog, f"--start-position={start_position}", f"--database={database}"]
+        if stop_position is not None:
+            replay_cmd.append(f"--stop-position={stop_position}")
+        if stop_datetime is not None:
+            # mysqlbinlog понимает время в часовом поясе процесса
+            replay_cmd.append(f"--stop-datetime={stop_datetime.astimezone():%Y-%m-%d %H:%M:%S}")
+        # иначе сервер с GTID_MODE=ON пропустит уже выполненные у него транзакции
+        if self._supports_flag(mysqlbinlog, "--skip-gtids"):
+            replay_cmd.append("--skip-gtids")
+        load_cmd = [
+            self._bin(["mysql", "mariadb"]),
+            f"--host={host}",
+            f"--port={port}",
+            f"--user={user}",
+            f"--password={password}",
+            "--default-character-set=utf8mb4",
+            database,
+        ]
+        try:
+            logger.info("Replay %s binlog files from %s:%s", len(files), os.path.basename(files[0]), start_position)
+            with Pipe(lambda out: run_tool(replay_cmd + list(files), stdout_file=out)) as stream:
+                run_tool(load_cmd, stdin_chunks=iter(lambda: stream.read(CHUNK_SIZE), b""), progress=progress)
+        except subprocess.CalledProcessError as e:
+            return False, f"Ошибка при проигрывании binlog MySQL: {e}"
+        except Exception as e:
+            return False, f"Неизвестная ошибка MySQL: {e}"
+        return True, None
+
+    @staticmethod
+    def _gzip_chunks(filepath, progress=None):
+        """Распакованный дамп блоками; progress считает прочитанные сжатые байты."""
+        with open(filepath, "rb") as raw, gzip.GzipFile(fileobj=ProgressReader(raw, progress)) as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def load_dump(self, connection_string: str, filepath: str, progress=None, tables=None):
+        """
+        Загружает дамп (.sql или кадры gzip .sql.gz). С tables файл содержит только
+        пролог и секции этих таблиц (см. frame_ranges): остальные таблицы БД не трогаются,
+        а загружаемые пересоздаются их же DROP TABLE IF EXISTS из дампа.
+        """
         try:
             with open(filepath, "rb"):
                 pass
@@ -189,19 +410,19 @@ class MySQLService:
                 f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4 COLLATE {collation};"
             ]
             try:
-                print(f"Ensure database exists with collation {collation} ...")
-                subprocess.run(create_cmd, check=True)
+                logger.info("Ensure database exists with collation %s ...", collation)
+                run_tool(create_cmd)
                 create_ok = True
                 break
             except subprocess.CalledProcessError as e:
                 last_err = e
-                print(f"Collation {collation} not supported, trying next...")
+                logger.info("Collation %s not supported, trying next...", collation)
 
         if not create_ok:
             return False, f"Не удалось создать БД: {last_err}"
 
         # 2) Очистить БД: дропаем все объекты внутри (без удаления самой БД)
-        #    Это безопасно даже при ограниченных правах.
+        #    Это безопасно даже при ограниченных правах. При частичном восстановлении не чистим.
         cleanup_sql = rf"""
         SET FOREIGN_KEY_CHECKS=0;
         SELECT CONCAT('DROP TABLE IF EXISTS `', table_name, '`;')
@@ -218,18 +439,19 @@ class MySQLService:
             f"FROM information_schema.tables WHERE table_schema='{database}' AND table_type='BASE TABLE';"
         ]
         try:
-            print("Listing tables to drop...")
-            out = subprocess.check_output(list_cmd, text=True)
-            if out.strip():
-                drop_cmd = [
-                    mysql_bin, f"--host={host}", f"--port={port}",
-                    f"--user={user}", f"--password={password}", database
-                ]
-                print("Dropping existing tables...")
-                subprocess.run(drop_cmd, input="SET FOREIGN_KEY_CHECKS=0;\n"+out, text=True, check=True)
+            if not tables:
+                logger.info("Listing tables to drop...")
+                out = run_tool(list_cmd, capture=True).output.decode()
+                if out.strip():
+                    drop_cmd = [
+                        mysql_bin, f"--host={host}", f"--port={port}",
+                        f"--user={user}", f"--password={password}", database
+                    ]
+                    logger.info("Dropping existing tables...")
+                    run_tool(drop_cmd, stdin_chunks=[("SET FOREIGN_KEY_CHECKS=0;\n" + out).encode()])
         except subprocess.CalledProcessError as e:
             # Не критично: если таблиц нет — ничего не дропнем
-            print(f"Warn: cleanup step failed/non-critical: {e}")
+            logger.warning("Cleanup step failed/non-critical: %s", e)
 
         # 3) Импорт дампа
         load_cmd = [
@@ -242,9 +464,11 @@ class MySQLService:
             database,
         ]
         try:
-            print("Load dump...")
-            with open(filepath, "rb") as f:
-                subprocess.run(load_cmd, check=True, stdin=f)
+            logger.info("Load dump...")
+            if filepath.endswith(".gz"):
+                run_tool(load_cmd, stdin_chunks=self._gzip_chunks(filepath, progress))
+            else:
+                run_tool(load_cmd, stdin_path=filepath, progress=progress)
         except subprocess.CalledProcessError as e:
             return False, f"Ошибка при загрузке дампа MySQL: {e}"
         except Exception as e:
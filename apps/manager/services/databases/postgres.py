@@ -1,9 +1,34 @@
+import logging
+import os
+import re
 import subprocess
+import tarfile
 
 import psycopg2
+from django.conf import settings
+from psycopg2 import sql
+
+from manager.services.manifest_service import (LAYOUT_PG_BASEBACKUP_TAR, PG_SECTION_RE, SectionScanner,
+                                               pg_table)
+from manager.services.process import CHUNK_SIZE, run_tool
+from manager.services.progress_service import ProgressReader
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TIMEOUT_RE = re.compile(rb"^SET\s+transaction_timeout")
+PG_DUMP = "/usr/lib/postgresql/17/bin/pg_dump"
+PG_BASEBACKUP = "/usr/lib/postgresql/17/bin/pg_basebackup"
+PG_RECEIVEWAL = "/usr/lib/postgresql/17/bin/pg_receivewal"
+# pg_basebackup -v: "write-ahead log start point: 0/2000028 on timeline 1"
+WAL_POINT_RE = re.compile(r"write-ahead log (start|end) point: ([0-9A-F]+/[0-9A-F]+)(?: on timeline (\d+))?")
+DEFAULT_WAL_SEGMENT_SIZE = 16 * 1024 * 1024
+# архивы pg_basebackup -Ft -z: base — каталог данных, pg_wal — WAL на время копии, <oid> — табличные пространства
+BASE_ARCHIVE_RE = re.compile(r"^(?P<name>base|pg_wal|\d+)\.tar\.gz$")
 
 
 class PostgresqlService:
+    # дамп фильтруется на лету при подаче в psql, копий на диске нет
+    restore_space_factor = 1
 
     @staticmethod
     def check_connection(connection_string: str) -> bool:
@@ -16,25 +41,295 @@ class PostgresqlService:
         except Exception:
             return False
 
-    def dump_database(self, connection_string, operation_id):
-        output_file = f"/tmp/dump_{operation_id}.sql"
-        pg_dump = "/usr/lib/postgresql/17/bin/pg_dump"
+    @staticmethod
+    def estimate_size(connection_string: str):
+        """Размер БД в байтах (pg_database_size) или None, если узнать не удалось."""
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_database_size(current_database())")
+                    return int(cur.fetchone()[0])
+        except Exception as e:
+            logger.warning("Failed to estimate database size: %s", e)
+            return None
+
+    @staticmethod
+    def table_stats(connection_string: str):
+        """
+        {"schema.table": {"rows": оценка из pg_class, "bytes": размер с индексами и TOAST}}
+        или None. rows = None, если таблица ещё ни разу не анализировалась.
+        """
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT n.nspname, c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid) "
+                        "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                        "WHERE c.relkind IN ('r', 'p') AND NOT c.relispartition "
+                        "AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+                        "AND n.nspname NOT LIKE 'pg_toast%%'"
+                    )
+                    return {
+                        f"{schema}.{table}": {"rows": rows if rows >= 0 else None, "bytes": size}
+                        for schema, table, rows, size in cur.fetchall()
+                    }
+        except Exception as e:
+            logger.warning("Failed to read table stats: %s", e)
+            return None
+
+    @staticmethod
+    def tool_versions(connection_string: str):
+        """Версии pg_dump и сервера (для манифеста дампа)."""
+        versions = {}
+        try:
+            versions["client"] = subprocess.check_output(
+                [PG_DUMP, "--version"], stderr=subprocess.STDOUT, text=True, timeout=10).strip()
+        except Exception as e:
+            logger.warning("Failed to read pg_dump version: %s", e)
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SHOW server_version")
+                    versions["server"] = cur.fetchone()[0]
+        except Exception as e:
+            logger.warning("Failed to read server version: %s", e)
+        return versions
+
+    @staticmethod
+    def count_rows(connection_string: str, tables):
+        """Точное число строк в таблицах ("schema.table") -> {table: count}."""
+        counts = {}
+        with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+            with conn.cursor() as cur:
+                for name in tables:
+                    schema, _, table = name.partition(".")
+                    cur.execute(sql.SQL("SELECT count(*) FROM {}.{}").format(
+                        sql.Identifier(schema), sql.Identifier(table)))
+                    counts[name] = cur.fetchone()[0]
+        return counts
+
+    def dump_database(self, connection_string, operation_id, workdir, progress=None, checksum=None,
+                      index=None):
+        output_file = os.path.join(workdir, f"dump_{operation_id}.sql")
+        pg_dump = PG_DUMP
         # --clean   -> добавить DROP
         # --if-exists -> безопасные DROP IF EXISTS
         # --no-owner/--no-privileges -> не трогать владельцев/гранты
-        command = (
-            f'{pg_dump} "{connection_string}" '
-            f'--clean --if-exists --no-owner --no-privileges '
-            f'-f "{output_file}"'
-        )
-        print("Выполняем команду dump")
+        # вывод идёт через пайп, чтобы считать прогресс
+        command = [
+            pg_dump, connection_string,
+            "--clean", "--if-exists", "--no-owner", "--no-privileges",
+        ]
+        logger.info("Выполняем команду dump")
+        # смещения данных таблиц (секции TABLE DATA) в файле дампа — для манифеста
+        scanner = SectionScanner(index.tables, PG_SECTION_RE, pg_table) if index is not None else None
         try:
-            subprocess.run(command, shell=True, check=True)
+            run_tool(command, stdout_path=output_file, progress=progress, checksum=checksum, scanner=scanner)
         except subprocess.CalledProcessError as e:
             return None, f"Ошибка при создании дампа: {e}"
+        if scanner:
+            scanner.finish()
         return output_file, None
 
-    def load_dump(self, connection_string, filepath):
+    @staticmethod
+    def wal_segment_size(connection_string):
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT setting::bigint FROM pg_settings WHERE name = 'wal_segment_size'")
+                    return int(cur.fetchone()[0])
+        except Exception as e:
+            logger.warning("Failed to read wal_segment_size: %s", e)
+            return DEFAULT_WAL_SEGMENT_SIZE
+
+    @staticmethod
+    def cluster_size(connection_string):
+        """Размер всех баз кластера в байтах (оценка физической копии) или None."""
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT sum(pg_database_size(oid)) FROM pg_database")
+                    return int(cur.fetchone()[0])
+        except Exception as e:
+            logger.warning("Failed to estimate cluster size: %s", e)
+            return None
+
+    @staticmethod
+    def server_version(connection_string):
+        """server_version_num (например, 170002) или None."""
+        try:
+            with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+                return conn.server_version
+        except Exception as e:
+            logger.warning("Failed to read server version: %s", e)
+            return None
+
+    @staticmethod
+    def _wal_range(stderr_lines):
+        """Timeline и LSN начала/конца копии из вывода pg_basebackup -v."""
+        info = {}
+        for line in stderr_lines:
+            match = WAL_POINT_RE.search(line)
+            if match:
+                info[f"{match[1]}_lsn"] = match[2]
+                if match[3]:
+                    info["timeline"] = int(match[3])
+        return info
+
+    def stream_base_backup(self, connection_string, out, progress=None, checksum=None):
+        """
+        Физическая копия кластера одним потоком в out (пайп загрузки): pg_basebackup
+        -D - -Ft пишет base.tar.gz в stdout, WAL на время копии — внутри (-X fetch).
+        Сжимает pg_basebackup, backup_manifest он кладёт в архив; с
+        BACKUP_PG_SERVER_COMPRESSION (PostgreSQL 15+) сжимает сервер, и манифеста
+        нет — в сжатый сервером поток вставить его нельзя. Возвращает
+        (wal, details, error): wal — timeline, start_lsn, end_lsn и wal_segment_size
+        (по ним выбираются сегменты WAL при восстановлении на момент времени).
+        """
+        level = settings.BACKUP_PG_BASEBACKUP_COMPRESS_LEVEL
+        server_compression = (settings.BACKUP_PG_SERVER_COMPRESSION
+                              and (self.server_version(connection_string) or 0) >= 150000)
+        command = [
+            PG_BASEBACKUP, "-d", connection_string, "-D", "-", "-Ft", "-X", "fetch",
+            "--checkpoint=fast", "--no-password", "-v",
+        ]
+        if server_compression:
+            command += [f"--compress=server-gzip:{level}", "--no-manifest"]
+        else:
+            command.append(f"--compress=gzip:{level}")
+        logger.info("Выполняем pg_basebackup")
+        try:
+            usage = run_tool(command, stdout_file=out, progress=progress, checksum=checksum)
+        except subprocess.CalledProcessError as e:
+            return None, None, f"Ошибка при создании базовой копии: {e}"
+        except OSError as e:
+            # загрузка оборвалась и закрыла пайп: причину вернёт хранилище
+            return None, None, f"Base backup stream was interrupted: {e}"
+        wal = self._wal_range(usage.stderr_tail)
+        if "start_lsn" not in wal or "timeline" not in wal:
+            return None, None, "pg_basebackup did not report the WAL start point of the backup"
+        wal["wal_segment_size"] = self.wal_segment_size(connection_string)
+        details = {
+            "compression": "server-gzip" if server_compression else "gzip",
+            "backup_manifest": not server_compression,
+        }
+        return wal, details, None
+
+    def unpack_base_backup(self, fileobj, data_dir, layout, progress=None):
+        """
+        Разворачивает поток базовой копии в пустой data_dir по мере скачивания.
+        LAYOUT_PG_BASEBACKUP_TAR — один base.tar.gz; LAYOUT_PG_BASEBACKUP (копии,
+        снятые в спул) — tar из архивов pg_basebackup: base, pg_wal и табличные
+        пространства (они кладутся в <data_dir>_tablespaces/<oid>). Поток
+        дочитывается до конца, чтобы сошлась контрольная сумма. Возвращает (ok, error).
+        """
+        if os.path.isdir(data_dir) and os.listdir(data_dir):
+            return False, f"Target directory {data_dir} is not empty"
+        os.makedirs(data_dir, mode=0o700, exist_ok=True)
+        os.chmod(data_dir, 0o700)
+        stream = ProgressReader(fileobj, progress)
+        tablespaces = {}
+        try:
+            if layout == LAYOUT_PG_BASEBACKUP_TAR:
+                with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+                    archive.extractall(data_dir, filter="tar")
+            else:
+                with tarfile.open(fileobj=stream, mode="r|") as outer:
+                    for member in outer:
+                        match = BASE_ARCHIVE_RE.match(member.name)
+                        if not match:
+                            continue
+                        if match["name"] == "base":
+                            target = data_dir
+                        elif match["name"] == "pg_wal":
+                            target = os.path.join(data_dir, "pg_wal")
+                        else:
+                            target = tablespaces[match["name"]] = os.path.join(
+                                f"{data_dir}_tablespaces", match["name"])
+                        os.makedirs(target, mode=0o700, exist_ok=True)
+                        with tarfile.open(fileobj=outer.extractfile(member), mode="r|gz") as archive:
+                            archive.extractall(target, filter="tar")
+            # хвост tar (нулевые блоки) tarfile не читает
+            while stream.read(CHUNK_SIZE):
+                pass
+            # права каталога могли прийти из архива, а PostgreSQL требует 0700
+            os.chmod(data_dir, 0o700)
+        except (OSError, EOFError, tarfile.TarError) as e:
+            return False, f"Failed to unpack the base backup: {e}"
+
+        if tablespaces:
+            # пути табличных пространств — новые, рядом с каталогом данных
+            with open(os.path.join(data_dir, "tablespace_map"), "w") as f:
+                f.writelines(f"{oid} {path}\n" for oid, path in tablespaces.items())
+        return True, None
+
+    @staticmethod
+    def _quote_conf(value):
+        return "'" + value.replace("'", "''") + "'"
+
+    def configure_recovery(self, data_dir, wal_dir, target_time=None):
+        """
+        Восстановление на момент времени для развёрнутой копии: recovery.signal,
+        restore_command из wal_dir и recovery_target_time. WAL проигрывается
+        при запуске PostgreSQL на data_dir.
+        """
+        restore_command = 'cp "%s/%%f" "%%p"' % wal_dir
+        lines = [
+            "# backup_manager: point-in-time recovery",
+            f"restore_command = {self._quote_conf(restore_command)}",
+            "recovery_target_action = 'promote'",
+        ]
+        if target_time:
+            lines.append(f"recovery_target_time = {self._quote_conf(target_time.isoformat(sep=' '))}")
+        with open(os.path.join(data_dir, "postgresql.auto.conf"), "a") as f:
+            f.write("\n".join(lines) + "\n")
+        open(os.path.join(data_dir, "recovery.signal"), "w").close()
+
+    @staticmethod
+    def receive_wal_command(connection_string, directory, slot, compress_level):
+        """pg_receivewal в directory через слот репликации; с --no-loop при обрыве завершается, перезапускает архиватор."""
+        command = [
+            PG_RECEIVEWAL, "-d", connection_string, "-D", directory,
+            "--slot", slot, "--no-loop", "--no-password",
+        ]
+        if compress_level:
+            command.append(f"--compress=gzip:{compress_level}")
+        return command
+
+    @staticmethod
+    def create_replication_slot(connection_string, slot):
+        """Физический слот: сервер хранит WAL, пока архиватор его не получил."""
+        run_tool([
+            PG_RECEIVEWAL, "-d", connection_string, "--slot", slot,
+            "--create-slot", "--if-not-exists", "--no-password",
+        ])
+
+    @staticmethod
+    def switch_wal(connection_string):
+        """Закрыть текущий сегмент WAL, чтобы он ушёл в архив (нужны права на pg_switch_wal)."""
+        with psycopg2.connect(connection_string, connect_timeout=5) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_switch_wal()")
+
+    @staticmethod
+    def _filtered_dump(filepath):
+        """Строки дампа без SET transaction_timeout (его нет в старых серверах)."""
+        batch = []
+        batch_size = 0
+        with open(filepath, "rb") as f:
+            for line in f:
+                if TRANSACTION_TIMEOUT_RE.match(line):
+                    continue
+                batch.append(line)
+                batch_size += len(line)
+                if batch_size >= CHUNK_SIZE:
+                    yield b"".join(batch)
+                    batch = []
+                    batch_size = 0
+        if batch:
+            yield b"".join(batch)
+
+    def load_dump(self, connection_string, filepath, progress=None):
         try:
             with open(filepath, 'r'):
                 pass
@@ -43,21 +338,17 @@ class PostgresqlService:
 
         psql = "/usr/lib/postgresql/17/bin/psql"
 
-        drop_cmd = f'{psql} "{connection_string}" -v ON_ERROR_STOP=1 -c "DROP SCHEMA public CASCADE; CREATE SCHEMA public;"'
-
-        filtered = f"{filepath}.filtered"
-        sed_cmd = f"grep -v '^SET[[:space:]]\\+transaction_timeout' '{filepath}' > '{filtered}'"
+        drop_cmd = [psql, connection_string, "-v", "ON_ERROR_STOP=1",
+                    "-c", "DROP SCHEMA public CASCADE; CREATE SCHEMA public;"]
 
-        # 3) грузим дамп, стопимся на первой ошибке
-        load_cmd = f'{psql} "{connection_string}" -v ON_ERROR_STOP=1 -f "{filtered}"'
+        # грузим дамп через stdin, стопимся на первой ошибке
+        load_cmd = [psql, connection_string, "-v", "ON_ERROR_STOP=1"]
 
         try:
-            print("Drop schema...")
-            subprocess.run(drop_cmd, shell=True, check=True)
-            print("Filter transaction_timeout...")
-            subprocess.run(sed_cmd, shell=True, check=True)
-            print("Load dump...")
-            subprocess.run(load_cmd, shell=True, check=True)
+            logger.info("Drop schema...")
+            run_tool(drop_cmd)
+            logger.info("Load dump...")
+            run_tool(load_cmd, stdin_chunks=self._filtered_dump(filepath), progress=progress)
         except subprocess.CalledProcessError as e:
             return False, f"Ошибка при загрузке дампа: {e}"
         except Exception as e:
@@ -0,0 +1,310 @@
+import base64
+import binascii
+import hashlib
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+
+# Формат зашифрованного дампа: заголовок MAGIC | nonce-префикс (8 байт) | размер блока,
+# дальше блоки AES-256-GCM: шифртекст блока открытого текста + тег 16 байт.
+# Nonce блока — префикс + номер блока; в AAD — заголовок и признак последнего блока,
+# поэтому блоки нельзя переставить, подменить из другого дампа или обрезать хвост.
+MAGIC = b"BMENC1"
+HEADER = struct.Struct(">6s8sI")
+TAG_SIZE = 16
+BLOCK_SIZE = 1024 * 1024
+
+
+class DecryptionError(Exception):
+    pass
+
+
+def parse_key(value):
+    """Ключ из настроек хранилища: 32 байта в base64. Бросает ValueError."""
+    try:
+        key = base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Encryption key must be base64")
+    if len(key) != 32:
+        raise ValueError("Encryption key must be 32 bytes (AES-256)")
+    return key
+
+
+def key_id(key):
+    """Отпечаток ключа (не раскрывает его): запоминается в операции дампа."""
+    raw = parse_key(key) if isinstance(key, str) else key
+    return hashlib.blake2b(raw, digest_size=8, person=b"dump-key").hexdigest()
+
+
+def _workers():
+    return settings.BACKUP_ENCRYPTION_WORKERS or min(4, os.cpu_count() or 1)
+
+
+class _Blocks:
+    """
+    Шифрование/расшифровка пачки блоков: в пуле потоков, если он есть
+    (BACKUP_ENCRYPTION_WORKERS), с сохранением порядка блоков.
+    """
+
+    def __init__(self, func):
+        self._func = func
+        workers = _workers()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="dump-cipher") if workers > 1 else None
+        self.batch = workers * 2
+
+    def map(self, items):
+        if self._executor is None or len(items) == 1:
+            return [self._func(*item) for item in items]
+        return list(self._executor.map(lambda item: self._func(*item), items))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+class DumpCipher:
+    """Потоковое шифрование дампа ключом хранилища или задачи (encryption_key)."""
+
+    def __init__(self, key):
+        self._aead = AESGCM(parse_key(key) if isinstance(key, str) else key)
+        self.key_id = key_id(key)
+
+    @staticmethod
+    def encrypted_size(size, block_size=BLOCK_SIZE):
+        """Размер зашифрованного потока для size байт открытого текста."""
+        blocks = max(1, -(-size // block_size))
+        return HEADER.size + size + blocks * TAG_SIZE
+
+    def _nonce(self, prefix, index):
+        return prefix + struct.pack(">I", index)
+
+    def _encrypt(self, header, prefix, index, data, final):
+        return self._aead.encrypt(self._nonce(prefix, index), data, header + (b"\x01" if final else b"\x00"))
+
+    def _decrypt(self, header, prefix, index, data, final):
+        try:
+            return self._aead.decrypt(self._nonce(prefix, index), data, header + (b"\x01" if final else b"\x00"))
+        except InvalidTag:
+            raise DecryptionError(f"Block {index} failed authentication (wrong key or damaged dump)")
+
+    def reader(self, fileobj):
+        return EncryptingReader(self, fileobj)
+
+    def writer(self, fileobj):
+        return DecryptingWriter(self, fileobj)
+
+    def _blocks_of(self, ranges, block_size=BLOCK_SIZE):
+        """Номера блоков, покрывающих диапазоны (offset, length) открытого текста: [(first, last)]."""
+        blocks = []
+        for offset, length in sorted(ranges):
+            first, last = offset // block_size, (offset + length - 1) // block_size
+            if blocks and first <= blocks[-1][1] + 1:
+                blocks[-1] = (blocks[-1][0], max(blocks[-1][1], last))
+            else:
+                blocks.append((first, last))
+        return blocks
+
+    def encrypted_ranges(self, ranges, size, block_size=BLOCK_SIZE):
+        """
+        Диапазоны зашифрованного файла, которые нужно скачать для ranges
+        открытого текста (size байт): заголовок и целые блоки. Каждый блок
+        проверяется отдельно, поэтому остальной файл не нужен.
+        """
+        stride = block_size + TAG_SIZE
+        encrypted = [(0, HEADER.size)]
+        for first, last in self._blocks_of(ranges, block_size):
+            end = min((last + 1) * stride, size + (last + 1) * TAG_SIZE)
+            encrypted.append((HEADER.size + first * stride, end - first * stride))
+        return encrypted
+
+    def decrypt_ranges(self, filepath, ranges, size):
+        """
+        Файл из encrypted_ranges (диапазоны подряд, как их пишет download_ranges)
+        заменяется открытыми ranges подряд по возрастанию смещений — тем, что
+        download_ranges скачал бы у незашифрованного дампа. Блоки расшифровываются
+        по одному, в памяти держится только текущий.
+        """
+        ranges = sorted(ranges)
+        partial_path = f"{filepath}.part"
+        with open(filepath, "rb") as src, open(partial_path, "wb") as dst:
+            header = self.read_header(src.read(HEADER.size))
+            _, prefix, block_size = HEADER.unpack(header)
+            last_block = max(0, -(-size // block_size) - 1)
+            position = 0
+            for first, last in self._blocks_of(ranges, block_size):
+                for index in range(first, last + 1):
+                    chunk = src.read(min(block_size, size - index * block_size) + TAG_SIZE)
+                    data = self._decrypt(header, prefix, index, chunk, index == last_block)
+                    block_start, block_end = index * block_size, index * block_size + len(data)
+                    while position < len(ranges) and sum(ranges[position]) <= block_start:
+                        position += 1
+                    current = position
+                    while current < len(ranges) and ranges[current][0] < block_end:
+                        low = max(ranges[current][0], block_start)
+                        high = min(sum(ranges[current]), block_end)
+                        dst.write(data[low - block_start:high - block_start])
+                        current += 1
+        os.replace(partial_path, filepath)
+
+    def read_header(self, data):
+        magic, _, block_size = HEADER.unpack(data) if len(data) == HEADER.size else (None, None, None)
+        if magic != MAGIC or not block_size:
+            raise DecryptionError("Not an encrypted dump")
+        return data
+
+
+def dump_cipher(task):
+    """Шифр для новых дампов задачи: ключ задачи, иначе ключ хранилища; None — без шифрования."""
+    key = task.encryption_key or task.file_storage.encryption_key
+    return DumpCipher(key) if key else None
+
+
+def restore_cipher(dump_operation):
+    """
+    Шифр, которым зашифрован дамп -> (cipher, error). Ключ ищется по отпечатку
+    среди ключей задачи и хранилища: после смены ключа старые дампы
+    восстанавливаются, пока их ключ указан у задачи или хранилища.
+    """
+    if not dump_operation.encryption_key_id:
+        return None, None
+    task = dump_operation.task
+    for key in (task.encryption_key, task.file_storage.encryption_key):
+        try:
+            if key and key_id(key) == dump_operation.encryption_key_id:
+                return DumpCipher(key), None
+        except ValueError:
+            continue
+    return None, (f"Dump is encrypted with key {dump_operation.encryption_key_id}, "
+                  "which is not set on its task or storage")
+
+
+class EncryptingReader:
+    """
+    Файловый объект только для чтения: отдаёт зашифрованный поток вместо файла
+    дампа, без временной копии. Хранилища читают его блоками (upload_fileobj,
+    storbinary, putfo); блоки шифруются пачками в пуле потоков. Зашифрованные
+    блоки лежат в очереди как есть и режутся только по границе чтения.
+    """
+
+    def __init__(self, cipher, fileobj, block_size=BLOCK_SIZE):
+        self._cipher = cipher
+        self._fileobj = fileobj
+        self._block_size = block_size
+        self._prefix = os.urandom(8)
+        self._header = HEADER.pack(MAGIC, self._prefix, block_size)
+        self._chunks = deque([self._header])
+        self._available = len(self._header)
+        self._offset = 0  # прочитано из первого блока очереди
+        self._index = 0
+        self._next = fileobj.read(block_size)
+        self._done = False
+        self._blocks = _Blocks(self._cipher._encrypt)
+
+    def _fill(self):
+        items = []
+        while not self._done and len(items) < self._blocks.batch:
+            data = self._next
+            self._next = self._fileobj.read(self._block_size)
+            final = not self._next
+            items.append((self._header, self._prefix, self._index, data, final))
+            self._index += 1
+            if final:
+                self._done = True
+        for encrypted in self._blocks.map(items):
+            self._chunks.append(encrypted)
+            self._available += len(encrypted)
+        if self._done:
+            self._blocks.close()
+
+    def read(self, size=-1):
+        while (size < 0 or self._available < size) and not self._done:
+            self._fill()
+        if size < 0 or size > self._available:
+            size = self._available
+        parts = []
+        self._available -= size
+        while size:
+            chunk = self._chunks[0]
+            piece = chunk[self._offset:self._offset + size]
+            parts.append(piece)
+            size -= len(piece)
+            self._offset += len(piece)
+            if self._offset == len(chunk):
+                self._chunks.popleft()
+                self._offset = 0
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def readable(self):
+        return True
+
+
+class DecryptingWriter:
+    """
+    Файловый объект только для записи: принимает зашифрованный поток при
+    скачивании и пишет в fileobj открытый текст. Последний блок узнаётся
+    по концу потока, поэтому один полный блок держится до следующей записи;
+    finish() проверяет последний блок — без него обрезанный дамп не обнаружить.
+    """
+
+    def __init__(self, cipher, fileobj):
+        self._cipher = cipher
+        self._fileobj = fileobj
+        self._buffer = bytearray()
+        self._header = None
+        self._index = 0
+        self._blocks = _Blocks(self._cipher._decrypt)
+
+    def _flush_blocks(self):
+        """Расшифровывает накопленные полные блоки, кроме последнего (он может оказаться финальным)."""
+        stride = self._block_size + TAG_SIZE
+        count = (len(self._buffer) - 1) // stride
+        if count <= 0:
+            return
+        with memoryview(self._buffer) as view:
+            for first in range(0, count, self._blocks.batch):
+                items = [
+                    (self._header, self._prefix, self._index + position,
+                     view[position * stride:(position + 1) * stride], False)
+                    for position in range(first, min(first + self._blocks.batch, count))
+                ]
+                for data in self._blocks.map(items):
+                    self._fileobj.write(data)
+                del items
+        del self._buffer[:count * stride]
+        self._index += count
+
+    def write(self, data):
+        self._buffer += data
+        if self._header is None:
+            if len(self._buffer) < HEADER.size:
+                return len(data)
+            self._header = self._cipher.read_header(bytes(self._buffer[:HEADER.size]))
+            _, self._prefix, self._block_size = HEADER.unpack(self._header)
+            del self._buffer[:HEADER.size]
+        if len(self._buffer) > self._block_size + TAG_SIZE:
+            self._flush_blocks()
+        return len(data)
+
+    def finish(self):
+        try:
+            if self._header is None:
+                raise DecryptionError("Encrypted dump is empty")
+            self._flush_blocks()
+            if len(self._buffer) < TAG_SIZE:
+                raise DecryptionError("Encrypted dump is truncated")
+            self._fileobj.write(self._cipher._decrypt(
+                self._header, self._prefix, self._index, bytes(self._buffer), True))
+            self._buffer.clear()
+        finally:
+            self._blocks.close()
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self._fileobj.flush()
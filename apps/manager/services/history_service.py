@@ -0,0 +1,89 @@
+import logging
+import statistics
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from manager.choices import OperationPhaseChoices
+from manager.models import DumpRunHistory
+
+logger = logging.getLogger(__name__)
+
+
+def _baseline(task):
+    """Медианы длительности и размера последних успешных запусков или (None, None)."""
+    runs = list(
+        DumpRunHistory.objects.filter(task=task, is_success=True)
+        .order_by("-created_dt")
+        .values_list("duration", "dump_size")[:settings.BACKUP_TREND_WINDOW]
+    )
+    if len(runs) < settings.BACKUP_TREND_MIN_RUNS:
+        return None, None
+    durations = [duration for duration, _ in runs if duration]
+    sizes = [size for _, size in runs if size]
+    return (
+        statistics.median(durations) if durations else None,
+        int(statistics.median(sizes)) if sizes else None,
+    )
+
+
+def record_run(operation, is_success, durations):
+    """
+    Добавляет итоги запуска дампа в DumpRunHistory. Флаги регрессии считаются
+    сразу, относительно базовой линии задачи до этого запуска: длительность —
+    если выросла в BACKUP_REGRESSION_FACTOR раз, размер — если изменился во столько раз
+    в любую сторону (резко уменьшившийся дамп так же подозрителен).
+    """
+    duration = sum(durations.values())
+    baseline_duration, baseline_size = _baseline(operation.task)
+    factor = settings.BACKUP_REGRESSION_FACTOR
+    duration_regression = bool(is_success and baseline_duration and duration > baseline_duration * factor)
+    size_regression = bool(
+        is_success and baseline_size and operation.dump_size is not None
+        and not baseline_size / factor <= operation.dump_size <= baseline_size * factor
+    )
+
+    run = DumpRunHistory.objects.create(
+        task=operation.task,
+        operation_id=operation.id,
+        is_success=is_success,
+        source_size=operation.source_size,
+        dump_size=operation.dump_size,
+        duration=duration,
+        dump_duration=durations.get(OperationPhaseChoices.DUMP),
+        upload_duration=durations.get(OperationPhaseChoices.UPLOAD),
+        throughput=operation.dump_size / duration if is_success and operation.dump_size and duration else None,
+        baseline_duration=baseline_duration,
+        baseline_size=baseline_size,
+        duration_regression=duration_regression,
+        size_regression=size_regression,
+    )
+    if duration_regression:
+        logger.warning("Task %s: dump took %.0fs, baseline %.0fs", operation.task_id, duration, baseline_duration)
+    if size_regression:
+        logger.warning("Task %s: dump size %s, baseline %s", operation.task_id, operation.dump_size, baseline_size)
+    return run
+
+
+def daily_trend(task, days):
+    """
+    Агрегаты по дням за последние days дней: средняя длительность, максимальный
+    размер, число запусков и отмеченных. Один запрос по индексу (task, created_dt).
+    """
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        DumpRunHistory.objects.filter(task=task, created_dt__gte=since)
+        .annotate(day=TruncDate("created_dt"))
+        .values("day")
+        .annotate(
+            duration=Avg("duration", filter=Q(is_success=True)),
+            dump_size=Max("dump_size", filter=Q(is_success=True)),
+            runs=Count("id"),
+            failed=Count("id", filter=Q(is_success=False)),
+            flagged=Count("id", filter=Q(duration_regression=True) | Q(size_regression=True)),
+        )
+        .order_by("day")
+    )
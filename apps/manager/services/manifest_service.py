@@ -0,0 +1,360 @@
+import json
+import logging
+import os
+import re
+import zlib
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+# Заголовок секции длиннее — значит, это не заголовок, а строка данных
+MAX_HEADER_LENGTH = 1024
+
+# Раскладка файла дампа: как есть или кадрами gzip (FramedGzipWriter)
+LAYOUT_PLAIN = "plain"
+LAYOUT_GZIP_FRAMES = "gzip-frames"
+# физическая копия кластера Postgres: tar из архивов pg_basebackup, снятых в спул (ранние копии PITR)
+LAYOUT_PG_BASEBACKUP = "pg-basebackup"
+# она же одним потоком pg_basebackup -D - (base.tar.gz, см. PostgresqlService.stream_base_backup)
+LAYOUT_PG_BASEBACKUP_TAR = "pg-basebackup-tar"
+# Уровень сжатия кадров: дамп сжимается на лету, скорость важнее последних процентов
+FRAME_COMPRESS_LEVEL = 6
+
+# pg_dump (plain): каждая запись оглавления начинается комментарием
+# "-- Name: t; Type: TABLE; Schema: public; ..." или "-- Data for Name: t; Type: TABLE DATA; ..."
+PG_SECTION_RE = re.compile(
+    rb"^-- (?:Data for )?Name: (?P<name>[^;\n]*); Type: (?P<type>[^;\n]*); Schema: (?P<schema>[^;\n]*);",
+    re.M,
+)
+# mysqldump: "-- Table structure for table `t`", "-- Dumping data for table `t`",
+# дальше — представления, процедуры, события
+MYSQL_SECTION_RE = re.compile(
+    rb"^-- (?:(?:Table structure|Dumping data) for table `(?P<name>(?:[^`\n]|``)*)`"
+    rb"|Temporary view structure|Final view structure|Dumping (?:events|routines))",
+    re.M,
+)
+# mysqldump --source-data=2 (--master-data=2): позиция binlog на момент снимка — в прологе,
+# "-- CHANGE REPLICATION SOURCE TO SOURCE_LOG_FILE='binlog.000042', SOURCE_LOG_POS=157;"
+MYSQL_BINLOG_POSITION_RE = re.compile(
+    rb"^-- CHANGE (?:MASTER|REPLICATION SOURCE) TO (?:MASTER|SOURCE)_LOG_FILE='(?P<file>[^'\n]+)',\s*"
+    rb"(?:MASTER|SOURCE)_LOG_POS=(?P<position>\d+)",
+    re.M,
+)
+# файл binlog MySQL: <basename>.<номер>, номер растёт на каждой ротации
+BINLOG_FILE_RE = re.compile(r"^(?P<base>[\w.-]+)\.(?P<number>\d{6,})$")
+
+
+def pg_table(match):
+    if match["type"] != b"TABLE DATA":
+        return None
+    return f"{match['schema'].decode(errors='replace')}.{match['name'].decode(errors='replace')}"
+
+
+def mysql_table(match):
+    if match["name"] is None:
+        return None
+    return match["name"].replace(b"``", b"`").decode(errors="replace")
+
+
+def parse_binlog_position(text):
+    """'binlog.000042:157' -> {"file": "binlog.000042", "position": 157} или None."""
+    name, _, position = (text or "").strip().rpartition(":")
+    if not BINLOG_FILE_RE.match(name) or not position.isdigit():
+        return None
+    return {"file": name, "position": int(position)}
+
+
+def add_section(sections, table, offset, end):
+    """Диапазон байт таблицы; соседние секции одной таблицы (DDL + данные) склеиваются."""
+    current = sections.get(table)
+    if current:
+        offset = min(offset, current["offset"])
+        end = max(end, current["offset"] + current["length"])
+    sections[table] = {"offset": offset, "length": end - offset}
+
+
+class DumpIndex:
+    """
+    Что дамп сообщает о раскладке своего файла: диапазоны байт таблиц
+    ({table: {"offset", "length"}}), формат и пролог — общее начало дампа
+    (SET ...), без которого секции таблиц не загружаются отдельно.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.layout = LAYOUT_PLAIN
+        self.preamble = None
+
+
+class SectionScanner:
+    """
+    Смещения таблиц в текстовом дампе, который пишется потоком: в run_tool
+    каждый блок вывода передаётся в update(), по заголовкам-комментариям
+    утилиты отмечаются начала секций. Секция таблицы длится до следующего
+    заголовка любой секции (или до конца дампа — finish()). Строки данных
+    целиком не буферизуются: в остатке между блоками держится только
+    начало строки, похожее на заголовок.
+    """
+
+    def __init__(self, sections, header_re, table_of):
+        self.sections = sections
+        self.header_re = header_re
+        self.table_of = table_of
+        self.reset()
+
+    def reset(self):
+        """Начать заново (дамп пишется повторно)."""
+        self.sections.clear()
+        self.headers = []
+        self._position = 0
+        self._carry = b""
+        self._at_line_start = True
+        self._open = None
+
+    @property
+    def position(self):
+        """Сколько байт вывода передано в update()."""
+        return self._position
+
+    @property
+    def settled(self):
+        """Смещение, до которого все заголовки уже найдены (дальше — недочитанная строка)."""
+        return self._position - len(self._carry)
+
+    def _header(self, offset, match):
+        self.headers.append(offset)
+        if self._open:
+            add_section(self.sections, self._open[0], self._open[1], offset)
+        table = self.table_of(match)
+        self._open = (table, offset) if table else None
+
+    def update(self, chunk):
+        data = self._carry + chunk if self._carry else chunk
+        base = self._position - len(self._carry)
+        self._position += len(chunk)
+
+        start = 0
+        if not self._at_line_start:
+            start = data.find(b"\n") + 1
+            if not start:
+                self._carry = b""
+                return
+        end = data.rfind(b"\n") + 1
+        if end > start:
+            for match in self.header_re.finditer(data, start, end):
+                self._header(base + match.start(), match)
+        else:
+            end = start
+
+        tail = data[end:]
+        if tail.startswith(b"--"[:len(tail)]) and len(tail) < MAX_HEADER_LENGTH:
+            self._carry = tail
+            self._at_line_start = True
+        else:
+            self._carry = b""
+            self._at_line_start = not tail
+
+    def finish(self):
+        if self._carry:
+            match = self.header_re.match(self._carry)
+            if match:
+                self._header(self._position - len(self._carry), match)
+            self._carry = b""
+        if self._open:
+            add_section(self.sections, self._open[0], self._open[1], self._position)
+            self._open = None
+
+
+class FramedGzipWriter:
+    """
+    Файловый объект для вывода утилиты (run_tool(stdout_file=...)): сжимает
+    текстовый дамп так, что каждая секция (от заголовка до заголовка, см.
+    SectionScanner) — отдельный член gzip. Весь файл — обычный gzip
+    (gunzip распакует его целиком), а диапазон байт любой таблицы
+    распаковывается сам по себе: восстановление одной таблицы читает из
+    хранилища только пролог и её кадры. После close() в index — сжатые
+    смещения таблиц. checksum и progress считаются по сжатым байтам.
+    """
+
+    def __init__(self, fileobj, index, header_re, table_of, checksum=None, progress=None):
+        self._fileobj = fileobj
+        self.index = index
+        self._scanner = SectionScanner(index.tables, header_re, table_of)
+        self._checksum = checksum
+        self._progress = progress
+        self._start()
+
+    def _start(self):
+        self._buffer = b""
+        self._raw = 0  # смещение начала _buffer в несжатом выводе
+        self._written = 0
+        self._compressor = None
+        self._seen = 0
+        # начало кадра в несжатом выводе -> его смещение в файле
+        self._frames = {0: 0}
+
+    def reset(self):
+        """Начать заново (утилита перезапускается, файл перезаписывается)."""
+        self._scanner.reset()
+        self._fileobj.seek(0)
+        self._fileobj.truncate()
+        if self._checksum:
+            self._checksum.reset()
+        if self._progress:
+            self._progress.set(0)
+        self._start()
+
+    def _emit(self, data):
+        if not data:
+            return
+        self._fileobj.write(data)
+        self._written += len(data)
+        if self._checksum:
+            self._checksum.update(data)
+        if self._progress:
+            self._progress.add(len(data))
+
+    def _feed(self, upto):
+        data = self._buffer[:upto - self._raw]
+        self._buffer = self._buffer[upto - self._raw:]
+        self._raw = upto
+        if data:
+            if self._compressor is None:
+                # wbits=31: самостоятельный член gzip с заголовком и CRC32
+                self._compressor = zlib.compressobj(FRAME_COMPRESS_LEVEL, zlib.DEFLATED, 31)
+            self._emit(self._compressor.compress(data))
+
+    def _finish_frame(self):
+        if self._compressor is not None:
+            self._emit(self._compressor.flush())
+            self._compressor = None
+
+    def _compress_until(self, limit):
+        headers = self._scanner.headers
+        while self._seen < len(headers) and headers[self._seen] <= limit:
+            boundary = headers[self._seen]
+            self._seen += 1
+            self._feed(boundary)
+            self._finish_frame()
+            self._frames[boundary] = self._written
+        self._feed(limit)
+
+    def write(self, data):
+        self._scanner.update(data)
+        self._buffer += data
+        self._compress_until(self._scanner.settled)
+        return len(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+    def close(self):
+        self._scanner.finish()
+        self._compress_until(self._scanner.position)
+        self._finish_frame()
+        for table, section in self.index.tables.items():
+            start = self._frames[section["offset"]]
+            end = self._frames.get(section["offset"] + section["length"], self._written)
+            self.index.tables[table] = {"offset": start, "length": end - start}
+        headers = self._scanner.headers
+        first = self._frames[headers[0]] if headers else self._written
+        self.index.preamble = {"offset": 0, "length": first} if first else None
+        self.index.layout = LAYOUT_GZIP_FRAMES
+
+
+def frame_ranges(manifest, tables):
+    """
+    Диапазоны байт (offset, length) файла дампа, нужные для загрузки tables:
+    пролог и кадры таблиц, соседние диапазоны склеены (один запрос к хранилищу).
+    """
+    entries = manifest["tables"]
+    ranges = [(entries[name]["offset"], entries[name]["length"]) for name in tables]
+    if manifest.get("preamble"):
+        ranges.append((manifest["preamble"]["offset"], manifest["preamble"]["length"]))
+    merged = []
+    for offset, length in sorted(ranges):
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            last_offset, last_length = merged[-1]
+            merged[-1] = (last_offset, max(last_length, offset + length - last_offset))
+        else:
+            merged.append((offset, length))
+    return merged
+
+
+def build_manifest(operation, db, tables, index, tools):
+    """
+    Манифест дампа: таблицы с оценками строк и размера на момент дампа,
+    их смещения внутри файла дампа и версии утилит/сервера.
+    """
+    entries = {}
+    for name, stats in (tables or {}).items():
+        entries[name] = {"rows": stats.get("rows"), "bytes": stats.get("bytes")}
+    for name, section in index.tables.items():
+        # таблица попала в дамп, но не в статистику (например, создана во время дампа)
+        entries.setdefault(name, {"rows": None, "bytes": None}).update(section)
+    return {
+        "version": MANIFEST_VERSION,
+        "db_type": db.get_db_type_display(),
+        "database": db.name,
+        "operation_id": str(operation.id),
+        "created_dt": timezone.now().isoformat(),
+        "dump_size": operation.dump_size,
+        "checksum_blake2b": operation.checksum_blake2b,
+        "checksum_sha256": operation.checksum_sha256,
+        "tools": tools or {},
+        "layout": index.layout,
+        "preamble": index.preamble,
+        "stats_complete": tables is not None,
+        "tables": entries,
+    }
+
+
+def write_manifest(manifest, workdir, operation_id):
+    """Файл манифеста для загрузки рядом с дампом (<operation_id>.json в хранилище)."""
+    path = os.path.join(workdir, f"manifest_{operation_id}.json")
+    with open(path, "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    return path
+
+
+def _delta(old, new):
+    if old is None or new is None:
+        return None
+    return new - old
+
+
+def diff_manifests(old, new):
+    """
+    Сравнение двух манифестов по таблицам. Возвращает список строк
+    {"table", "change", "rows_old", "rows_new", "rows_delta", "bytes_old", "bytes_new", "bytes_delta"}:
+    сначала добавленные и удалённые таблицы, затем изменённые по убыванию изменения размера.
+    """
+    old_tables = (old or {}).get("tables") or {}
+    new_tables = (new or {}).get("tables") or {}
+    rows = []
+    for name in set(old_tables) | set(new_tables):
+        before, after = old_tables.get(name), new_tables.get(name)
+        if before is None:
+            change = "added"
+        elif after is None:
+            change = "removed"
+        elif before.get("rows") != after.get("rows") or before.get("bytes") != after.get("bytes"):
+            change = "changed"
+        else:
+            change = "same"
+        before, after = before or {}, after or {}
+        rows.append({
+            "table": name,
+            "change": change,
+            "rows_old": before.get("rows"),
+            "rows_new": after.get("rows"),
+            "rows_delta": _delta(before.get("rows"), after.get("rows")),
+            "bytes_old": before.get("bytes"),
+            "bytes_new": after.get("bytes"),
+            "bytes_delta": _delta(before.get("bytes"), after.get("bytes")),
+        })
+    order = {"added": 0, "removed": 1, "changed": 2, "same": 3}
+    rows.sort(key=lambda row: (order[row["change"]], -abs(row["bytes_delta"] or 0), row["table"]))
+    return rows
@@ -0,0 +1,157 @@
+import atexit
+import fcntl
+import glob
+import os
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram,
+                               multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.mmap_dict import MmapedDict
+
+from manager.choices import DBType, DumpOperationStatusChoices
+from manager.models import DumpTask, DumpTaskOperation, RecoverBackupOperation
+from manager.services.space_service import pid_alive
+from manager.services.workspace_service import WorkspaceService
+
+# Метрики пишут процессы операций, воркеры и gunicorn — в multiprocess-режиме
+# каждый процесс пишет свои файлы в PROMETHEUS_MULTIPROC_DIR, /metrics их суммирует
+os.makedirs(settings.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+# pid берётся при выходе: процесс мог форкнуться после импорта
+atexit.register(lambda: multiprocess.mark_process_dead(os.getpid()))
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 1800, 3600, 7200, 14400, 28800, float("inf"))
+BYTES_BUCKETS = tuple(1024 ** 2 * 4 ** i for i in range(11)) + (float("inf"),)
+
+PHASE_DURATION = Histogram(
+    "backup_phase_duration_seconds", "Duration of operation phases",
+    ["phase", "db_type", "storage_type", "success"], buckets=DURATION_BUCKETS,
+)
+PHASE_BYTES = Histogram(
+    "backup_phase_bytes", "Bytes produced or transferred by operation phases",
+    ["phase", "db_type", "storage_type"], buckets=BYTES_BUCKETS,
+)
+IN_PROGRESS = Gauge(
+    "backup_operations_in_progress", "Operations being executed right now",
+    ["kind"], multiprocess_mode="livesum",
+)
+STORAGE_ERRORS = Counter(
+    "backup_storage_errors_total", "Failed storage calls",
+    ["storage", "storage_type", "action"],
+)
+
+
+def observe_phase(phase, duration, transferred, is_success, db_type, storage_type):
+    phase_name = phase.name.lower()
+    PHASE_DURATION.labels(phase_name, db_type, storage_type, str(is_success).lower()).observe(duration)
+    if transferred and is_success:
+        PHASE_BYTES.labels(phase_name, db_type, storage_type).observe(transferred)
+
+
+def in_progress(kind):
+    """with in_progress("dump"): ... — счётчик выполняемых операций."""
+    return IN_PROGRESS.labels(kind).track_inprogress()
+
+
+def storage_error(storage, action):
+    STORAGE_ERRORS.labels(storage.name, storage.type, action).inc()
+
+
+class DatabaseCollector:
+    """Метрики, которые считаются из БД метаданных в момент scrape."""
+
+    def collect(self):
+        now = time.time()
+        timestamp = GaugeMetricFamily(
+            "backup_task_last_success_timestamp_seconds",
+            "Unix time of the last successful dump of the task", labels=["task", "database"],
+        )
+        age = GaugeMetricFamily(
+            "backup_task_last_success_age_seconds",
+            "Seconds since the last successful dump of the task", labels=["task", "database"],
+        )
+        tasks = DumpTask.objects.select_related("database").annotate(
+            last_success_dt=Max(
+                "dumptaskoperation__updated_dt",
+                filter=Q(dumptaskoperation__status=DumpOperationStatusChoices.SUCCESS),
+            )
+        )
+        for task in tasks:
+            if not task.last_success_dt:
+                continue
+            labels = [str(task.id), task.database.name]
+            timestamp.add_metric(labels, task.last_success_dt.timestamp())
+            age.add_metric(labels, now - task.last_success_dt.timestamp())
+        yield timestamp
+        yield age
+
+        queue = GaugeMetricFamily(
+            "backup_queue_depth", "Operations by kind and status", labels=["kind", "status"],
+        )
+        for kind, model in (("dump", DumpTaskOperation), ("restore", RecoverBackupOperation)):
+            for row in model.objects.filter(
+                status__in=[DumpOperationStatusChoices.CREATED, DumpOperationStatusChoices.IN_PROCESS]
+            ).values("status").annotate(count=Count("id")):
+                status = DumpOperationStatusChoices(row["status"]).name.lower()
+                queue.add_metric([kind, status], row["count"])
+        yield queue
+
+        spool_free = GaugeMetricFamily("backup_spool_free_bytes", "Free space on the spool volume", labels=["path"])
+        spool_used = GaugeMetricFamily("backup_spool_used_bytes", "Bytes used by operation workspaces", labels=["path"])
+        for spool in WorkspaceService().usage():
+            if spool["free"] is not None:
+                spool_free.add_metric([spool["path"]], spool["free"])
+            spool_used.add_metric([spool["path"]], spool["used"])
+        yield spool_free
+        yield spool_used
+
+
+def db_type_label(db_type):
+    return DBType(db_type).label.lower()
+
+
+def build_registry():
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(DatabaseCollector())
+    return registry
+
+
+def compact_metrics(path=None):
+    """
+    Сводит файлы счётчиков и гистограмм завершившихся процессов в один
+    <тип>_compacted.db: каждый процесс операции оставляет свои файлы, и без этого
+    /metrics с каждым днём суммировал бы всё больше файлов. Файлы live-gauge убитых
+    процессов (atexit не сработал) удаляются. Возвращает число удалённых файлов.
+    """
+    path = path or settings.PROMETHEUS_MULTIPROC_DIR
+    removed = 0
+    with open(os.path.join(path, ".compact.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for typ in ("counter", "histogram", "summary"):
+            dead = []
+            for filename in glob.glob(os.path.join(path, f"{typ}_*.db")):
+                pid = os.path.basename(filename)[len(typ) + 1:-3]
+                if pid.isdigit() and not pid_alive(int(pid)):
+                    dead.append(filename)
+            if not dead:
+                continue
+            compacted = MmapedDict(os.path.join(path, f"{typ}_compacted.db"))
+            try:
+                for filename in dead:
+                    for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+                        total, _ = compacted.read_value(key)
+                        compacted.write_value(key, total + value, timestamp)
+            finally:
+                compacted.close()
+            for filename in dead:
+                os.remove(filename)
+            removed += len(dead)
+        for filename in glob.glob(os.path.join(path, "gauge_live*_*.db")):
+            pid = os.path.basename(filename)[:-3].rsplit("_", 1)[-1]
+            if pid.isdigit() and not pid_alive(int(pid)):
+                os.remove(filename)
+                removed += 1
+    return removed
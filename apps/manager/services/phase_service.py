@@ -0,0 +1,89 @@
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from manager.models import (DumpTaskOperation, OperationPhase,
+                            RecoverBackupOperation, ToolInvocation,
+                            VerificationOperation)
+from manager.services.metrics_service import db_type_label, observe_phase
+from manager.services.process import collect_tool_usage
+
+
+# поле OperationPhase/ToolInvocation, которым фаза привязана к операции
+OWNER_FIELDS = {
+    DumpTaskOperation: "dump_operation",
+    RecoverBackupOperation: "recover_operation",
+    VerificationOperation: "verification_operation",
+}
+
+
+class PhaseStat:
+    """Что фаза сообщает о себе: успех и объём данных на входе/выходе."""
+
+    def __init__(self):
+        self.is_success = True
+        self.bytes_in = None
+        self.bytes_out = None
+
+
+class PhaseRecorder:
+    """
+    Записывает тайминги и объёмы фаз операции в OperationPhase и в Prometheus,
+    а ресурсы запущенных в фазе утилит — в ToolInvocation.
+    """
+
+    def __init__(self, operation, db, storage, lease=None):
+        self.db_type = db_type_label(db.db_type)
+        self.storage_type = storage.type
+        # суммарная длительность по фазам — для итогов запуска (DumpRunHistory)
+        self.durations = {}
+        self.owner = {OWNER_FIELDS[type(operation)]: operation}
+        # аренда воркера: потерянная аренда не даёт начать следующую фазу
+        self.lease = lease
+
+    @contextmanager
+    def phase(self, phase):
+        if self.lease is not None:
+            self.lease.check()
+        stat = PhaseStat()
+        started_dt = timezone.now()
+        started = time.monotonic()
+        try:
+            with collect_tool_usage() as usages:
+                yield stat
+        except Exception:
+            stat.is_success = False
+            raise
+        finally:
+            duration = time.monotonic() - started
+            self.durations[phase] = self.durations.get(phase, 0) + duration
+            transferred = stat.bytes_out if stat.bytes_out is not None else stat.bytes_in
+            observe_phase(phase, duration, transferred, stat.is_success, self.db_type, self.storage_type)
+            OperationPhase.objects.create(
+                phase=phase,
+                is_success=stat.is_success,
+                started_dt=started_dt,
+                finished_dt=timezone.now(),
+                duration=duration,
+                bytes_in=stat.bytes_in,
+                bytes_out=stat.bytes_out,
+                throughput=transferred / duration if transferred and duration > 0 else None,
+                **self.owner,
+            )
+            ToolInvocation.objects.bulk_create([
+                ToolInvocation(
+                    phase=phase,
+                    tool=usage.tool,
+                    returncode=usage.returncode,
+                    started_dt=usage.started_dt,
+                    wall_time=usage.wall_time,
+                    cpu_user=usage.cpu_user,
+                    cpu_system=usage.cpu_system,
+                    max_rss=usage.max_rss,
+                    read_bytes=usage.read_bytes,
+                    write_bytes=usage.write_bytes,
+                    **self.owner,
+                )
+                for usage in usages
+            ])
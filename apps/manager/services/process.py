@@ -0,0 +1,347 @@
+import contextvars
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+from manager.logs import current_log_tail
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Как часто (сек) опрашивать /proc/<pid> работающей утилиты
+USAGE_POLL_INTERVAL = 0.5
+# Как часто (сек) run_pool проверяет, не завершились ли процессы
+POOL_POLL_INTERVAL = 1
+# stderr читается строками не длиннее этого; в CalledProcessError уходят последние STDERR_TAIL_LINES
+STDERR_LINE_LIMIT = 4096
+STDERR_TAIL_LINES = 50
+
+# Куда складывать ToolUsage запусков (см. collect_tool_usage)
+_usage_sink = ContextVar("tool_usage_sink", default=None)
+# Где регистрировать запущенные утилиты (см. track_processes)
+_process_registry = ContextVar("tool_process_registry", default=None)
+
+
+class ProcessRegistry:
+    """
+    Утилиты, работающие внутри блока track_processes. kill_all() можно вызвать
+    из другого потока (потеря аренды воркером): работающие утилиты убиваются,
+    а запущенные после этого — сразу при старте.
+    """
+
+    def __init__(self):
+        self.killed = False
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def add(self, process):
+        with self._lock:
+            self._processes.add(process)
+            if self.killed:
+                process.kill()
+
+    def discard(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+    def kill_all(self):
+        with self._lock:
+            self.killed = True
+            for process in self._processes:
+                if process.returncode is None:
+                    process.kill()
+
+
+class ToolUsage:
+    """Сколько ресурсов потратил один запуск внешней утилиты."""
+
+    def __init__(self, cmd):
+        self.tool = os.path.basename(cmd[0])
+        self.started_dt = timezone.now()
+        self._started = time.monotonic()
+        self.returncode = None
+        self.wall_time = None
+        self.cpu_user = None
+        self.cpu_system = None
+        self.max_rss = None
+        self.read_bytes = None
+        self.write_bytes = None
+        self.output = None
+        self.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        self._stopped = threading.Event()
+
+    def _drain_stderr(self, pipe, operation_tail):
+        """
+        Читает stderr утилиты построчно. Хранятся только последние строки
+        (своего запуска и операции в целом), так что память не растёт, даже если
+        psql пишет миллионы NOTICE. Сами строки уходят в лог на уровне DEBUG.
+        """
+        for raw in iter(lambda: pipe.readline(STDERR_LINE_LIMIT), b""):
+            line = raw.decode(errors="replace").rstrip("\n")
+            self.stderr_tail.append(line)
+            if operation_tail is not None:
+                operation_tail.append(f"{self.tool}: {line}")
+            logger.debug("%s: %s", self.tool, line)
+
+    def _drain_stdout(self, pipe):
+        """
+        Вывод утилиты, который никто не читает (psql -f печатает строку на каждую
+        команду): уходит в лог операции на уровне DEBUG, а не в stdout контейнера.
+        """
+        for raw in iter(lambda: pipe.readline(STDERR_LINE_LIMIT), b""):
+            logger.debug("%s: %s", self.tool, raw.decode(errors="replace").rstrip("\n"))
+
+    def _watch(self, pid):
+        """
+        Опрашивает /proc/<pid>, пока утилита работает. Пик RSS берётся из VmHWM:
+        ru_maxrss учитывает и память родителя-python, от которого утилита
+        форкнулась, поэтому у запусков короче интервала опроса пик RSS не известен.
+        """
+        def poll():
+            while not self._stopped.wait(USAGE_POLL_INTERVAL):
+                self._read_io(pid)
+                try:
+                    with open(f"/proc/{pid}/status") as f:
+                        for line in f:
+                            if line.startswith("VmHWM:"):
+                                self.max_rss = max(self.max_rss or 0, int(line.split()[1]) * 1024)
+                except OSError:
+                    return
+
+        threading.Thread(target=poll, daemon=True).start()
+
+    def _read_io(self, pid):
+        # read_bytes/write_bytes — реальный ввод-вывод с диска (без page cache и пайпов)
+        try:
+            with open(f"/proc/{pid}/io") as f:
+                counters = dict(line.split(": ") for line in f.read().splitlines())
+        except (OSError, ValueError):
+            return
+        self.read_bytes = int(counters.get("read_bytes", 0))
+        self.write_bytes = int(counters.get("write_bytes", 0))
+
+    def _reap(self, process):
+        """
+        Дожидается завершения утилиты: сначала без освобождения pid, чтобы
+        дочитать /proc/<pid>/io завершившегося процесса, затем wait4 с rusage.
+        """
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        self._stopped.set()
+        self._read_io(process.pid)
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = self.returncode = os.waitstatus_to_exitcode(status)
+        self.wall_time = time.monotonic() - self._started
+        self.cpu_user = rusage.ru_utime
+        self.cpu_system = rusage.ru_stime
+
+
+@contextmanager
+def collect_tool_usage():
+    """with collect_tool_usage() as usages: ... — собирает ToolUsage всех run_tool внутри блока."""
+    usages = []
+    token = _usage_sink.set(usages)
+    try:
+        yield usages
+    finally:
+        _usage_sink.reset(token)
+
+
+@contextmanager
+def track_processes(registry):
+    """with track_processes(registry): ... — утилиты run_tool внутри блока попадают в registry."""
+    token = _process_registry.set(registry)
+    try:
+        yield registry
+    finally:
+        _process_registry.reset(token)
+
+
+def _iter_file(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def run_tool(cmd, stdout_path=None, stdin_path=None, stdin_chunks=None, progress=None, capture=False,
+             checksum=None, scanner=None, stdout_file=None):
+    """
+    Запускает внешнюю утилиту (список аргументов, без shell) и ждёт её.
+
+    stdout_path  — вывод утилиты пишется в файл через пайп;
+    stdout_file  — то же, но в файловый объект с write() (например, FramedGzipWriter);
+    stdin_path   — файл подаётся утилите на вход через пайп;
+    stdin_chunks — то же, но итератор байтовых блоков (например, с фильтрацией);
+    capture      — небольшой вывод утилиты возвращается в ToolUsage.output;
+    checksum     — StreamChecksum, который считается по записываемому в stdout_path выводу;
+    scanner      — SectionScanner, который отмечает смещения таблиц в том же выводе.
+
+    Байты, прошедшие через пайп, считаются в progress. stderr не наследуется, а
+    читается в кольцевой буфер (см. ToolUsage._drain_stderr); stdout без stdout_path,
+    stdout_file и capture тоже не наследуется и уходит в лог на уровне DEBUG. Как subprocess.run(check=True),
+    при ненулевом коде возврата бросает CalledProcessError с хвостом stderr. Возвращает ToolUsage
+    (время, CPU, пик RSS, ввод-вывод), он же попадает в collect_tool_usage.
+    """
+    if stdin_path is not None:
+        stdin_chunks = _iter_file(stdin_path)
+
+    usage = ToolUsage(cmd)
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stdin_chunks is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    usage._watch(process.pid)
+    # в потоке чтения stderr — тот же контекст (operation_id для логов)
+    stderr_reader = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(usage._drain_stderr, process.stderr, current_log_tail()),
+        daemon=True,
+    )
+    stderr_reader.start()
+    stdout_reader = None
+    if not (stdout_path or stdout_file or capture):
+        stdout_reader = threading.Thread(
+            target=contextvars.copy_context().run, args=(usage._drain_stdout, process.stdout), daemon=True)
+        stdout_reader.start()
+    sink = _usage_sink.get()
+    if sink is not None:
+        sink.append(usage)
+    registry = _process_registry.get()
+    if registry is not None:
+        registry.add(process)
+    try:
+        if stdout_path or stdout_file:
+            with open(stdout_path, "wb") if stdout_path else nullcontext(stdout_file) as out:
+                while True:
+                    chunk = process.stdout.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    if checksum:
+                        checksum.update(chunk)
+                    if scanner:
+                        scanner.update(chunk)
+                    if progress:
+                        progress.add(len(chunk))
+        elif capture:
+            usage.output = process.stdout.read()
+        elif stdin_chunks is not None:
+            try:
+                for chunk in stdin_chunks:
+                    process.stdin.write(chunk)
+                    if progress:
+                        progress.add(len(chunk))
+            except BrokenPipeError:
+                # утилита завершилась раньше — её код возврата скажет почему
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        usage._reap(process)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            usage._reap(process)
+        raise
+    finally:
+        if registry is not None:
+            registry.discard(process)
+        # stderr может держать открытым потомок утилиты — тогда не ждём его
+        stderr_reader.join(timeout=5)
+        if not stderr_reader.is_alive():
+            process.stderr.close()
+        if stdout_reader is not None:
+            stdout_reader.join(timeout=5)
+        if stdout_reader is None or not stdout_reader.is_alive():
+            process.stdout.close()
+
+    if usage.returncode:
+        raise subprocess.CalledProcessError(
+            usage.returncode, cmd, output=usage.output, stderr="\n".join(usage.stderr_tail))
+    return usage
+
+
+def run_pool(commands, concurrency):
+    """
+    Выполняет команды {ключ: argv} пулом не более чем из concurrency процессов.
+    Ждёт завершения всех и возвращает {ключ: код возврата}.
+    """
+    pending = list(commands.items())
+    running = {}
+    results = {}
+    while pending or running:
+        while pending and len(running) < concurrency:
+            key, cmd = pending.pop(0)
+            running[key] = subprocess.Popen(cmd)
+        for key, process in list(running.items()):
+            code = process.poll()
+            if code is not None:
+                results[key] = code
+                del running[key]
+        if running:
+            time.sleep(POOL_POLL_INTERVAL)
+    return results
+
+
+class Pipe:
+    """
+    Конвейер без промежуточного файла: producer(out) в отдельном потоке пишет в
+    пайп, блок with читает из него как из файла (with Pipe(producer) as stream).
+    Так вывод утилиты уходит прямо в загрузку, а скачивание — прямо в распаковку;
+    в памяти только буфер пайпа. Если читатель бросил чтение, запись в out
+    бросает BrokenPipeError, а .interrupted становится True — тогда ошибка
+    производителя вторична. На выходе из блока поток дожидается завершения:
+    его результат — в .result, исключение производителя пробрасывается.
+    """
+
+    def __init__(self, producer):
+        self.producer = producer
+        self.result = None
+        self.interrupted = False
+        self._finished = False
+        self._error = None
+
+    def _produce(self, out):
+        try:
+            self.result = self.producer(out)
+        except BaseException as e:
+            self._error = e
+        finally:
+            # до закрытия: читатель, получивший конец потока, видит _finished
+            self._finished = True
+            try:
+                out.close()
+            except OSError:
+                pass
+
+    def __enter__(self):
+        read_fd, write_fd = os.pipe()
+        self._stream = os.fdopen(read_fd, "rb")
+        out = os.fdopen(write_fd, "wb")
+        # тот же контекст: operation_id для логов, collect_tool_usage фазы
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._produce, out), daemon=True)
+        self._thread.start()
+        return self._stream
+
+    def __exit__(self, exc_type, exc, tb):
+        # закрытый пайп остановит производителя, если читатель не дочитал
+        self.interrupted = not self._finished
+        self._stream.close()
+        self._thread.join()
+        if exc_type is None and self._error is not None:
+            raise self._error
+        return False
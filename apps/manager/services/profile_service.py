@@ -0,0 +1,131 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from manager.choices import ProfileModeChoices
+from manager.models import DumpTaskOperation
+
+
+# С 3.12 cProfile работает через sys.monitoring: один профайлер видит все потоки, а второй
+# включить нельзя (ValueError: Another profiling tool is already active) — поток упал бы
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class CProfiler:
+    """
+    cProfile по всем потокам: основной поток и потоки, созданные во время
+    операции (пулы boto3, транспорт paramiko), сводятся в один .prof (pstats,
+    snakeviz). До Python 3.12 у каждого нового потока свой профайлер, с 3.12
+    все потоки пишет один.
+    """
+
+    extension = ".prof"
+
+    def start(self):
+        self._thread_profiles = []
+        self._profile = cProfile.Profile()
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._thread_hook)
+        self._profile.enable()
+
+    def _thread_hook(self, frame, event, arg):
+        # первое событие нового потока: включаем в нём свой профайлер вместо этого хука
+        profile = cProfile.Profile()
+        self._thread_profiles.append(profile)
+        profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        if PER_THREAD_PROFILES:
+            threading.setprofile(None)
+
+    def write(self, path):
+        stats = pstats.Stats(self._profile)
+        for profile in self._thread_profiles:
+            stats.add(profile)
+        stats.dump_stats(path)
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер: раз в BACKUP_PROFILE_SAMPLE_INTERVAL снимает стеки
+    всех потоков. Пишет collapsed stacks (flamegraph.pl, speedscope), первым
+    кадром стека идёт имя потока.
+    """
+
+    extension = ".collapsed"
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.BACKUP_PROFILE_SAMPLE_INTERVAL
+        self.samples = Counter()
+
+    def start(self):
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+PROFILERS = {
+    ProfileModeChoices.CPROFILE: CProfiler,
+    ProfileModeChoices.SAMPLING: SamplingProfiler,
+}
+
+
+def _task_profile_mode(model, operation_id):
+    field = "task__profile_mode" if model is DumpTaskOperation else "dump_operation__task__profile_mode"
+    return model.objects.filter(id=operation_id).values_list(field, flat=True).first()
+
+
+@contextmanager
+def profile_operation(model, operation_id, mode=None):
+    """
+    Профилирует выполнение операции, если это включено флагом команды (mode)
+    или в задаче. Путь к артефакту сохраняется в profile_path операции.
+    """
+    if mode is None:
+        mode = _task_profile_mode(model, operation_id)
+    if not mode:
+        yield
+        return
+
+    profiler = PROFILERS[mode]()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        kind = "dump" if model is DumpTaskOperation else "restore"
+        os.makedirs(settings.BACKUP_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.BACKUP_PROFILE_DIR, f"{kind}_{operation_id}{profiler.extension}")
+        profiler.write(path)
+        model.objects.filter(id=operation_id).update(profile_path=path)
@@ -0,0 +1,139 @@
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """
+    Счётчик переданных байт операции.
+
+    Колбэки передачи (boto3, paramiko, ftplib, пайпы процессов) на каждый блок
+    только меняют счётчик в памяти. В БД его пишет один поток раз в
+    BACKUP_PROGRESS_INTERVAL секунд узким UPDATE: потоки передачи не открывают
+    своих соединений и не ждут блокировку SQLite. На выходе из with (или в
+    finish()) поток пишет итог, останавливается и закрывает своё соединение.
+    """
+
+    def __init__(self, operation, phase, total=None):
+        self.model = type(operation)
+        self.operation_id = operation.id
+        self.phase = phase
+        self.total = total
+        self.done = 0
+        self.rate = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # тот же контекст: operation_id для логов
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name="progress-reporter", daemon=True)
+        self._thread.start()
+
+    def add(self, count):
+        """Колбэк «передано ещё count байт» (boto3 Callback, блоки ftplib и пайпов)."""
+        with self._lock:
+            self.done += count
+
+    def set(self, done, total=None):
+        """Колбэк «всего передано done байт» (paramiko put/get)."""
+        with self._lock:
+            self.done = done
+            if total:
+                self.total = total
+
+    def _run(self):
+        last_flush = time.monotonic()
+        last_done = 0
+        try:
+            self._write(0, None)
+            while True:
+                stopped = self._stop.wait(settings.BACKUP_PROGRESS_INTERVAL)
+                now = time.monotonic()
+                with self._lock:
+                    done = self.done
+                elapsed = now - last_flush
+                if elapsed > 0 and done != last_done:
+                    self.rate = (done - last_done) / elapsed
+                last_flush, last_done = now, done
+                self._write(done, self.rate)
+                if stopped:
+                    return
+        finally:
+            connection.close()
+
+    def finish(self):
+        """Итоговая запись и остановка потока; повторный вызов ничего не делает."""
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+    def _write(self, done, rate):
+        # прогресс — только для отображения: ошибка записи не должна останавливать передачу
+        try:
+            self.model.objects.filter(id=self.operation_id).update(
+                progress_phase=self.phase,
+                progress_total=self.total,
+                progress_bytes=done,
+                progress_rate=rate,
+                progress_updated_dt=timezone.now(),
+            )
+        except Exception as e:
+            logger.warning("Failed to save progress of %s: %s", self.operation_id, e)
+            # соединение могло сломаться — следующая запись откроет новое
+            connection.close()
+
+
+class ProgressReader:
+    """Файловый объект-обёртка: считает прочитанные байты (загрузка файла объектом)."""
+
+    def __init__(self, fileobj, progress):
+        self._fileobj = fileobj
+        self._progress = progress
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        if self._progress and data:
+            self._progress.add(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+
+class ProgressWriter:
+    """
+    Файловый объект-обёртка: считает записанные байты (скачивание в файловый объект).
+    С checksum по ним же считается контрольная сумма; такой поток не позиционируется,
+    поэтому boto3 и yadisk пишут в него блоки строго по порядку.
+    """
+
+    def __init__(self, fileobj, progress, checksum=None):
+        self._fileobj = fileobj
+        self._progress = progress
+        self._checksum = checksum
+
+    def write(self, data):
+        written = self._fileobj.write(data)
+        if self._checksum:
+            self._checksum.update(data)
+        if self._progress:
+            self._progress.add(len(data))
+        return written
+
+    def seekable(self):
+        return self._checksum is None and self._fileobj.seekable()
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
@@ -0,0 +1,206 @@
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from manager.choices import DumpOperationStatusChoices
+from manager.models import DumpTaskOperation, RecoverBackupOperation
+from manager.services.process import (ProcessRegistry, run_pool,
+                                      track_processes)
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_queue_mode():
+    return settings.BACKUP_DISPATCH_MODE == "queue"
+
+
+def _spawn(command, operation_ids):
+    # вся пачка — одному фоновому процессу: он выполняет операции пулом (run_operations),
+    # так что запрос API на тысячу id не порождает тысячу процессов
+    if operation_ids:
+        subprocess.Popen(["python", "manage.py", command, *map(str, operation_ids)])
+
+
+def dispatch_dump(operation_ids):
+    """Запуск дампов: в режиме queue их заберут воркеры, иначе — фоновый процесс с пулом."""
+    if is_queue_mode():
+        return
+    _spawn("dump_operation", operation_ids)
+
+
+def dispatch_restore(operation_ids):
+    if is_queue_mode():
+        return
+    _spawn("restore_dump", operation_ids)
+
+
+def run_operations(command, operation_ids, options=(), concurrency=None):
+    """
+    Выполняет операции пулом не более чем из concurrency процессов
+    (BACKUP_DISPATCH_CONCURRENCY): каждая — отдельный command <id> [options].
+    Возвращает {id: код возврата}.
+    """
+    commands = {
+        str(operation_id): ["python", "manage.py", command, str(operation_id), *options]
+        for operation_id in operation_ids
+    }
+    return run_pool(commands, concurrency or settings.BACKUP_DISPATCH_CONCURRENCY)
+
+
+def requeue(model, operation_ids):
+    """Вернуть операции в очередь (повторный запуск из админки)."""
+    model.objects.filter(id__in=operation_ids).update(
+        status=DumpOperationStatusChoices.CREATED,
+        lease_owner=None,
+        lease_expires_dt=None,
+        attempts=0,
+    )
+
+
+class LeaseLost(Exception):
+    """Аренду операции перехватил другой воркер: дальше её ведёт он."""
+
+
+class Lease:
+    """
+    Аренда операции воркером с фоновым продлением.
+
+    Если продлить аренду не удалось (строку забрал другой воркер или БД
+    недоступна дольше срока аренды), lost становится True и утилиты операции
+    убиваются; check() и BackupService._update_operation после этого бросают LeaseLost.
+    """
+
+    def __init__(self, model, operation_id):
+        self.model = model
+        self.operation_id = operation_id
+        self.lost = False
+        self.processes = ProcessRegistry()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._stack = ExitStack()
+
+    def _renew(self):
+        return self.model.objects.filter(id=self.operation_id, lease_owner=WORKER_ID).update(
+            lease_expires_dt=timezone.now() + timedelta(seconds=settings.BACKUP_LEASE_SECONDS)
+        )
+
+    def _heartbeat(self):
+        renewed_at = time.monotonic()
+        try:
+            while not self._stop.wait(settings.BACKUP_LEASE_HEARTBEAT):
+                try:
+                    renewed = self._renew()
+                except Exception:
+                    logger.exception("Failed to renew lease of %s", self.operation_id)
+                    # соединение могло сломаться — следующая попытка откроет новое
+                    connection.close()
+                    if time.monotonic() - renewed_at < settings.BACKUP_LEASE_SECONDS:
+                        continue
+                    # аренда истекла, пока БД была недоступна: операцию мог забрать другой воркер
+                    renewed = 0
+                if not renewed:
+                    logger.warning("Lease of %s lost, stopping the operation", self.operation_id)
+                    self.lost = True
+                    self.processes.kill_all()
+                    return
+                renewed_at = time.monotonic()
+        finally:
+            connection.close()
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"Lease of {self.operation_id} lost")
+
+    def __enter__(self):
+        self._stack.enter_context(track_processes(self.processes))
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._stack.close()
+        if exc_type is not None and not issubclass(exc_type, Exception):
+            # воркер остановили (SIGINT, SystemExit): аренда истечёт, операцию заберёт другой воркер
+            return False
+        owned = self.model.objects.filter(id=self.operation_id, lease_owner=WORKER_ID)
+        # операция, не записавшая итог (упала или вышла раньше), без FAIL осталась бы
+        # IN_PROCESS без арендатора, а такие _available() не раздаёт
+        error = f"Worker error: {exc}" if exc_type is not None else "Operation finished without a result"
+        owned.filter(status=DumpOperationStatusChoices.IN_PROCESS).update(
+            status=DumpOperationStatusChoices.FAIL, error_text=error)
+        owned.update(lease_owner=None, lease_expires_dt=None)
+        return False
+
+
+class QueueService:
+    """
+    Раздача операций воркерам через аренду строк.
+
+    Свободна операция в статусе CREATED без арендатора либо IN_PROCESS с
+    истёкшей арендой (нода упала). Кандидат выбирается SELECT ... FOR UPDATE
+    SKIP LOCKED, поэтому воркеры разных нод не ждут друг друга, а захват
+    подтверждается условным UPDATE — это работает и на SQLite, где FOR UPDATE нет.
+    """
+
+    MODELS = (DumpTaskOperation, RecoverBackupOperation)
+
+    @staticmethod
+    def _available(now):
+        return (
+            Q(status=DumpOperationStatusChoices.CREATED, lease_owner__isnull=True)
+            | Q(status=DumpOperationStatusChoices.IN_PROCESS, lease_owner__isnull=False, lease_expires_dt__lt=now)
+        )
+
+    def _fail_exhausted(self, model, now):
+        # операции, которые уже столько раз роняли воркеры, больше не раздаём
+        model.objects.filter(
+            self._available(now), attempts__gte=settings.BACKUP_MAX_ATTEMPTS
+        ).update(
+            status=DumpOperationStatusChoices.FAIL,
+            error_text="Worker lease expired too many times",
+            lease_owner=None,
+            lease_expires_dt=None,
+        )
+
+    def claim(self, model):
+        """Забирает одну операцию model. Возвращает её id или None."""
+        now = timezone.now()
+        self._fail_exhausted(model, now)
+        with transaction.atomic():
+            candidate_ids = list(
+                model.objects.select_for_update(skip_locked=True)
+                .filter(self._available(now))
+                .order_by("created_dt")
+                .values_list("id", flat=True)[:5]
+            )
+            for candidate_id in candidate_ids:
+                claimed = model.objects.filter(self._available(now), id=candidate_id).update(
+                    status=DumpOperationStatusChoices.IN_PROCESS,
+                    lease_owner=WORKER_ID,
+                    lease_expires_dt=now + timedelta(seconds=settings.BACKUP_LEASE_SECONDS),
+                    attempts=F("attempts") + 1,
+                )
+                if claimed:
+                    return candidate_id
+        return None
+
+    def claim_next(self):
+        """Сначала дампы, потом восстановления. Возвращает (model, id) или (None, None)."""
+        for model in self.MODELS:
+            operation_id = self.claim(model)
+            if operation_id:
+                return model, operation_id
+        return None, None
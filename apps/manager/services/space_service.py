@@ -0,0 +1,204 @@
+import errno
+import fcntl
+import glob
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+
+from django.conf import settings
+
+from manager.choices import DumpOperationStatusChoices
+from manager.models import DumpTaskOperation
+from manager.services.queue_service import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def paths_size(patterns):
+    total = 0
+    paths = {path for pattern in patterns for path in glob.glob(pattern)}
+    for path in paths:
+        if os.path.basename(path).startswith(SpaceService.BALLAST_PREFIX):
+            continue
+        if os.path.isfile(path):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for name in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+    return total
+
+
+class SpaceReservation:
+    """
+    Резерв места в спуле под одну задачу.
+
+    Резерв держится балласт-файлом, выделенным через posix_fallocate: пока задача
+    пишет свои файлы, балласт урезается на столько же, так что суммарно задача
+    занимает на диске ровно зарезервированный объём и чужие задачи его не займут.
+    """
+
+    WATCH_INTERVAL = 5
+
+    def __init__(self, ballast_path, size):
+        self.ballast_path = ballast_path
+        self.size = size
+        self.watch_patterns = []
+        self.peak_usage = 0
+        self._fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def allocate(self):
+        if not self.size:
+            return True
+        self._fd = os.open(self.ballast_path, os.O_CREAT | os.O_WRONLY, 0o600)
+        try:
+            os.posix_fallocate(self._fd, 0, self.size)
+        except OSError as e:
+            os.close(self._fd)
+            self._fd = None
+            os.remove(self.ballast_path)
+            if e.errno in (errno.EOPNOTSUPP, errno.EINVAL):
+                # ФС не умеет fallocate: остаётся только проверка свободного места
+                return True
+            return False
+        return True
+
+    def watch(self, *patterns):
+        """Glob-шаблоны файлов задачи, на размер которых урезается балласт."""
+        self.watch_patterns.extend(patterns)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._shrink_loop, daemon=True)
+            self._thread.start()
+
+    def _shrink_loop(self):
+        while not self._stop.wait(self.WATCH_INTERVAL):
+            used = paths_size(self.watch_patterns)
+            self.peak_usage = max(self.peak_usage, used)
+            if self._fd is None:
+                continue
+            try:
+                os.ftruncate(self._fd, max(self.size - used, 0))
+            except OSError:
+                os.close(self._fd)
+                self._fd = None
+
+    def release(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.peak_usage = max(self.peak_usage, paths_size(self.watch_patterns))
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if os.path.exists(self.ballast_path):
+            try:
+                os.remove(self.ballast_path)
+            except OSError as e:
+                logger.warning("Failed to remove ballast file %s: %s", self.ballast_path, e)
+
+
+class SpaceService:
+    """Допуск задач к запуску по свободному месту в спуле."""
+
+    LOCK_NAME = ".backup_manager_space.lock"
+    BALLAST_PREFIX = ".backup_manager_reserve_"
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+
+    def _cleanup_stale_ballast(self):
+        # балласт упавших процессов этого хоста: <prefix><host>:<pid>_<key>. Спул может быть
+        # общим для нескольких нод — чужой балласт держит живой резерв, его pid здесь ничего не значит
+        hostname = socket.gethostname()
+        for path in glob.glob(os.path.join(self.spool_dir, f"{self.BALLAST_PREFIX}*")):
+            host, _, rest = os.path.basename(path)[len(self.BALLAST_PREFIX):].partition(":")
+            pid = rest.split("_", 1)[0]
+            if host == hostname and pid.isdigit() and not pid_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _try_reserve(self, key, size):
+        lock_path = os.path.join(self.spool_dir, self.LOCK_NAME)
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._cleanup_stale_ballast()
+                free = shutil.disk_usage(self.spool_dir).free
+                if free - settings.BACKUP_SPOOL_HEADROOM_BYTES < size:
+                    return None
+                ballast_path = os.path.join(self.spool_dir, f"{self.BALLAST_PREFIX}{WORKER_ID}_{key}")
+                reservation = SpaceReservation(ballast_path, size)
+                if not reservation.allocate():
+                    return None
+                return reservation
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def try_admit(self, key, size):
+        """Резервирует size байт, только если они свободны прямо сейчас."""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        return self._try_reserve(key, int(size or 0))
+
+    def admit(self, key, size):
+        """
+        Ждёт, пока в спуле освободится size байт, и резервирует их.
+        Возвращает (reservation, error).
+        """
+        size = int(size or 0)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        deadline = time.monotonic() + settings.BACKUP_ADMISSION_TIMEOUT
+        while True:
+            reservation = self._try_reserve(key, size)
+            if reservation:
+                return reservation, None
+            if time.monotonic() >= deadline:
+                return None, (
+                    f"Not enough space in {self.spool_dir}: need {size} bytes "
+                    f"plus {settings.BACKUP_SPOOL_HEADROOM_BYTES} bytes headroom"
+                )
+            logger.info("Waiting for %s bytes in %s...", size, self.spool_dir)
+            time.sleep(settings.BACKUP_ADMISSION_POLL_INTERVAL)
+
+
+def estimate_dump_size(task, source_size):
+    """
+    Оценка размера дампа: размер БД, умноженный на медиану отношения
+    dump_size / source_size по последним успешным дампам задачи.
+    """
+    if not source_size:
+        return None
+    history = DumpTaskOperation.objects.filter(
+        task=task,
+        status=DumpOperationStatusChoices.SUCCESS,
+        source_size__gt=0,
+        dump_size__isnull=False,
+    ).order_by("-created_dt").values_list("source_size", "dump_size")[:10]
+    ratios = sorted(dump_size / src for src, dump_size in history)
+    if ratios:
+        ratio = ratios[len(ratios) // 2]
+    else:
+        ratio = settings.BACKUP_DEFAULT_COMPRESSION_RATIO
+    return int(source_size * ratio)
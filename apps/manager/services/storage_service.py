@@ -1,10 +1,30 @@
 import os
 from ftplib import FTP, error_perm as FTPError
 import boto3
+from boto3.s3.transfer import TransferConfig
 import yadisk
 import paramiko
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 
+from manager.services.encryption_service import DecryptionError
+from manager.services.process import CHUNK_SIZE
+from manager.services.progress_service import ProgressReader, ProgressWriter
+
+MB = 1024 * 1024
+# минимальная часть multipart при загрузке потока в S3 (как у boto3 по умолчанию)
+S3_STREAM_CHUNK_SIZE = 8 * MB
+
+
+def _download_to_file(service, remote_path, workdir, progress, checksum, cipher):
+    """download_dump любого хранилища: download_fileobj в <workdir>/<имя файла> -> (filepath, error)."""
+    local_filepath = os.path.join(workdir, remote_path.split("/")[-1])
+    try:
+        with open(local_filepath, "wb") as f:
+            error = service.download_fileobj(remote_path, f, progress=progress, checksum=checksum, cipher=cipher)
+    except OSError as e:
+        return None, str(e)
+    return (None, error) if error else (local_filepath, None)
+
 
 class S3StorageSerivce:
     def __init__(self, storage_instance):
@@ -19,14 +39,29 @@ class S3StorageSerivce:
             aws_secret_access_key=self.storage_instance.secret_key,
         )
 
-    def upload_dump(self, filepath, operation_id):
+    def upload_dump(self, filepath, operation_id, progress=None, checksums=None, cipher=None):
         error = None
         s3_file_path = None
         fileformat = filepath.split(".")[-1]
         try:
             self._connect()
             key = f'dumps/{operation_id}.{fileformat}'
-            self.s3.upload_file(filepath, self.storage_instance.bucket_name, key)
+            # контрольные суммы дампа едут вместе с объектом (x-amz-meta-*)
+            metadata = {name: value for name, value in (checksums or {}).items() if value}
+            extra_args = {"Metadata": metadata} if metadata else None
+            callback = progress.add if progress else None
+            if cipher:
+                # шифрованный поток читается по порядку, части multipart уходят параллельно
+                with open(filepath, "rb") as f:
+                    self.s3.upload_fileobj(
+                        cipher.reader(f), self.storage_instance.bucket_name, key,
+                        ExtraArgs=extra_args, Callback=callback,
+                    )
+            else:
+                self.s3.upload_file(
+                    filepath, self.storage_instance.bucket_name, key,
+                    ExtraArgs=extra_args, Callback=callback,
+                )
             s3_file_path = key
         except FileNotFoundError:
             error = "File not found"
@@ -36,6 +71,34 @@ class S3StorageSerivce:
             error = str(e)
         return s3_file_path, error
 
+    def upload_fileobj(self, fileobj, filename, progress=None, cipher=None, size_hint=None):
+        """
+        Загрузка потока (вывод pg_basebackup) в dumps/<filename> без файла в спуле.
+        Размер заранее не известен: часть multipart подбирается по size_hint так,
+        чтобы хватило лимита S3 в 10000 частей. Суммы потока известны только
+        в конце, поэтому в метаданные объекта они не попадают.
+        """
+        error = None
+        s3_file_path = None
+        chunk_size = max(S3_STREAM_CHUNK_SIZE, -(-int((size_hint or 0) * 1.5) // 10000 // MB) * MB)
+        try:
+            self._connect()
+            key = f'dumps/{filename}'
+            self.s3.upload_fileobj(
+                cipher.reader(fileobj) if cipher else fileobj, self.storage_instance.bucket_name, key,
+                Callback=progress.add if progress else None,
+                # части потока держатся в памяти: с крупными частями — меньше параллельных
+                Config=TransferConfig(
+                    multipart_chunksize=chunk_size,
+                    max_concurrency=10 if chunk_size <= S3_STREAM_CHUNK_SIZE * 8 else 4),
+            )
+            s3_file_path = key
+        except (NoCredentialsError, PartialCredentialsError):
+            error = "Credentials are not valid"
+        except Exception as e:
+            error = str(e)
+        return s3_file_path, error
+
     def delete_dump(self, filepath):
         try:
             self._connect()
@@ -44,18 +107,69 @@ class S3StorageSerivce:
             return False
         return True
 
-    def download_dump(self, s3_file_path):
-        filename = s3_file_path.split("/")[-1]
-        local_filepath = f"/tmp/{filename}"
+    def delete_dumps(self, filepaths):
+        """Пакетное удаление (до 1000 ключей за запрос). Возвращает неудалённые пути."""
+        failed = []
+        try:
+            self._connect()
+        except Exception:
+            return list(filepaths)
+        for start in range(0, len(filepaths), 1000):
+            batch = filepaths[start:start + 1000]
+            try:
+                response = self.s3.delete_objects(
+                    Bucket=self.storage_instance.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+                failed.extend(item["Key"] for item in response.get("Errors", []))
+            except Exception:
+                failed.extend(batch)
+        return failed
+
+    def download_dump(self, s3_file_path, workdir, progress=None, checksum=None, cipher=None):
+        return _download_to_file(self, s3_file_path, workdir, progress, checksum, cipher)
+
+    def download_fileobj(self, s3_file_path, fileobj, progress=None, checksum=None, cipher=None):
+        """Скачивание в файловый объект (файл в спуле или пайп распаковки). Возвращает ошибку или None."""
         try:
             self._connect()
-            self.s3.download_file(
+            # части скачиваются параллельно, но в fileobj и в checksum попадают по порядку
+            out = ProgressWriter(fileobj, progress, checksum)
+            if cipher:
+                out = cipher.writer(out)
+            self.s3.download_fileobj(
                 Bucket=self.storage_instance.bucket_name,
                 Key=s3_file_path,
-                Filename=local_filepath
+                Fileobj=out,
             )
+            if cipher:
+                out.finish()
+        except DecryptionError as e:
+            return str(e)
         except getattr(self.s3, "exceptions", object()).__dict__.get("NoSuchKey", Exception) as _:  # noqa
-            return None, "File not found in S3"
+            return "File not found in S3"
+        except (NoCredentialsError, PartialCredentialsError):
+            return "Credentials are not valid"
+        except Exception as e:
+            return str(e)
+        return None
+
+    def download_ranges(self, s3_file_path, ranges, workdir, progress=None):
+        """Только диапазоны (offset, length) объекта, подряд в один файл: по Range GET на диапазон."""
+        filename = s3_file_path.split("/")[-1]
+        local_filepath = os.path.join(workdir, filename)
+        try:
+            self._connect()
+            with open(local_filepath, "wb") as f:
+                out = ProgressWriter(f, progress)
+                for offset, length in ranges:
+                    response = self.s3.get_object(
+                        Bucket=self.storage_instance.bucket_name,
+                        Key=s3_file_path,
+                        Range=f"bytes={offset}-{offset + length - 1}",
+                    )
+                    for chunk in response["Body"].iter_chunks(CHUNK_SIZE):
+                        out.write(chunk)
         except (NoCredentialsError, PartialCredentialsError):
             return None, "Credentials are not valid"
         except Exception as e:
@@ -75,18 +189,23 @@ class YandexDiskStorageSerivce:
             raise RuntimeError("Yandex Disk OAuth token is empty (use secret_key)")
         self._y = yadisk.YaDisk(token=self.storage_instance.secret_key)
 
-    def upload_dump(self, filepath, operation_id):
+    def upload_dump(self, filepath, operation_id, progress=None, checksums=None, cipher=None):
+        fileformat = filepath.split(".")[-1]
+        try:
+            with open(filepath, "rb") as f:
+                return self.upload_fileobj(f, f"{operation_id}.{fileformat}", progress=progress, cipher=cipher)
+        except FileNotFoundError:
+            return None, "File not found"
+
+    def upload_fileobj(self, fileobj, filename, progress=None, cipher=None, size_hint=None):
         error = None
         remote_path = None
-        fileformat = filepath.split(".")[-1]
         try:
             base = "/dumps"
             if not self._y.exists(base):
                 self._y.mkdir(base)
-            remote_path = f"{base}/{operation_id}.{fileformat}"
-            self._y.upload(filepath, remote_path)
-        except FileNotFoundError:
-            error = "File not found"
+            remote_path = f"{base}/{filename}"
+            self._y.upload(ProgressReader(cipher.reader(fileobj) if cipher else fileobj, progress), remote_path)
         except Exception as e:
             error = str(e)
         return remote_path, error
@@ -99,16 +218,22 @@ class YandexDiskStorageSerivce:
         except Exception:
             return False
 
-    def download_dump(self, remote_path):
-        filename = remote_path.split("/")[-1]
-        local_filepath = f"/tmp/{filename}"
+    def download_dump(self, remote_path, workdir, progress=None, checksum=None, cipher=None):
+        return _download_to_file(self, remote_path, workdir, progress, checksum, cipher)
+
+    def download_fileobj(self, remote_path, fileobj, progress=None, checksum=None, cipher=None):
         try:
             if not self._y.exists(remote_path):
-                return None, "File not found in Yandex Disk"
-            self._y.download(remote_path, local_filepath)
+                return "File not found in Yandex Disk"
+            out = ProgressWriter(fileobj, progress, checksum)
+            if cipher:
+                out = cipher.writer(out)
+            self._y.download(remote_path, out)
+            if cipher:
+                out.finish()
         except Exception as e:
-            return None, str(e)
-        return local_filepath, None
+            return str(e)
+        return None
 
 
 class FTPStorageService:
@@ -164,10 +289,17 @@ class FTPStorageService:
                 except FTPError:
                     pass
 
-    def upload_dump(self, filepath, operation_id):
+    def upload_dump(self, filepath, operation_id, progress=None, checksums=None, cipher=None):
+        fileformat = filepath.split(".")[-1]
+        try:
+            with open(filepath, "rb") as f:
+                return self.upload_fileobj(f, f"{operation_id}.{fileformat}", progress=progress, cipher=cipher)
+        except FileNotFoundError:
+            return None, "File not found"
+
+    def upload_fileobj(self, fileobj, filename, progress=None, cipher=None, size_hint=None):
         error = None
         remote_path = None
-        fileformat = filepath.split(".")[-1]
 
         try:
             ftp = self._connect()
@@ -179,16 +311,15 @@ class FTPStorageService:
                 self._ensure_directory(ftp, dumps_dir)
                 ftp.cwd(dumps_dir)
 
-                # Загружаем файл
-                filename = f"{operation_id}.{fileformat}"
-                with open(filepath, "rb") as f:
-                    ftp.storbinary(f"STOR {filename}", f)
+                # Загружаем поток
+                ftp.storbinary(
+                    f"STOR {filename}", cipher.reader(fileobj) if cipher else fileobj,
+                    callback=(lambda block: progress.add(len(block))) if progress else None,
+                )
 
                 remote_path = f"{dumps_dir}/{filename}".replace("//", "/")
             finally:
                 ftp.quit()
-        except FileNotFoundError:
-            error = "File not found"
         except FTPError as e:
             error = f"FTP error: {e}"
         except Exception as e:
@@ -207,25 +338,53 @@ class FTPStorageService:
         except Exception:
             return False
 
-    def download_dump(self, remote_path):
-        filename = remote_path.split("/")[-1]
-        local_filepath = f"/tmp/{filename}"
+    def delete_dumps(self, filepaths):
+        """Удаление нескольких файлов в одном соединении. Возвращает неудалённые пути."""
+        failed = []
+        try:
+            ftp = self._connect()
+        except Exception:
+            return list(filepaths)
+        try:
+            for filepath in filepaths:
+                try:
+                    ftp.delete(filepath)
+                except Exception:
+                    failed.append(filepath)
+        finally:
+            ftp.quit()
+        return failed
+
+    def download_dump(self, remote_path, workdir, progress=None, checksum=None, cipher=None):
+        return _download_to_file(self, remote_path, workdir, progress, checksum, cipher)
 
+    def download_fileobj(self, remote_path, fileobj, progress=None, checksum=None, cipher=None):
         try:
             ftp = self._connect()
             try:
-                with open(local_filepath, "wb") as f:
-                    ftp.retrbinary(f"RETR {remote_path}", f.write)
+                out = ProgressWriter(fileobj, progress, checksum)
+                if cipher:
+                    out = cipher.writer(out)
+                ftp.retrbinary(f"RETR {remote_path}", out.write)
+                if cipher:
+                    out.finish()
+            except (DecryptionError, BrokenPipeError):
+                # передача оборвана посреди файла: QUIT получил бы 426 и скрыл причину
+                ftp.close()
+                raise
             finally:
-                ftp.quit()
+                if ftp.sock is not None:
+                    ftp.quit()
+        except DecryptionError as e:
+            return str(e)
         except FTPError as e:
             if "550" in str(e):
-                return None, "File not found on FTP"
-            return None, f"FTP error: {e}"
+                return "File not found on FTP"
+            return f"FTP error: {e}"
         except Exception as e:
-            return None, str(e)
+            return str(e)
 
-        return local_filepath, None
+        return None
 
 
 class SFTPStorageService:
@@ -292,7 +451,7 @@ class SFTPStorageService:
                 except IOError:
                     pass
 
-    def upload_dump(self, filepath, operation_id):
+    def upload_dump(self, filepath, operation_id, progress=None, checksums=None, cipher=None):
         error = None
         remote_path = None
         fileformat = filepath.split(".")[-1]
@@ -309,7 +468,12 @@ class SFTPStorageService:
                 # Загружаем файл
                 filename = f"{operation_id}.{fileformat}"
                 remote_file_path = f"{dumps_dir}/{filename}".replace("//", "/")
-                sftp.put(filepath, remote_file_path)
+                callback = progress.set if progress else None
+                if cipher:
+                    with open(filepath, "rb") as f:
+                        sftp.putfo(cipher.reader(f), remote_file_path, callback=callback)
+                else:
+                    sftp.put(filepath, remote_file_path, callback=callback)
 
                 remote_path = remote_file_path
             finally:
@@ -325,6 +489,30 @@ class SFTPStorageService:
 
         return remote_path, error
 
+    def upload_fileobj(self, fileobj, filename, progress=None, cipher=None, size_hint=None):
+        error = None
+        remote_path = None
+
+        try:
+            sftp = self._connect()
+            try:
+                dumps_dir = f"{self.base_path}/dumps".replace("//", "/")
+                self._ensure_directory(sftp, dumps_dir)
+                remote_file_path = f"{dumps_dir}/{filename}".replace("//", "/")
+                sftp.putfo(cipher.reader(fileobj) if cipher else fileobj, remote_file_path,
+                           callback=progress.set if progress else None)
+                remote_path = remote_file_path
+            finally:
+                sftp.close()
+                if hasattr(sftp, '_ssh_client'):
+                    sftp._ssh_client.close()
+        except paramiko.SSHException as e:
+            error = f"SSH error: {e}"
+        except Exception as e:
+            error = str(e)
+
+        return remote_path, error
+
     def delete_dump(self, filepath):
         try:
             sftp = self._connect()
@@ -338,14 +526,72 @@ class SFTPStorageService:
         except Exception:
             return False
 
-    def download_dump(self, remote_path):
+    def delete_dumps(self, filepaths):
+        """Удаление нескольких файлов в одной SFTP-сессии. Возвращает неудалённые пути."""
+        failed = []
+        try:
+            sftp = self._connect()
+        except Exception:
+            return list(filepaths)
+        try:
+            for filepath in filepaths:
+                try:
+                    sftp.remove(filepath)
+                except Exception:
+                    failed.append(filepath)
+        finally:
+            sftp.close()
+            if hasattr(sftp, '_ssh_client'):
+                sftp._ssh_client.close()
+        return failed
+
+    def download_dump(self, remote_path, workdir, progress=None, checksum=None, cipher=None):
+        return _download_to_file(self, remote_path, workdir, progress, checksum, cipher)
+
+    def download_fileobj(self, remote_path, fileobj, progress=None, checksum=None, cipher=None):
+        try:
+            sftp = self._connect()
+            try:
+                out = ProgressWriter(fileobj, None, checksum)
+                if cipher:
+                    out = cipher.writer(out)
+                sftp.getfo(remote_path, out, callback=progress.set if progress else None)
+                if cipher:
+                    out.finish()
+            finally:
+                sftp.close()
+                if hasattr(sftp, '_ssh_client'):
+                    sftp._ssh_client.close()
+        except IOError as e:
+            if e.errno == 2:  # No such file
+                return "File not found on SFTP"
+            return f"SFTP IO error: {e}"
+        except paramiko.SSHException as e:
+            return f"SSH error: {e}"
+        except Exception as e:
+            return str(e)
+
+        return None
+
+    def download_ranges(self, remote_path, ranges, workdir, progress=None):
+        """Только диапазоны (offset, length) файла, подряд в один файл: readv конвейером запросов."""
         filename = remote_path.split("/")[-1]
-        local_filepath = f"/tmp/{filename}"
+        local_filepath = os.path.join(workdir, filename)
+        # readv сам режет запросы по размеру пакета SFTP; куски по CHUNK_SIZE — чтобы не держать диапазон в памяти
+        pieces = [
+            (start, min(CHUNK_SIZE, offset + length - start))
+            for offset, length in ranges
+            for start in range(offset, offset + length, CHUNK_SIZE)
+        ]
 
         try:
             sftp = self._connect()
             try:
-                sftp.get(remote_path, local_filepath)
+                with sftp.open(remote_path, "rb") as remote, open(local_filepath, "wb") as f:
+                    out = ProgressWriter(f, progress)
+                    for start in range(0, len(pieces), 64):
+                        for data in remote.readv(pieces[start:start + 64]):
+                            out.write(data)
             finally:
                 sftp.close()
                 if hasattr(sftp, '_ssh_client'):
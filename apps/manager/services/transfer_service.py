@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class TransferPool:
+    """
+    Ограниченный пул потоков для операций с хранилищем над многими файлами:
+    на каждый вызов создаётся пул не больше чем из concurrency потоков,
+    синхронные методы сервиса выполняются в нём как есть.
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or settings.BACKUP_TRANSFER_CONCURRENCY
+
+    @staticmethod
+    def _call(method, *args):
+        try:
+            return method(*args)
+        except Exception as e:
+            return e
+
+    def run(self, calls):
+        """
+        calls: [(method_name, service, *args), ...]
+        Возвращает результаты в том же порядке; исключения возвращаются как значения.
+        """
+        if not calls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(calls))) as executor:
+            futures = [executor.submit(self._call, getattr(service, method_name), *args)
+                       for method_name, service, *args in calls]
+            return [future.result() for future in futures]
+
+    def download_many(self, storage_service, downloads, workdir, progress=None):
+        """
+        Скачивает файлы одного хранилища в workdir параллельно.
+        downloads: [(remote_path, checksum, cipher)] -> [(local_path, error)] в том же порядке.
+        """
+        results = self.run([("download_dump", storage_service, remote_path, workdir, progress, checksum, cipher)
+                            for remote_path, checksum, cipher in downloads])
+        return [(None, str(r)) if isinstance(r, Exception) else r for r in results]
+
+    def delete_many(self, storage_service, paths):
+        """Удаляет файлы одного хранилища. Возвращает список путей, которые удалить не удалось."""
+        paths = [path for path in paths if path]
+        if hasattr(storage_service, "delete_dumps"):
+            # пакетное удаление в одном соединении/запросе
+            result = self.run([("delete_dumps", storage_service, paths)])[0]
+            return paths if isinstance(result, Exception) else result
+        results = self.run([("delete_dump", storage_service, path) for path in paths])
+        return [path for path, ok in zip(paths, results) if ok is not True]
@@ -0,0 +1,139 @@
+import logging
+import subprocess
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from manager.choices import DumpOperationStatusChoices
+from manager.models import DumpTask, DumpTaskOperation, VerificationOperation
+from manager.services.process import run_pool
+
+logger = logging.getLogger(__name__)
+
+# Абсолютный допуск по строкам: у маленьких таблиц оценки планировщика грубее процента
+ROW_SLACK = 100
+
+
+def _rows_match(expected, actual):
+    if expected is None:
+        return True
+    allowed = max(expected * settings.BACKUP_VERIFY_ROW_TOLERANCE, ROW_SLACK)
+    return abs(actual - expected) <= allowed
+
+
+def compare_tables(db_interface, connection_string, manifest):
+    """
+    Сверяет восстановленную БД с манифестом дампа: набор таблиц и число строк
+    в BACKUP_VERIFY_SAMPLE_TABLES самых больших таблицах. В манифесте — оценки
+    на момент дампа (статистика СУБД), поэтому строки сравниваются с допуском
+    BACKUP_VERIFY_ROW_TOLERANCE: ловится пустая или недогруженная таблица, а не
+    расхождение на единицы. Возвращает dict с ключами passed и summary.
+    """
+    restored = db_interface.table_stats(connection_string) or {}
+    if not manifest or manifest.get("tables") is None:
+        # у дампа нет манифеста (снят до появления проверки) — проверяем только, что БД не пуста
+        passed = bool(restored)
+        return {
+            "passed": passed,
+            "summary": f"{len(restored)} tables restored, no manifest to compare with",
+            "tables": len(restored),
+        }
+
+    expected = manifest["tables"]
+    missing = sorted(set(expected) - set(restored))
+    extra = sorted(set(restored) - set(expected))
+
+    largest = sorted(
+        (name for name in expected if name in restored),
+        key=lambda name: expected[name].get("bytes") or 0,
+        reverse=True,
+    )[:settings.BACKUP_VERIFY_SAMPLE_TABLES]
+    counts = db_interface.count_rows(connection_string, largest)
+    sampled = []
+    for name in largest:
+        rows = expected[name].get("rows")
+        sampled.append({
+            "table": name,
+            "expected_rows": rows,
+            "rows": counts[name],
+            "ok": _rows_match(rows, counts[name]),
+        })
+    mismatched = [row["table"] for row in sampled if not row["ok"]]
+
+    passed = not missing and not mismatched
+    problems = []
+    if missing:
+        problems.append(f"{len(missing)} tables missing")
+    if mismatched:
+        problems.append(f"row counts differ in {', '.join(mismatched)}")
+    summary = "; ".join(problems) or f"{len(restored)} tables, {len(sampled)} sampled"
+    return {
+        "passed": passed,
+        "summary": summary,
+        "tables": len(restored),
+        "missing": missing,
+        "extra": extra,
+        "sampled": sampled,
+    }
+
+
+def schedule_verifications():
+    """
+    Для каждой задачи с verify_database создаёт проверку последнего успешного
+    дампа, если его ещё не проверяли. Возвращает id созданных операций.
+    """
+    created = []
+    tasks = DumpTask.objects.filter(verify_database__isnull=False).select_related("verify_database")
+    for task in tasks:
+        with transaction.atomic():
+            dump_operation = (
+                DumpTaskOperation.objects.select_for_update()
+                .filter(task=task, status=DumpOperationStatusChoices.SUCCESS)
+                .order_by("-created_dt")
+                .first()
+            )
+            if dump_operation is None or dump_operation.verifications.exists():
+                continue
+            operation = VerificationOperation.objects.create(
+                dump_operation=dump_operation, target_database=task.verify_database)
+        created.append(str(operation.id))
+    return created
+
+
+def claim_verification(operation_id):
+    """
+    Забирает проверку на выполнение: CREATED -> IN_PROCESS одним условным UPDATE.
+    Одну проверку могут запустить и админка, и cron (verify_dumps без id) —
+    выполнит её только тот, кому UPDATE вернул строку.
+    """
+    return bool(VerificationOperation.objects.filter(
+        id=operation_id, status=DumpOperationStatusChoices.CREATED
+    ).update(
+        status=DumpOperationStatusChoices.IN_PROCESS,
+        error_text=None,
+        log_tail=None,
+        checks=None,
+        updated_dt=timezone.now(),
+    ))
+
+
+def _command(operation_id):
+    return ["python", "manage.py", "verify_dumps", str(operation_id)]
+
+
+def run_verifications(operation_ids, concurrency=None):
+    """
+    Выполняет проверки пулом не более чем из concurrency процессов
+    (BACKUP_VERIFY_CONCURRENCY): каждая проверка — отдельный verify_dumps <id>,
+    чтобы загрузки в БД и блокировки спула не делили один интерпретатор.
+    Ждёт завершения всех и возвращает {id: код возврата}.
+    """
+    commands = {str(operation_id): _command(operation_id) for operation_id in operation_ids}
+    return run_pool(commands, concurrency or settings.BACKUP_VERIFY_CONCURRENCY)
+
+
+def dispatch_verifications(operation_ids):
+    """Запуск из админки: пул проверок в фоновом процессе."""
+    if operation_ids:
+        subprocess.Popen(["python", "manage.py", "verify_dumps", *map(str, operation_ids)])
@@ -0,0 +1,368 @@
+import gzip
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from manager.choices import BackupModeChoices, DBType
+from manager.models import DumpTask, WalBatch
+from manager.services.checksum_service import StreamChecksum
+from manager.services.databases import DB_INTERFACE
+from manager.services.encryption_service import dump_cipher
+from manager.services.metrics_service import storage_error
+from manager.services.progress_service import ProgressWriter
+from manager.services.storage_factory import get_storage_service
+
+logger = logging.getLogger(__name__)
+
+# Завершённый сегмент (сжатый pg_receivewal или нет) и файл истории линии времени;
+# незавершённый сегмент — <имя>.partial (или .gz.partial), в пачки не попадает
+SEGMENT_RE = re.compile(r"^(?P<name>[0-9A-F]{24})(?P<gz>\.gz)?$")
+HISTORY_RE = re.compile(r"^[0-9A-F]{8}\.history$")
+PARTIAL_SUFFIX = ".partial"
+# Пауза перед перезапуском упавшего pg_receivewal, растёт до RESTART_DELAY_MAX
+RESTART_DELAY = 5
+RESTART_DELAY_MAX = 300
+
+
+def parse_lsn(text):
+    """'16/B374D848' -> позиция в WAL (int)."""
+    high, _, low = text.partition("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def segment_name(timeline, lsn, segment_size):
+    """Имя файла сегмента WAL, в котором лежит позиция lsn."""
+    segno = lsn // segment_size
+    per_xlogid = 0x100000000 // segment_size
+    return f"{timeline:08X}{segno // per_xlogid:08X}{segno % per_xlogid:08X}"
+
+
+def slot_name(task):
+    """Слот репликации задачи: [a-z0-9_], не длиннее 63 символов."""
+    return "backup_manager_" + re.sub(r"[^a-z0-9]", "", str(task.id).lower())[:48]
+
+
+def pitr_tasks():
+    return DumpTask.objects.filter(
+        backup_mode=BackupModeChoices.PITR, database__db_type=DBType.POSTGRESQL,
+    ).select_related("database", "file_storage")
+
+
+def wal_archive_warning(task):
+    """
+    Предупреждение для админки: у задачи PITR давно (BACKUP_ARCHIVE_STALE_SECONDS)
+    не было новых пачек WAL — скорее всего, не запущен archive_wal, и восстановить
+    на момент времени после последней пачки не получится. None — всё в порядке.
+    """
+    if task.backup_mode != BackupModeChoices.PITR:
+        return None
+    last_dt = task.wal_batches.order_by("-created_dt").values_list("created_dt", flat=True).first()
+    # первую пачку ждём не дольше порога с момента создания задачи
+    age = timezone.now() - (last_dt or task.created_dt)
+    if age <= timedelta(seconds=settings.BACKUP_ARCHIVE_STALE_SECONDS):
+        return None
+    if last_dt is None:
+        return "No WAL archived yet, is archive_wal running?"
+    return f"No WAL archived for {timedelta(seconds=int(age.total_seconds()))}, is archive_wal running?"
+
+
+class WalReceiver:
+    """
+    pg_receivewal одной задачи и выгрузка его сегментов пачками.
+
+    Сегменты пишутся в <BACKUP_WAL_SPOOL_DIR>/<task_id>. Завершённые сегменты
+    уходят в хранилище одним tar-файлом, когда их набралось
+    BACKUP_WAL_BATCH_SEGMENTS или самый старый ждёт дольше BACKUP_WAL_BATCH_SECONDS;
+    после загрузки они удаляются. Если текущий сегмент заполняется медленнее,
+    архиватор закрывает его pg_switch_wal(), так что отставание архива от
+    сервера не превышает примерно BACKUP_WAL_BATCH_SECONDS.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.directory = os.path.join(settings.BACKUP_WAL_SPOOL_DIR, str(task.id))
+        self.process = None
+        self._restart_at = 0
+        self._restart_delay = RESTART_DELAY
+        self._partial = None  # (имя, когда замечен, mtime тогда)
+
+    @property
+    def db_interface(self):
+        return DB_INTERFACE[self.task.database.db_type]()
+
+    # --- pg_receivewal
+
+    def _log_stderr(self, pipe):
+        for raw in iter(pipe.readline, b""):
+            logger.warning("pg_receivewal [%s]: %s", self.task.id, raw.decode(errors="replace").rstrip())
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        connection_string = self.task.database.connection_string
+        try:
+            self.db_interface.create_replication_slot(connection_string, slot_name(self.task))
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.error("Failed to create replication slot for task %s: %s", self.task.id, e)
+            self._schedule_restart()
+            return
+        command = self.db_interface.receive_wal_command(
+            connection_string, self.directory, slot_name(self.task), settings.BACKUP_WAL_COMPRESS_LEVEL)
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        threading.Thread(target=self._log_stderr, args=(self.process.stderr,), daemon=True).start()
+        logger.info("pg_receivewal started for task %s (pid %s)", self.task.id, self.process.pid)
+
+    def _schedule_restart(self):
+        self._restart_at = time.monotonic() + self._restart_delay
+        self._restart_delay = min(self._restart_delay * 2, RESTART_DELAY_MAX)
+
+    def ensure_running(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        if self.process is not None:
+            logger.warning("pg_receivewal for task %s exited with code %s",
+                           self.task.id, self.process.returncode)
+            self.process = None
+            self._schedule_restart()
+        if time.monotonic() >= self._restart_at:
+            self.start()
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            # по SIGTERM pg_receivewal дописывает полученное и выходит
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    # --- выгрузка
+
+    def completed(self):
+        """Завершённые сегменты и файлы истории: [(имя файла, mtime)] по порядку WAL."""
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return files
+        for name in names:
+            if SEGMENT_RE.match(name) or HISTORY_RE.match(name):
+                files.append((name, os.path.getmtime(os.path.join(self.directory, name))))
+        # .history (8 символов) встаёт перед сегментами своей линии времени
+        return sorted(files, key=lambda item: (item[0][:8], not item[0].endswith(".history"), item[0]))
+
+    def _switch_if_idle(self):
+        """Закрывает сегмент, который давно открыт и в который что-то записано."""
+        partial = next((name for name in os.listdir(self.directory) if name.endswith(PARTIAL_SUFFIX)), None)
+        if partial is None:
+            self._partial = None
+            return
+        mtime = os.path.getmtime(os.path.join(self.directory, partial))
+        if self._partial is None or self._partial[0] != partial:
+            self._partial = (partial, time.monotonic(), mtime)
+            return
+        _, seen, seen_mtime = self._partial
+        if mtime > seen_mtime and time.monotonic() - seen >= settings.BACKUP_WAL_BATCH_SECONDS:
+            try:
+                self.db_interface.switch_wal(self.task.database.connection_string)
+            except Exception as e:
+                logger.warning("pg_switch_wal failed for task %s: %s", self.task.id, e)
+            self._partial = None
+
+    def tick(self, force=False):
+        if os.path.isdir(self.directory):
+            self._switch_if_idle()
+        files = self.completed()
+        segments = [name for name, _ in files if SEGMENT_RE.match(name)]
+        if not segments:
+            return None
+        oldest = min(mtime for _, mtime in files)
+        if not (force or len(segments) >= settings.BACKUP_WAL_BATCH_SEGMENTS
+                or time.time() - oldest >= settings.BACKUP_WAL_BATCH_SECONDS):
+            return None
+        # после простоя сегментов может накопиться много: пачка — не больше BACKUP_WAL_BATCH_SEGMENTS,
+        # остальные уйдут на следующих шагах
+        batch, count = [], 0
+        for name, mtime in files:
+            if SEGMENT_RE.match(name):
+                if count == settings.BACKUP_WAL_BATCH_SEGMENTS:
+                    break
+                count += 1
+            batch.append((name, mtime))
+        return self.upload(batch)
+
+    def flush(self):
+        """Выгрузить все завершённые сегменты (при остановке архиватора)."""
+        while self.tick(force=True):
+            pass
+
+    def upload(self, files):
+        """Загружает files одной пачкой; при успехе удаляет их и возвращает WalBatch."""
+        segments = [SEGMENT_RE.match(name)["name"] for name, _ in files if SEGMENT_RE.match(name)]
+        first, last = segments[0], segments[-1]
+        filepath = os.path.join(self.directory, f"batch_{first}_{last}.tar")
+        checksum = StreamChecksum(sha256=False)
+        # сегменты уже сжаты pg_receivewal — tar без сжатия
+        with open(filepath, "wb") as f, tarfile.open(fileobj=ProgressWriter(f, None, checksum), mode="w|") as tar:
+            for name, _ in files:
+                tar.add(os.path.join(self.directory, name), arcname=name)
+        size = os.path.getsize(filepath)
+
+        storage = self.task.file_storage
+        cipher = dump_cipher(self.task)
+        try:
+            remote_path, error = get_storage_service(storage).upload_dump(
+                filepath, f"wal_{self.task.id}_{first}_{last}", checksums={"blake2b": checksum.blake2b},
+                cipher=cipher)
+        finally:
+            os.remove(filepath)
+        if error:
+            storage_error(storage, "upload")
+            logger.error("Failed to upload WAL %s..%s of task %s: %s", first, last, self.task.id, error)
+            return None
+
+        batch = WalBatch.objects.create(
+            task=self.task,
+            first_segment=first,
+            last_segment=last,
+            segments=len(segments),
+            closed_dt=datetime.fromtimestamp(max(mtime for _, mtime in files), tz=dt_timezone.utc),
+            size=size,
+            path=remote_path,
+            checksum_blake2b=checksum.blake2b,
+            encryption_key_id=cipher.key_id if cipher else None,
+        )
+        for name, _ in files:
+            os.remove(os.path.join(self.directory, name))
+        logger.info("WAL %s..%s of task %s uploaded (%s segments)", first, last, self.task.id, len(segments))
+        return batch
+
+
+class WalArchiver:
+    """
+    Непрерывный архив WAL всех задач с режимом PITR (команда archive_wal):
+    по pg_receivewal на задачу, перезапуск упавших, выгрузка пачек. Список
+    задач перечитывается на каждом шаге — новые задачи подхватываются без
+    перезапуска. Архиватор должен работать на одной ноде.
+    """
+
+    def __init__(self):
+        self.receivers = {}
+
+    def _sync(self):
+        tasks = {str(task.id): task for task in pitr_tasks()}
+        for task_id in set(self.receivers) - set(tasks):
+            # задача удалена или сменила режим: сегменты остаются в спуле
+            self.receivers.pop(task_id).stop()
+        for task_id, task in tasks.items():
+            if task_id in self.receivers:
+                self.receivers[task_id].task = task
+            else:
+                self.receivers[task_id] = WalReceiver(task)
+
+    def run(self, once=False):
+        try:
+            while True:
+                close_old_connections()
+                self._sync()
+                for receiver in self.receivers.values():
+                    # сбой одной задачи (хранилище, диск) не останавливает архив остальных
+                    try:
+                        if once:
+                            receiver.flush()
+                        else:
+                            receiver.ensure_running()
+                            receiver.tick()
+                    except Exception:
+                        logger.exception("WAL archiving failed for task %s", receiver.task.id)
+                if once:
+                    return
+                time.sleep(settings.BACKUP_WAL_POLL_INTERVAL)
+        finally:
+            if not once:
+                for receiver in self.receivers.values():
+                    receiver.stop()
+                    receiver.flush()
+
+
+def segment_number(name, segment_size):
+    """Порядковый номер сегмента WAL по имени файла (без линии времени)."""
+    per_xlogid = 0x100000000 // segment_size
+    return int(name[8:16], 16) * per_xlogid + int(name[16:24], 16)
+
+
+def wal_chain(dump_operation, target_time=None):
+    """
+    Пачки WAL, нужные для восстановления базовой копии dump_operation на момент
+    target_time (None — до конца архива) -> (batches, error). Берутся пачки от
+    сегмента начала копии до первой, закрытой после target_time, и ещё одна:
+    восстановление останавливается на первой транзакции позже target_time,
+    а она может лежать в следующем сегменте. Сегменты цепочки должны идти без
+    разрывов: на разрыве PostgreSQL закончил бы восстановление раньше target_time
+    и молча переключился бы в обычный режим.
+    """
+    manifest = dump_operation.manifest or {}
+    wal = manifest.get("wal") or {}
+    segment_size = wal["wal_segment_size"]
+    start = segment_name(wal["timeline"], parse_lsn(wal["start_lsn"]), segment_size)
+    # копия согласована только с конца: до него восстановиться нельзя
+    finished = manifest.get("created_dt")
+    if target_time is not None and finished and target_time < datetime.fromisoformat(finished):
+        return None, f"Target time is earlier than the end of the base backup ({finished})"
+    batches = list(WalBatch.objects.filter(
+        task_id=dump_operation.task_id, last_segment__gte=start).order_by("first_segment"))
+
+    if target_time is None:
+        chain = batches
+    else:
+        chain = None
+        for position, batch in enumerate(batches):
+            if batch.closed_dt >= target_time:
+                chain = batches[:position + 2]
+                break
+        if chain is None:
+            archived = batches[-1].closed_dt.isoformat() if batches else "the base backup"
+            return None, f"WAL is archived only up to {archived}, later than the target time is needed"
+
+    # после смены линии времени номер сегмента повторяется, поэтому «не больше следующего»
+    expected = segment_number(start, segment_size)
+    for batch in chain:
+        if segment_number(batch.first_segment, segment_size) > expected:
+            return None, f"WAL archive has a gap before segment {batch.first_segment}"
+        expected = max(expected, segment_number(batch.last_segment, segment_size) + 1)
+    return chain, None
+
+
+def extract_wal_batch(filepath, wal_dir):
+    """Сегменты пачки -> wal_dir без сжатия (restore_command просто копирует их)."""
+    os.makedirs(wal_dir, exist_ok=True)
+    with tarfile.open(filepath, mode="r|") as tar:
+        for member in tar:
+            match = SEGMENT_RE.match(member.name)
+            if not (match or HISTORY_RE.match(member.name)):
+                continue
+            source = tar.extractfile(member)
+            name = match["name"] if match else member.name
+            with open(os.path.join(wal_dir, name), "wb") as out:
+                shutil.copyfileobj(gzip.GzipFile(fileobj=source) if match and match["gz"] else source, out)
+
+
+def stale_wal_batches(task, oldest_dump_operation):
+    """Пачки, которые не нужны самой старой оставшейся базовой копии задачи (их можно удалить)."""
+    wal = (oldest_dump_operation.manifest or {}).get("wal")
+    if not wal:
+        return []
+    start = segment_name(wal["timeline"], parse_lsn(wal["start_lsn"]), wal["wal_segment_size"])
+    return list(WalBatch.objects.filter(task=task, last_segment__lt=start))
@@ -0,0 +1,135 @@
+import logging
+import os
+import shutil
+import socket
+import uuid
+
+from django.conf import settings
+
+from manager.services.queue_service import WORKER_ID
+from manager.services.space_service import SpaceService, paths_size, pid_alive
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_spool(spec):
+    """'/dev/shm/backups:2147483648' -> ('/dev/shm/backups', 2147483648)"""
+    path, sep, limit = spec.rpartition(":")
+    if sep and limit.isdigit():
+        return path, int(limit)
+    return spec, None
+
+
+class Workspace:
+    """Уникальный каталог операции в спуле и резерв места под него."""
+
+    def __init__(self, path, reservation):
+        self.path = path
+        self.reservation = reservation
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def usage(self):
+        return paths_size([self.path])
+
+    @property
+    def peak_usage(self):
+        return max(self.reservation.peak_usage, self.usage())
+
+    def cleanup(self):
+        self.reservation.release()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class WorkspaceService:
+    """
+    Спулы для временных файлов операций.
+
+    Каждая операция получает каталог <spool>/backup_manager/<kind>_<key>_<host>:<pid>_<uuid>.
+    host:pid в имени (как WORKER_ID) позволяет при старте воркера удалить каталоги
+    упавших процессов этого хоста; спул может быть общим для нескольких хостов,
+    чужие каталоги не трогаем — их pid на этом хосте ничего не значит.
+    """
+
+    ROOT_NAME = "backup_manager"
+
+    def __init__(self, spool_dirs=None):
+        self.spools = [_parse_spool(spec) for spec in (spool_dirs or settings.BACKUP_SPOOL_DIRS)]
+
+    def _root(self, spool_dir):
+        return os.path.join(spool_dir, self.ROOT_NAME)
+
+    def _candidates(self, size):
+        # спулы, в которые задача проходит по лимиту размера, в порядке предпочтения
+        candidates = [path for path, limit in self.spools if limit is None or (size or 0) <= limit]
+        return candidates or [self.spools[-1][0]]
+
+    def acquire(self, kind, key, size):
+        """
+        Выбирает первый подходящий спул со свободным местом, резервирует size
+        байт и создаёт каталог операции. Возвращает (workspace, error).
+        """
+        candidates = self._candidates(size)
+        reservation = None
+        spool_dir = None
+        for path in candidates:
+            reservation = SpaceService(self._root(path)).try_admit(key, size)
+            if reservation:
+                spool_dir = path
+                break
+        if not reservation:
+            # места нет нигде — ждём в самом большом из подходящих спулов
+            spool_dir = candidates[-1]
+            reservation, error = SpaceService(self._root(spool_dir)).admit(key, size)
+            if error:
+                return None, error
+
+        path = os.path.join(self._root(spool_dir), f"{kind}_{key}_{WORKER_ID}_{uuid.uuid4().hex[:8]}")
+        os.makedirs(path, mode=0o700)
+        reservation.watch(path)
+        return Workspace(path, reservation), None
+
+    def cleanup_stale(self):
+        """Удаляет каталоги операций этого хоста, чьи процессы уже не живы. Возвращает их число."""
+        own_suffix = f"_{socket.gethostname()}"
+        removed = 0
+        for spool_dir, _ in self.spools:
+            root = self._root(spool_dir)
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                # <kind>_<key>_<host>:<pid>_<uuid>: имя хоста может содержать "_", поэтому
+                # сверяем его целиком с концом префикса, а не разбиением по "_"
+                owner, _, pid = name.rpartition("_")[0].rpartition(":")
+                if not os.path.isdir(path) or not owner.endswith(own_suffix) or not pid.isdigit():
+                    continue
+                if pid_alive(int(pid)):
+                    continue
+                logger.info("Remove stale workspace %s", path)
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def usage(self):
+        """Сводка по спулам: место на томе, число и объём каталогов операций."""
+        result = []
+        for spool_dir, limit in self.spools:
+            root = self._root(spool_dir)
+            workspaces = []
+            if os.path.isdir(root):
+                workspaces = [
+                    os.path.join(root, name) for name in os.listdir(root)
+                    if os.path.isdir(os.path.join(root, name))
+                ]
+            disk = shutil.disk_usage(spool_dir) if os.path.isdir(spool_dir) else None
+            result.append({
+                "path": spool_dir,
+                "max_job_size": limit,
+                "total": disk.total if disk else None,
+                "free": disk.free if disk else None,
+                "workspaces": len(workspaces),
+                "used": paths_size(workspaces),
+            })
+        return result
@@ -0,0 +1,89 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from manager.choices import (DBType, DumpOperationStatusChoices,
+                             DumpTaskPeriodsChoices)
+from manager.models import (DumpTask, DumpTaskOperation, FileStorage,
+                            UserDatabase)
+from manager.services.metrics_service import compact_metrics
+from manager.services.queue_service import WORKER_ID, Lease, QueueService
+
+
+@override_settings(BACKUP_DISPATCH_MODE="queue")
+class WorkerCrashTests(TestCase):
+
+    def setUp(self):
+        storage = FileStorage.objects.create(name="s3", type=FileStorage.TYPE_S3, bucket_name="dumps")
+        database = UserDatabase.objects.create(
+            name="pg", db_type=DBType.POSTGRESQL, connection_string="postgresql://u@127.0.0.1/db")
+        task = DumpTask.objects.create(
+            database=database, file_storage=storage, task_period=DumpTaskPeriodsChoices.EVERYDAY)
+        self.operation = DumpTaskOperation.objects.create(task=task)
+
+    def test_crashed_operation_is_failed_and_worker_keeps_going(self):
+        second = DumpTaskOperation.objects.create(task=self.operation.task)
+        with mock.patch("manager.management.commands.run_worker.BackupService.make_dump",
+                        side_effect=RuntimeError("boom")) as make_dump:
+            call_command("run_worker", "--once")
+
+        # обе операции взяты в работу: падение первой не остановило воркер
+        self.assertEqual(make_dump.call_count, 2)
+        for operation in (self.operation, second):
+            operation.refresh_from_db()
+            self.assertEqual(operation.status, DumpOperationStatusChoices.FAIL)
+            self.assertIn("boom", operation.error_text)
+            self.assertIsNone(operation.lease_owner)
+
+    def test_interrupted_worker_keeps_lease_for_reclaim(self):
+        QueueService().claim(DumpTaskOperation)
+        with self.assertRaises(KeyboardInterrupt):
+            with Lease(DumpTaskOperation, self.operation.id):
+                raise KeyboardInterrupt
+
+        # аренда осталась: по её истечении операцию заберёт другой воркер
+        self.operation.refresh_from_db()
+        self.assertEqual(self.operation.status, DumpOperationStatusChoices.IN_PROCESS)
+        self.assertEqual(self.operation.lease_owner, WORKER_ID)
+
+
+class CompactMetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.dead_pid = subprocess.Popen([sys.executable, "-c", ""]).pid
+        os.waitpid(self.dead_pid, 0)
+        self.key = mmap_key("backup_storage_errors_total", "backup_storage_errors_total", (), (), "")
+
+    def _write(self, name, value):
+        values = MmapedDict(os.path.join(self.path, name))
+        values.write_value(self.key, value, 0)
+        values.close()
+
+    def _read(self, name):
+        values = MmapedDict(os.path.join(self.path, name))
+        try:
+            return values.read_value(self.key)[0]
+        finally:
+            values.close()
+
+    def test_dead_process_files_are_merged(self):
+        self._write(f"counter_{self.dead_pid}.db", 2)
+        self._write("counter_compacted.db", 3)
+        self._write(f"counter_{os.getpid()}.db", 5)
+        self._write(f"gauge_livesum_{self.dead_pid}.db", 1)
+
+        self.assertEqual(compact_metrics(self.path), 2)
+
+        self.assertEqual(self._read("counter_compacted.db"), 5)
+        self.assertEqual(self._read(f"counter_{os.getpid()}.db"), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.path, f"counter_{self.dead_pid}.db")))
+        self.assertFalse(os.path.exists(os.path.join(self.path, f"gauge_livesum_{self.dead_pid}.db")))
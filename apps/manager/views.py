@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from manager.models import DumpTaskOperation, RecoverBackupOperation
+from manager.services.metrics_service import build_registry
+
+OPERATION_MODELS = {
+    "dump": DumpTaskOperation,
+    "restore": RecoverBackupOperation,
+}
+
+
+@require_GET
+def metrics(request):
+    if settings.METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+            return HttpResponseForbidden()
+    return HttpResponse(generate_latest(build_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+@require_GET
+@staff_member_required
+def operation_profile(request, kind, operation_id):
+    if kind not in OPERATION_MODELS:
+        raise Http404
+    operation = get_object_or_404(OPERATION_MODELS[kind], id=operation_id)
+    if not operation.profile_path or not os.path.exists(operation.profile_path):
+        raise Http404
+    return FileResponse(open(operation.profile_path, "rb"), as_attachment=True,
+                        filename=os.path.basename(operation.profile_path))